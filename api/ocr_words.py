@@ -0,0 +1,66 @@
+"""
+Palavras do OCR anexadas ao PDF pela API TIFF -> PDF (searchable=true)
+Quando o PDF traz o anexo, a extração usa essas palavras em vez de
+renderizar as páginas e rodar o OCR de novo
+"""
+
+import json
+
+OCR_WORDS_FILE = 'ocr_words.json'
+OCR_WORDS_SOURCE = 'tiff-to-pdf-api'
+# Espaço máximo entre palavras da mesma linha, em alturas de palavra,
+# para juntá-las num mesmo segmento (como os textos do PaddleOCR)
+SEGMENT_GAP_FACTOR = 1.0
+
+
+def load_ocr_words(pdf_document):
+    """
+    Lê as palavras do OCR anexadas ao PDF
+
+    Args:
+        pdf_document: Documento PyMuPDF
+
+    Returns:
+        dict ou None: {índice da página (0-based): [palavras]} com as bbox em
+        pontos (origem no topo), ou None se o PDF não traz o anexo válido
+    """
+    try:
+        if OCR_WORDS_FILE not in pdf_document.embfile_names():
+            return None
+        payload = json.loads(pdf_document.embfile_get(OCR_WORDS_FILE))
+    except Exception:
+        return None
+
+    # O anexo só vale para o PDF gerado junto com ele
+    if payload.get('source') != OCR_WORDS_SOURCE or payload.get('page_count') != len(pdf_document):
+        return None
+    return {page['page'] - 1: page['words'] for page in payload.get('pages', [])}
+
+
+def words_to_segments(words, gap_factor=SEGMENT_GAP_FACTOR):
+    """
+    Junta palavras consecutivas da mesma linha em segmentos de texto,
+    quebrando onde o espaço entre elas é grande (separação de colunas)
+
+    Args:
+        words: Palavras de uma página (load_ocr_words)
+        gap_factor: Espaço máximo entre palavras, em alturas de palavra
+
+    Returns:
+        list: [(texto, (x0, y0, x1, y1))] em pontos
+    """
+    segments = []
+    current = None
+    for word in words:
+        x0, y0, x1, y1 = word['bbox']
+        if current is not None:
+            line, text, (sx0, sy0, sx1, sy1) = current
+            gap = x0 - sx1
+            if word.get('line') == line and 0 <= gap <= gap_factor * max(y1 - y0, sy1 - sy0):
+                current = (line, text + ' ' + word['text'], (sx0, min(sy0, y0), x1, max(sy1, y1)))
+                continue
+            segments.append((text, current[2]))
+        current = (word.get('line'), word['text'], (x0, y0, x1, y1))
+    if current is not None:
+        segments.append((current[1], current[2]))
+    return segments
@@ -29,7 +29,7 @@ import shutil
 import gc
 import time
 import threading
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -60,6 +60,15 @@ except ImportError as e:
     logger.critical(f"ERRO CRITICO: img2table nao encontrado: {e}")
     sys.exit(1)
 
+# Pacote shared/ (tracing, metrics) na raiz do repositório: no início do
+# sys.path para que nenhum pacote instalado com o mesmo nome tenha prioridade
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ocr_words import load_ocr_words
+from shared import metrics, tracing
+
 # ============================================================================
 # OTIMIZAÇÃO DE MEMÓRIA: Lazy Loading + Auto-unload do OCR
 # ============================================================================
@@ -71,6 +80,8 @@ _ocr_unload_timer = None
 # Tempo de inatividade antes de descarregar OCR (em segundos)
 OCR_UNLOAD_TIMEOUT = 300  # 5 minutos de inatividade
 
+metrics.OCR_MODEL_LOADED.set(0)
+
 def _unload_ocr():
     """
     Descarrega instância OCR para liberar memória (~700MB-1GB).
@@ -84,6 +95,8 @@ def _unload_ocr():
                 logger.info("⚡ Descarregando OCR por inatividade (liberando ~700MB-1GB RAM)...")
                 _ocr_instance = None
                 _ocr_last_used = None
+                metrics.OCR_MODEL_EVENTS.inc(event='unload')
+                metrics.OCR_MODEL_LOADED.set(0)
                 # Forçar garbage collection agressivo
                 gc.collect()
                 gc.collect()  # Duas vezes para garantir
@@ -113,6 +126,8 @@ def get_ocr():
     with _ocr_lock:
         if _ocr_instance is None:
             logger.info("🚀 Inicializando PaddleOCR com lazy loading...")
+            metrics.CACHE.inc(cache='ocr_model', result='miss')
+            load_start = time.perf_counter()
             
             # NOTA: Img2TableOCR é um wrapper que aceita apenas parâmetros básicos
             # Otimizações de memória vêm de:
@@ -122,8 +137,12 @@ def get_ocr():
             # - Garbage collection agressivo
             
             _ocr_instance = Img2TableOCR(lang="pt")
+            metrics.OCR_MODEL_LOAD_SECONDS.observe(time.perf_counter() - load_start)
+            metrics.OCR_MODEL_EVENTS.inc(event='load')
+            metrics.OCR_MODEL_LOADED.set(1)
             logger.info("✅ PaddleOCR inicializado com lazy loading")
         else:
+            metrics.CACHE.inc(cache='ocr_model', result='hit')
             logger.debug("♻️  Reutilizando instância OCR cacheada")
         
         # Atualizar timestamp de último uso
@@ -156,6 +175,17 @@ limiter = Limiter(
     strategy="fixed-window"
 )
 
+@app.before_request
+def start_trace():
+    # Tempos por etapa da requisição (Server-Timing + log JSON; TRACING=0 desliga)
+    g.trace_token = tracing.start(request.path)
+
+@app.before_request
+def start_metrics():
+    # Requisições em andamento e latência por rota (/metrics)
+    g.metrics_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+
 @app.after_request
 def after_request(response):
     # Headers de segurança adicionais
@@ -163,12 +193,30 @@ def after_request(response):
     response.headers['X-Frame-Options'] = 'DENY'
     response.headers['X-XSS-Protection'] = '1; mode=block'
     
+    server_timing = tracing.finish(g.pop('trace_token', None), method=request.method, status=response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    
     # OTIMIZAÇÃO: Garbage collection agressivo após cada request
     # Libera memória de objetos temporários (PDFs, imagens, DataFrames)
     gc.collect()
     
+    # Rota (ex.: /process-pdf) e não o caminho bruto: limita a cardinalidade
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    start = g.get('metrics_start')
+    if start is not None:
+        metrics.observe_request(request.method, endpoint, response.status_code, time.perf_counter() - start)
+    else:
+        # Barrada antes de start_metrics (ex.: 429 do limiter)
+        metrics.REQUESTS.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+    
     return response
 
+@app.teardown_request
+def finish_metrics(exc):
+    if g.pop('metrics_start', None) is not None:
+        metrics.IN_FLIGHT.dec()
+
 
 def clean_text(text):
     """
@@ -195,6 +243,170 @@ def clean_text(text):
     return cleaned.strip()
 
 
+def pdf_to_excel(pdf_path):
+    """
+    Extrai as tabelas do PDF com img2table e gera o Excel (uma aba por página)
+    Separado da rota para rodar também no pool do serviço unificado (service/)
+    
+    Args:
+        pdf_path: Caminho do PDF
+        
+    Returns:
+        bytes: Arquivo .xlsx
+    """
+    # Contar páginas
+    with tracing.span('open'):
+        pdf_doc = fitz.open(pdf_path)
+        num_pages = len(pdf_doc)
+        cached_words = load_ocr_words(pdf_doc) or {}
+        pdf_doc.close()
+    logger.info(f"PDF possui {num_pages} pagina(s)")
+    
+    # Processar com img2table usando OCR cacheado
+    logger.info("Extraindo tabelas com img2table...")
+    if len(cached_words) == num_pages:
+        # PDF pesquisável da API TIFF: img2table lê a camada de texto, sem OCR
+        logger.info("Camada de texto do OCR anexada ao PDF, pulando OCR")
+        metrics.CACHE.inc(cache='ocr_words', result='hit')
+        img2table_ocr = None
+    else:
+        metrics.CACHE.inc(cache='ocr_words', result='miss')
+        with tracing.span('ocr_model'):
+            img2table_ocr = get_ocr()  # Usa instância cacheada (otimização)
+    
+    with tracing.span('extract_tables'):
+        img2table_doc = Img2TablePDF(src=pdf_path)
+        all_tables = img2table_doc.extract_tables(
+            ocr=img2table_ocr,
+            implicit_rows=True,
+            borderless_tables=True,
+            min_confidence=50
+        )
+    
+    total_tables = sum(len(tables) for tables in all_tables.values())
+    logger.info(f"{total_tables} tabela(s) detectadas")
+    
+    # Processar cada página
+    all_pages_data = []
+    
+    for page_num in range(num_pages):
+        logger.info(f"Processando pagina {page_num + 1}/{num_pages}...")
+        
+        with tracing.span('dataframe'):
+            page_rows = []
+            
+            # Adicionar tabelas desta página
+            if page_num in all_tables and len(all_tables[page_num]) > 0:
+                logger.info(f"  {len(all_tables[page_num])} tabela(s) nesta pagina")
+                
+                for table_idx, table in enumerate(all_tables[page_num]):
+                    logger.debug(f"  Tabela {table_idx + 1}: {table.df.shape[0]} linhas x {table.df.shape[1]} colunas")
+                    
+                    # Adicionar cada linha da tabela
+                    for _, row in table.df.iterrows():
+                        cleaned_row = []
+                        for cell in row:
+                            if pd.notna(cell) and str(cell).strip():
+                                cleaned_row.append(clean_text(str(cell)))
+                            else:
+                                cleaned_row.append('')
+                        page_rows.append(cleaned_row)
+                    
+                    # Adicionar linha vazia entre tabelas
+                    if table_idx < len(all_tables[page_num]) - 1:
+                        page_rows.append([''])
+            
+            # Normalizar colunas
+            df = None
+            if page_rows:
+                max_cols = max(len(row) for row in page_rows)
+                normalized_rows = []
+                for row in page_rows:
+                    padded = row + [''] * (max_cols - len(row))
+                    normalized_rows.append(padded[:max_cols])
+                
+                df = pd.DataFrame(normalized_rows)
+        
+        # Criar DataFrame para a página
+        if page_rows:
+            # CORREÇÃO: Limpar TODAS as células do DataFrame antes de salvar
+            # Usar map() ao invés de applymap() (deprecado em pandas 2.1+)
+            with tracing.span('clean'):
+                for col in df.columns:
+                    df[col] = df[col].map(lambda x: clean_text(str(x)) if pd.notna(x) and x != '' else '')
+            
+            all_pages_data.append((page_num + 1, df))
+            logger.info(f"  {len(page_rows)} linha(s) extraidas")
+        else:
+            # Página sem conteúdo
+            df = pd.DataFrame([["Nenhum conteudo encontrado"]])
+            all_pages_data.append((page_num + 1, df))
+            logger.warning(f"  Nenhuma tabela detectada na pagina {page_num + 1}")
+    
+    # VALIDAÇÃO FINAL: Garantir que não há caracteres inválidos
+    def ultra_clean(x):
+        """Limpeza ultra agressiva + fallback ASCII"""
+        try:
+            cleaned = clean_text(str(x))
+            # Última camada: tentar encode/decode para remover caracteres problemáticos
+            cleaned = cleaned.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
+            return cleaned
+        except:
+            return ''  # Se falhar, retornar vazio
+    
+    with tracing.span('clean'):
+        for idx, (page_num, page_df) in enumerate(all_pages_data):
+            # Substituir qualquer valor não-string por string vazia
+            page_df = page_df.fillna('')
+            
+            # Limpar AGRESSIVAMENTE todas as células
+            for col in page_df.columns:
+                page_df[col] = page_df[col].apply(ultra_clean)
+            all_pages_data[idx] = (page_num, page_df)
+    
+    # Criar Excel com abas por página
+    logger.info(f"Gerando Excel com {len(all_pages_data)} aba(s)...")
+    excel_buffer = io.BytesIO()
+    
+    try:
+        with tracing.span('to_excel'), pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            for page_num, page_df in all_pages_data:
+                sheet_name = f"Pagina_{page_num}"
+                
+                try:
+                    page_df.to_excel(
+                        writer,
+                        sheet_name=sheet_name[:31],  # Excel limita nomes a 31 chars
+                        index=False,
+                        header=False
+                    )
+                    logger.debug(f"  Aba '{sheet_name}' criada")
+                except Exception as e:
+                    logger.warning(f"  Erro na pagina {page_num}: {e}")
+                    # Tentar novamente convertendo TUDO para ASCII puro
+                    for col in page_df.columns:
+                        page_df[col] = page_df[col].apply(
+                            lambda x: str(x).encode('ascii', errors='ignore').decode('ascii')
+                        )
+                    page_df.to_excel(
+                        writer,
+                        sheet_name=sheet_name[:31],
+                        index=False,
+                        header=False
+                    )
+                    logger.info(f"  Aba '{sheet_name}' criada (modo ASCII)")
+    except Exception as e:
+        logger.error(f"Erro ao criar Excel: {e}")
+        raise
+    
+    metrics.PAGES.inc(num_pages, operation='process-pdf')
+    logger.info(f"{'='*60}")
+    logger.info("Processamento concluido com sucesso!")
+    logger.info(f"{'='*60}")
+    
+    return excel_buffer.getvalue()
+
+
 @app.route('/health', methods=['GET'])
 @limiter.exempt  # Health check sem limite
 def health():
@@ -202,6 +414,13 @@ def health():
     return jsonify({"status": "ok"})
 
 
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt  # Scrape do Prometheus sem limite
+def metrics_endpoint():
+    """Métricas no formato do Prometheus (requisições, páginas, OCR, memória)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/process-pdf', methods=['POST'])
 @limiter.limit("10 per hour")  # Máximo 10 conversões por hora por IP
 def process_pdf():
@@ -240,144 +459,14 @@ def process_pdf():
         logger.info(f"{'='*60}")
         
         # Salvar temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+        with tracing.span('save'), tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
             file.save(tmp_file.name)
             pdf_path = tmp_file.name
         
         try:
-            # Contar páginas
-            pdf_doc = fitz.open(pdf_path)
-            num_pages = len(pdf_doc)
-            pdf_doc.close()
-            logger.info(f"PDF possui {num_pages} pagina(s)")
-            
-            # Processar com img2table usando OCR cacheado
-            logger.info("Extraindo tabelas com img2table...")
-            img2table_ocr = get_ocr()  # Usa instância cacheada (otimização)
-            img2table_doc = Img2TablePDF(src=pdf_path)
-            
-            all_tables = img2table_doc.extract_tables(
-                ocr=img2table_ocr,
-                implicit_rows=True,
-                borderless_tables=True,
-                min_confidence=50
-            )
-            
-            total_tables = sum(len(tables) for tables in all_tables.values())
-            logger.info(f"{total_tables} tabela(s) detectadas")
-            
-            # Processar cada página
-            all_pages_data = []
-            
-            for page_num in range(num_pages):
-                logger.info(f"Processando pagina {page_num + 1}/{num_pages}...")
-                
-                page_rows = []
-                
-                # Adicionar tabelas desta página
-                if page_num in all_tables and len(all_tables[page_num]) > 0:
-                    logger.info(f"  {len(all_tables[page_num])} tabela(s) nesta pagina")
-                    
-                    for table_idx, table in enumerate(all_tables[page_num]):
-                        logger.debug(f"  Tabela {table_idx + 1}: {table.df.shape[0]} linhas x {table.df.shape[1]} colunas")
-                        
-                        # Adicionar cada linha da tabela
-                        for _, row in table.df.iterrows():
-                            cleaned_row = []
-                            for cell in row:
-                                if pd.notna(cell) and str(cell).strip():
-                                    cleaned_row.append(clean_text(str(cell)))
-                                else:
-                                    cleaned_row.append('')
-                            page_rows.append(cleaned_row)
-                        
-                        # Adicionar linha vazia entre tabelas
-                        if table_idx < len(all_tables[page_num]) - 1:
-                            page_rows.append([''])
-                
-                # Criar DataFrame para a página
-                if page_rows:
-                    # Normalizar colunas
-                    max_cols = max(len(row) for row in page_rows)
-                    normalized_rows = []
-                    for row in page_rows:
-                        padded = row + [''] * (max_cols - len(row))
-                        normalized_rows.append(padded[:max_cols])
-                    
-                    df = pd.DataFrame(normalized_rows)
-                    
-                    # CORREÇÃO: Limpar TODAS as células do DataFrame antes de salvar
-                    # Usar map() ao invés de applymap() (deprecado em pandas 2.1+)
-                    for col in df.columns:
-                        df[col] = df[col].map(lambda x: clean_text(str(x)) if pd.notna(x) and x != '' else '')
-                    
-                    all_pages_data.append((page_num + 1, df))
-                    logger.info(f"  {len(page_rows)} linha(s) extraidas")
-                else:
-                    # Página sem conteúdo
-                    df = pd.DataFrame([["Nenhum conteudo encontrado"]])
-                    all_pages_data.append((page_num + 1, df))
-                    logger.warning(f"  Nenhuma tabela detectada na pagina {page_num + 1}")
-            
-            # Criar Excel com abas por página
-            logger.info(f"Gerando Excel com {len(all_pages_data)} aba(s)...")
-            excel_buffer = io.BytesIO()
-            
-            try:
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    for page_num, page_df in all_pages_data:
-                        # VALIDAÇÃO FINAL: Garantir que não há caracteres inválidos
-                        # Substituir qualquer valor não-string por string vazia
-                        page_df = page_df.fillna('')
-                        
-                        # Limpar AGRESSIVAMENTE todas as células
-                        for col in page_df.columns:
-                            def ultra_clean(x):
-                                """Limpeza ultra agressiva + fallback ASCII"""
-                                try:
-                                    cleaned = clean_text(str(x))
-                                    # Última camada: tentar encode/decode para remover caracteres problemáticos
-                                    cleaned = cleaned.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
-                                    return cleaned
-                                except:
-                                    return ''  # Se falhar, retornar vazio
-                            
-                            page_df[col] = page_df[col].apply(ultra_clean)
-                        
-                        sheet_name = f"Pagina_{page_num}"
-                        
-                        try:
-                            page_df.to_excel(
-                                writer,
-                                sheet_name=sheet_name[:31],  # Excel limita nomes a 31 chars
-                                index=False,
-                                header=False
-                            )
-                            logger.debug(f"  Aba '{sheet_name}' criada")
-                        except Exception as e:
-                            logger.warning(f"  Erro na pagina {page_num}: {e}")
-                            # Tentar novamente convertendo TUDO para ASCII puro
-                            for col in page_df.columns:
-                                page_df[col] = page_df[col].apply(
-                                    lambda x: str(x).encode('ascii', errors='ignore').decode('ascii')
-                                )
-                            page_df.to_excel(
-                                writer,
-                                sheet_name=sheet_name[:31],
-                                index=False,
-                                header=False
-                            )
-                            logger.info(f"  Aba '{sheet_name}' criada (modo ASCII)")
-            except Exception as e:
-                logger.error(f"Erro ao criar Excel: {e}")
-                raise
-            
-            excel_buffer.seek(0)
-            excel_base64 = base64.b64encode(excel_buffer.read()).decode('utf-8')
-            
-            logger.info(f"{'='*60}")
-            logger.info("Processamento concluido com sucesso!")
-            logger.info(f"{'='*60}")
+            excel_bytes = pdf_to_excel(pdf_path)
+            with tracing.span('base64'):
+                excel_base64 = base64.b64encode(excel_bytes).decode('utf-8')
             
             return jsonify({
                 "success": True,
@@ -533,6 +622,57 @@ def compress_text_pdf_pymupdf(input_path, output_path, compression_level):
     return True
 
 
+def compress_pdf_file(input_path, output_path, compression_level):
+    """
+    Comprime o PDF com a técnica adequada ao tipo detectado
+    Separado da rota para rodar também no pool do serviço unificado (service/)
+    
+    Args:
+        input_path: PDF original
+        output_path: PDF comprimido (o original é copiado se não houver ganho)
+        compression_level: 'low', 'medium' ou 'high'
+        
+    Returns:
+        dict: original_size, compressed_size, reduction_percentage e pdf_type
+    """
+    original_size = os.path.getsize(input_path)
+    logger.info(f"Tamanho original: {original_size / 1024 / 1024:.2f} MB")
+    
+    # Detectar tipo de PDF
+    with tracing.span('detect'):
+        pdf_type = detect_pdf_type(input_path)
+    logger.info(f"Tipo detectado: {pdf_type.upper()}")
+    
+    # Comprimir usando técnica apropriada
+    with tracing.span('compress'):
+        if pdf_type == 'scanned':
+            logger.info("Usando Ghostscript (PDF escaneado)")
+            compression_worked = compress_scanned_pdf_ghostscript(input_path, output_path, compression_level)
+        else:
+            logger.info("Usando PyMuPDF (PDF com texto)")
+            compression_worked = compress_text_pdf_pymupdf(input_path, output_path, compression_level)
+    
+    # Verificar redução
+    compressed_size = os.path.getsize(output_path)
+    reduction = ((original_size - compressed_size) / original_size) * 100
+    
+    if not compression_worked:
+        logger.info(f"Tamanho final: {compressed_size / 1024 / 1024:.2f} MB")
+        logger.info("Reducao: 0% (PDF ja estava otimizado)")
+        logger.info("="*60)
+    else:
+        logger.info(f"Tamanho comprimido: {compressed_size / 1024 / 1024:.2f} MB")
+        logger.info(f"Reducao total: {reduction:.1f}%")
+        logger.info("="*60)
+    
+    return {
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'reduction_percentage': round(reduction, 1),
+        'pdf_type': pdf_type
+    }
+
+
 @app.route('/compress-pdf', methods=['POST', 'OPTIONS'])
 @limiter.limit("20 per hour")  # Máximo 20 compressões por hora por IP
 def compress_pdf():
@@ -574,7 +714,7 @@ def compress_pdf():
         logger.info(f"IP: {get_remote_address()}")
         
         # Salvar PDF temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_input:
+        with tracing.span('save'), tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_input:
             pdf_file.save(temp_input.name)
             input_path = temp_input.name
         
@@ -582,49 +722,19 @@ def compress_pdf():
         output_path = tempfile.mktemp(suffix='_compressed.pdf')
         
         try:
-            original_size = os.path.getsize(input_path)
-            logger.info(f"Tamanho original: {original_size / 1024 / 1024:.2f} MB")
-            
-            # Detectar tipo de PDF
-            pdf_type = detect_pdf_type(input_path)
-            logger.info(f"Tipo detectado: {pdf_type.upper()}")
-            
-            # Comprimir usando técnica apropriada
-            if pdf_type == 'scanned':
-                logger.info("Usando Ghostscript (PDF escaneado)")
-                compression_worked = compress_scanned_pdf_ghostscript(input_path, output_path, compression_level)
-            else:
-                logger.info("Usando PyMuPDF (PDF com texto)")
-                compression_worked = compress_text_pdf_pymupdf(input_path, output_path, compression_level)
-            
-            # Verificar redução
-            compressed_size = os.path.getsize(output_path)
-            reduction = ((original_size - compressed_size) / original_size) * 100
-            
-            if not compression_worked:
-                logger.info(f"Tamanho final: {compressed_size / 1024 / 1024:.2f} MB")
-                logger.info("Reducao: 0% (PDF ja estava otimizado)")
-                logger.info("="*60)
-            else:
-                logger.info(f"Tamanho comprimido: {compressed_size / 1024 / 1024:.2f} MB")
-                logger.info(f"Reducao total: {reduction:.1f}%")
-                logger.info("="*60)
-            
-            # Ler arquivo comprimido
-            with open(output_path, 'rb') as f:
-                pdf_data = f.read()
+            stats = compress_pdf_file(input_path, output_path, compression_level)
             
-            # Converter para base64
-            pdf_base64 = base64.b64encode(pdf_data).decode('utf-8')
+            # Ler arquivo comprimido e converter para base64
+            with tracing.span('base64'):
+                with open(output_path, 'rb') as f:
+                    pdf_data = f.read()
+                pdf_base64 = base64.b64encode(pdf_data).decode('utf-8')
             
             return jsonify({
                 'success': True,
                 'pdf': pdf_base64,
                 'filename': pdf_file.filename.replace('.pdf', '_comprimido.pdf'),
-                'original_size': original_size,
-                'compressed_size': compressed_size,
-                'reduction_percentage': round(reduction, 1),
-                'pdf_type': pdf_type
+                **stats
             })
             
         finally:
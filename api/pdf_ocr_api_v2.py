@@ -19,6 +19,11 @@ os.environ['OPENCV_SKIP_OPENCL'] = '1'
 
 import tempfile
 import base64
+import heapq
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 import numpy as np
 import cv2
 from flask import Flask, request, jsonify
@@ -28,6 +33,8 @@ import pandas as pd
 import io
 import fitz  # PyMuPDF
 
+from ocr_words import load_ocr_words, words_to_segments
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": "*"}})
 
@@ -49,192 +56,418 @@ def get_ocr():
     return ocr_instance
 
 
-def preprocess_image(img_array):
+# Zoom de renderização das páginas para o OCR (2x = 144 DPI)
+RENDER_ZOOM = 2.0
+
+
+class PageBufferPool:
+    """
+    Pool de buffers pré-alocados reutilizados entre páginas
+    Páginas do mesmo documento quase sempre têm o mesmo tamanho, então
+    os buffers intermediários são alocados uma vez e sobrescritos
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape):
+        """Retorna buffer uint8 com o shape pedido (realoca só se mudar)"""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+
+def render_page_gray(page, zoom=RENDER_ZOOM):
+    """
+    Renderiza página direto em escala de cinza e sem canal alpha
+    Retorna (pixmap, view) - a view NumPy aponta para a memória do pixmap
+    (zero-copy), então o pixmap precisa continuar vivo enquanto a view for usada
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = np.ndarray(
+        shape=(pix.height, pix.width),
+        dtype=np.uint8,
+        buffer=pix.samples_mv,
+        strides=(pix.stride, 1)
+    )
+    return pix, gray
+
+
+def gray_to_rgb(gray, pool):
+    """Expande cinza para 3 canais (PaddleOCR exige RGB) no buffer do pool"""
+    rgb = pool.get('rgb', gray.shape + (3,))
+    cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB, dst=rgb)
+    return rgb
+
+
+def preprocess_image(gray, pool):
     """
     Pré-processa imagem para melhorar qualidade do OCR
-    Mantém 3 canais RGB para compatibilidade com PaddleOCR
+    Trabalha em escala de cinza (1 canal) e escreve nos buffers do pool;
+    a saída tem 3 canais RGB para compatibilidade com PaddleOCR
     """
-    # Garantir que está em RGB
-    if len(img_array.shape) == 2:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_GRAY2RGB)
+    # Denoise para remover ruído
+    denoised = pool.get('denoised', gray.shape)
+    cv2.fastNlMeansDenoising(gray, dst=denoised, h=10)
     
-    # Denoise para remover ruído (em cada canal)
-    denoised = cv2.fastNlMeansDenoisingColored(img_array, h=10, hColor=10)
-    
-    # Ajustar contraste usando CLAHE em cada canal
-    lab = cv2.cvtColor(denoised, cv2.COLOR_RGB2LAB)
-    l, a, b = cv2.split(lab)
+    # Ajustar contraste usando CLAHE (equivalente ao canal L do LAB)
+    enhanced = pool.get('enhanced', gray.shape)
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
-    enhanced = cv2.merge([l, a, b])
-    enhanced_rgb = cv2.cvtColor(enhanced, cv2.COLOR_LAB2RGB)
+    clahe.apply(denoised, dst=enhanced)
     
-    return enhanced_rgb
+    return gray_to_rgb(enhanced, pool)
 
 
-def extract_table_texts_simple(tables_dict, page_idx):
-    """
-    Extrai textos das tabelas de forma SIMPLES
-    Retorna apenas conjunto de textos normalizados completos
+# DPI em que o img2table rasteriza o PDF (as bboxes das tabelas vêm nesse espaço)
+IMG2TABLE_DPI = 200
+
+
+def get_table_bboxes(tables_dict, page_idx):
     """
-    table_texts = set()
-    if page_idx in tables_dict:
-        for table in tables_dict[page_idx]:
-            for _, row in table.df.iterrows():
-                for cell in row:
-                    if pd.notna(cell):
-                        text = str(cell).strip().lower()
-                        if len(text) > 2:
-                            table_texts.add(text)
-    return table_texts
-
-
-def is_text_in_table(text, table_texts):
+    Retorna bboxes (x1, y1, x2, y2) das tabelas da página em coordenadas
+    da página (pontos PDF)
     """
-    Verifica se texto já está na tabela usando estratégia SIMPLIFICADA
-    Evita falsos positivos da versão anterior
+    scale = 72.0 / IMG2TABLE_DPI
+    bboxes = []
+    for table in tables_dict.get(page_idx, []):
+        bbox = table.bbox
+        bboxes.append((bbox.x1 * scale, bbox.y1 * scale, bbox.x2 * scale, bbox.y2 * scale))
+    return bboxes
+
+
+class TableSpatialIndex:
     """
-    text_normalized = text.strip().lower()
+    Grade uniforme sobre as bboxes das tabelas de uma página
     
-    # Verificação 1: Texto completo está na tabela
-    if text_normalized in table_texts:
-        return True
-    
-    # Verificação 2: Texto é substring de algum texto da tabela (> 80% do tamanho)
-    for table_text in table_texts:
-        if len(text_normalized) > 10 and text_normalized in table_text:
-            if len(text_normalized) / len(table_text) > 0.8:
-                return True
-        if len(table_text) > 10 and table_text in text_normalized:
-            if len(table_text) / len(text_normalized) > 0.8:
-                return True
-    
-    return False
+    Cada tabela é registrada nas células da grade que cobre; uma consulta
+    só testa interseção com as tabelas das células tocadas pela bbox do texto.
+    Comparar posição (e não string) evita descartar valores repetidos fora
+    da tabela, como "R$ 0,00"
+    """
+    CELL_SIZE = 64.0  # Tamanho da célula da grade em pontos
+    MIN_OVERLAP = 0.5  # Fração da área do texto que precisa cair dentro da tabela
+
+    def __init__(self, bboxes):
+        self.bboxes = list(bboxes)
+        self._cells = {}
+        for idx, bbox in enumerate(self.bboxes):
+            for cell in self._cells_for(bbox):
+                self._cells.setdefault(cell, []).append(idx)
+
+    def _cells_for(self, bbox):
+        x1, y1, x2, y2 = bbox
+        size = self.CELL_SIZE
+        for cx in range(int(x1 // size), int(x2 // size) + 1):
+            for cy in range(int(y1 // size), int(y2 // size) + 1):
+                yield cx, cy
+
+    def contains(self, bbox):
+        """Verifica se a bbox está (majoritariamente) dentro de alguma tabela"""
+        if not self._cells:
+            return False
+        
+        x1, y1, x2, y2 = bbox
+        area = (x2 - x1) * (y2 - y1)
+        seen = set()
+        for cell in self._cells_for(bbox):
+            for idx in self._cells.get(cell, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                tx1, ty1, tx2, ty2 = self.bboxes[idx]
+                inter_w = min(x2, tx2) - max(x1, tx1)
+                inter_h = min(y2, ty2) - max(y1, ty1)
+                if inter_w < 0 or inter_h < 0:
+                    continue
+                if area <= 0 or (inter_w * inter_h) / area >= self.MIN_OVERLAP:
+                    return True
+        return False
+
+
+def poly_to_bbox(poly):
+    """Converte polígono do OCR em bbox (x1, y1, x2, y2) nas coordenadas da imagem"""
+    xs = [point[0] for point in poly]
+    ys = [point[1] for point in poly]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def is_text_in_table(text_bbox, table_index, zoom=RENDER_ZOOM):
+    """
+    Verifica se o texto já está em alguma tabela pela POSIÇÃO
+    text_bbox vem em pixels da imagem renderizada (convertido para pontos)
+    """
+    x1, y1, x2, y2 = text_bbox
+    return table_index.contains((x1 / zoom, y1 / zoom, x2 / zoom, y2 / zoom))
 
 
 def cluster_columns_simple(x_positions):
     """
     Agrupa posições X em colunas usando método SIMPLES e ROBUSTO
-    Usa K-means manual baseado em gaps
+    Usa K-means manual baseado em gaps (vetorizado com NumPy)
     """
-    if not x_positions:
-        return []
+    sorted_x = np.unique(np.asarray(x_positions, dtype=float))
     
-    sorted_x = sorted(set(x_positions))
+    if sorted_x.size == 0:
+        return []
     
-    if len(sorted_x) == 1:
-        return [sorted_x[0]]
+    if sorted_x.size == 1:
+        return [float(sorted_x[0])]
     
     # Calcular gaps entre posições consecutivas
-    gaps = [sorted_x[i+1] - sorted_x[i] for i in range(len(sorted_x)-1)]
+    gaps = np.diff(sorted_x)
     
-    # Threshold: usar mediana dos gaps * 2 (mais robusto que média)
-    threshold = np.median(gaps) * 2.5 if gaps else 30
-    threshold = max(threshold, 20)  # Mínimo de 20 pixels
+    # Threshold: usar mediana dos gaps * 2.5 (mais robusto que média)
+    threshold = max(np.median(gaps) * 2.5, 20)  # Mínimo de 20 pixels
     
-    # Agrupar posições com gap < threshold
-    columns = []
-    current_group = [sorted_x[0]]
+    # Novo grupo sempre que o gap passa do threshold
+    starts = np.concatenate(([0], np.flatnonzero(gaps > threshold) + 1))
+    counts = np.diff(np.append(starts, sorted_x.size))
     
-    for i in range(1, len(sorted_x)):
-        if sorted_x[i] - sorted_x[i-1] <= threshold:
-            current_group.append(sorted_x[i])
-        else:
-            # Finalizar grupo atual (usar média como posição da coluna)
-            columns.append(np.mean(current_group))
-            current_group = [sorted_x[i]]
-    
-    # Adicionar último grupo
-    if current_group:
-        columns.append(np.mean(current_group))
-    
-    return columns
+    # Posição da coluna = média do grupo
+    return (np.add.reduceat(sorted_x, starts) / counts).tolist()
 
 
-def organize_text_into_grid(page_data, line_tolerance=15):
+def assign_columns(x_positions, column_positions):
     """
-    Organiza textos em grid (linhas x colunas)
-    Versão SIMPLIFICADA e mais robusta
+    Retorna o índice da coluna mais próxima de cada X
+    column_positions precisa estar ordenado (empate fica com a coluna da esquerda)
     """
-    if not page_data:
-        return []
+    columns = np.asarray(column_positions, dtype=float)
+    if columns.size == 1:
+        return np.zeros(len(x_positions), dtype=np.intp)
     
-    # Ordenar por Y, depois X
-    page_data.sort(key=lambda x: (x[0], x[1]))
+    right = np.clip(np.searchsorted(columns, x_positions), 1, columns.size - 1)
+    left = right - 1
+    closer_left = np.abs(x_positions - columns[left]) <= np.abs(columns[right] - x_positions)
+    return np.where(closer_left, left, right)
+
+
+# ============================================================================
+# TEMPLATES DE LAYOUT: colunas aprendidas por "impressão digital" da página
+# ============================================================================
+LAYOUT_TEMPLATE_MAX = 256  # Máximo de layouts mantidos em memória (LRU)
+LAYOUT_TEMPLATE_FIT_ERROR = 15.0  # Erro médio (px) acima do qual reclusteriza
+LAYOUT_TEMPLATE_SPLIT = 60.0  # Desvio (px) de um X ao centro da coluna que indica coluna a mais
+LAYOUT_TEMPLATE_ALPHA = 0.2  # Peso da página nova ao ajustar as colunas
+LAYOUT_TEMPLATE_PATH = os.environ.get('LAYOUT_TEMPLATE_PATH')  # Persistência opcional (JSON)
+
+
+def page_fingerprint(page, zoom=RENDER_ZOOM, known=None):
+    """
+    Impressão digital do layout da página: tamanho + assinatura das réguas
+    verticais desenhadas no PDF (bordas de coluna, quantizadas em 5pt)
+    Réguas horizontais ficam de fora porque mudam com o número de linhas
     
-    # Agrupar em linhas baseado em Y
-    lines = []
-    current_line = []
-    current_y = None
+    Retorna None sem réguas (PDF escaneado): só o tamanho não identifica o
+    layout, e todos os scans do mesmo formato dividiriam um template
     
-    for y, x, text in page_data:
-        if current_y is None or abs(y - current_y) <= line_tolerance:
-            current_line.append((x, text, y))
-            current_y = y if current_y is None else min(current_y, y)
-        else:
-            if current_line:
-                # Ordenar linha por X
-                current_line.sort(key=lambda item: item[0])
-                lines.append(current_line)
-            current_line = [(x, text, y)]
-            current_y = y
-    
-    if current_line:
-        current_line.sort(key=lambda item: item[0])
-        lines.append(current_line)
+    known: dict do documento {tamanho da página: impressão digital}; só a
+    primeira página de cada tamanho percorre os desenhos (get_drawings custa
+    caro), as demais do mesmo tamanho herdam o layout dela
+    """
+    rect = page.rect
+    size = (round(rect.width), round(rect.height))
+    if known is not None and size in known:
+        return known[size]
     
-    # Detectar colunas
-    all_x = [x for line in lines for x, _, _ in line]
-    column_positions = cluster_columns_simple(all_x)
+    rulings = set()
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                p1, p2 = item[1], item[2]
+                if abs(p1.x - p2.x) < 1 and abs(p1.y - p2.y) > 5:
+                    rulings.add(round(p1.x / 5))
+            elif item[0] == 're':
+                rect = item[1]
+                if rect.height > 5:
+                    rulings.add(round(rect.x0 / 5))
+                    rulings.add(round(rect.x1 / 5))
     
-    if not column_positions:
-        return []
+    fingerprint = None
+    if rulings:
+        signature = hashlib.sha1(','.join(map(str, sorted(rulings))).encode()).hexdigest()[:16]
+        fingerprint = f"{zoom:g}:{rect.width:.0f}x{rect.height:.0f}:{signature}"
+    if known is not None:
+        known[size] = fingerprint
+    return fingerprint
+
+
+class LayoutTemplateCache:
+    """
+    Cache de colunas por layout de página (LRU, thread-safe)
     
-    # Criar grid
-    grid = []
-    for line in lines:
-        row = [""] * len(column_positions)
-        for x, text, _ in line:
-            # Encontrar coluna mais próxima
-            col_idx = min(range(len(column_positions)), 
-                         key=lambda i: abs(column_positions[i] - x))
-            # Concatenar se já tem texto nessa coluna
-            if row[col_idx]:
-                row[col_idx] += " " + text
-            else:
-                row[col_idx] = text
-        grid.append(row)
+    Páginas com a mesma impressão digital reaproveitam as colunas aprendidas;
+    se o template encaixa nos dois sentidos (erro médio <= limite, toda
+    coluna do template recebe texto e nenhum X se afasta mais que `split` do
+    centro da sua coluna, ou seja, o ajuste não pede coluna a mais) os centros
+    são ajustados incrementalmente, sem clusterizar a página; senão a página
+    reclusterizada vira o novo template
     
-    return grid
+    Templates novos só vão para o disco em flush(), no fim de cada documento
+    """
+
+    def __init__(self, max_templates=LAYOUT_TEMPLATE_MAX, fit_error=LAYOUT_TEMPLATE_FIT_ERROR,
+                 alpha=LAYOUT_TEMPLATE_ALPHA, path=LAYOUT_TEMPLATE_PATH, split=LAYOUT_TEMPLATE_SPLIT):
+        self.max_templates = max_templates
+        self.fit_error = fit_error
+        self.alpha = alpha
+        self.path = path
+        self.split = split
+        self.hits = 0
+        self.misses = 0
+        self.refits = 0
+        self._templates = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._templates.update(json.load(f))
+            print(f"📐 {len(self._templates)} template(s) de layout carregado(s)")
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar templates de layout: {e}")
 
+    def flush(self):
+        """Grava os templates se algum mudou desde a última gravação (fora do lock do cache)"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = dict(self._templates)
+                self._dirty = False
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                print(f"⚠️  Erro ao salvar templates de layout: {e}")
+
+    def _store(self, fingerprint, columns, persist):
+        with self._lock:
+            self._templates[fingerprint] = columns
+            self._templates.move_to_end(fingerprint)
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+            if persist:
+                self._dirty = True
+
+    def columns_for(self, fingerprint, x_positions):
+        """Retorna as posições das colunas para os X da página"""
+        xs = np.asarray(x_positions, dtype=float)
+        with self._lock:
+            template = self._templates.get(fingerprint)
+        
+        if template and xs.size:
+            columns = np.asarray(template, dtype=float)
+            col_ids = assign_columns(xs, columns)
+            deviation = np.abs(xs - columns[col_ids])
+            error = float(deviation.mean())
+            counts = np.bincount(col_ids, minlength=columns.size)
+            # Template com colunas sobrando "encaixa" em qualquer página: exigir
+            # que toda coluna receba texto. E colunas de menos também: um X longe
+            # do centro da sua coluna seria uma coluna a mais na clusterização
+            spread = np.zeros(columns.size)
+            np.maximum.at(spread, col_ids, deviation)
+            fitted_count = columns.size + int(np.count_nonzero(spread > self.split))
+            if error <= self.fit_error and counts.all() and fitted_count == columns.size:
+                # Ajuste incremental: aproxima cada centro da média dos X atribuídos
+                sums = np.bincount(col_ids, weights=xs, minlength=columns.size)
+                columns += self.alpha * (sums / counts - columns)
+                columns = np.sort(columns).tolist()
+                with self._lock:
+                    self.hits += 1
+                self._store(fingerprint, columns, persist=False)
+                return columns
+            with self._lock:
+                self.refits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+        
+        # Só clusteriza quando o template não existe ou não encaixa
+        clustered = cluster_columns_simple(xs)
+        if clustered:
+            self._store(fingerprint, clustered, persist=True)
+        return clustered
+
+
+layout_templates = LayoutTemplateCache()
 
-def get_table_y_position(table_df, all_text_data):
+
+def organize_text_into_grid(page_data, line_tolerance=15, fingerprint=None):
     """
-    Estima posição Y de uma tabela baseado no primeiro texto encontrado
+    Organiza textos em grid (linhas x colunas)
+    Versão SIMPLIFICADA e mais robusta, com o layout calculado em arrays NumPy
+    
+    page_data: lista de (y_topo, x, texto, y_base) em pixels da imagem
+    fingerprint: impressão digital do layout (usa o cache de templates de colunas)
+    Retorna (grid, row_bounds) - row_bounds tem o (y_min, y_max) real de cada
+    linha do grid, na mesma ordem
     """
-    if not all_text_data or table_df.empty:
-        return 0
+    if not page_data:
+        return [], []
+    
+    ys = np.array([item[0] for item in page_data], dtype=float)
+    xs = np.array([item[1] for item in page_data], dtype=float)
+    bottoms = np.array([item[3] for item in page_data], dtype=float)
+    
+    # Ordenar por Y, depois X (lexsort é estável, como o sort original)
+    order = np.lexsort((xs, ys))
+    ys, xs, bottoms = ys[order], xs[order], bottoms[order]
+    
+    # Agrupar em linhas: a linha termina no primeiro Y além da tolerância
+    # em relação ao Y inicial da linha
+    line_breaks = np.zeros(len(ys), dtype=np.intp)
+    start = int(np.searchsorted(ys, ys[0] + line_tolerance, side='right'))
+    while start < len(ys):
+        line_breaks[start] = 1
+        start = int(np.searchsorted(ys, ys[start] + line_tolerance, side='right'))
+    line_ids = np.cumsum(line_breaks)
+    
+    # Y real de cada linha: topo do primeiro texto e maior base da linha
+    line_starts = np.flatnonzero(np.diff(line_ids, prepend=-1))
+    row_bounds = list(zip(ys[line_starts].tolist(), np.maximum.reduceat(bottoms, line_starts).tolist()))
+    
+    # Ordenar cada linha por X (estável)
+    in_line_order = np.lexsort((xs, line_ids))
+    xs, line_ids = xs[in_line_order], line_ids[in_line_order]
+    texts = [page_data[i][2] for i in order[in_line_order]]
     
-    # Pegar primeira célula não-vazia da tabela
-    first_cell_text = None
-    for _, row in table_df.iterrows():
-        for cell in row:
-            if pd.notna(cell) and str(cell).strip():
-                first_cell_text = str(cell).strip().lower()
-                break
-        if first_cell_text:
-            break
+    # Detectar colunas (reaproveitando o template do layout quando houver)
+    if fingerprint:
+        column_positions = layout_templates.columns_for(fingerprint, xs)
+    else:
+        column_positions = cluster_columns_simple(xs)
     
-    if not first_cell_text:
-        return 0
+    if not column_positions:
+        return [], []
+    
+    # Encontrar coluna mais próxima de cada texto
+    col_ids = assign_columns(xs, column_positions)
     
-    # Procurar esse texto nos dados extraídos
-    for y, x, text in all_text_data:
-        if first_cell_text in text.lower():
-            return y
+    # Criar grid
+    grid = [[""] * len(column_positions) for _ in range(int(line_ids[-1]) + 1)]
+    for line_idx, col_idx, text in zip(line_ids.tolist(), col_ids.tolist(), texts):
+        row = grid[line_idx]
+        # Concatenar se já tem texto nessa coluna
+        if row[col_idx]:
+            row[col_idx] += " " + text
+        else:
+            row[col_idx] = text
     
-    # Fallback: meio da página
-    return np.mean([y for y, _, _ in all_text_data]) if all_text_data else 0
+    return grid, row_bounds
 
 
 @app.route('/health', methods=['GET'])
@@ -271,11 +504,16 @@ def process_pdf():
             pdf_path = tmp_file.name
         
         try:
-            ocr = get_ocr()
             pdf_document = fitz.open(pdf_path)
             num_pages = len(pdf_document)
             print(f"📄 {num_pages} página(s)")
             
+            # PDF gerado pela API TIFF com searchable=true: palavras do OCR já anexadas
+            cached_words = load_ocr_words(pdf_document) or {}
+            if cached_words:
+                print(f"⚡ OCR anexado ao PDF em {len(cached_words)} página(s), sem re-OCR")
+            ocr = None  # Carregado só se alguma página precisar de OCR
+            
             # ETAPA 1: Extrair tabelas com img2table
             all_tables = {}
             try:
@@ -297,83 +535,86 @@ def process_pdf():
             
             # ETAPA 2: Processar cada página
             all_pages_data = []
+            buffer_pool = PageBufferPool()
+            page_layouts = {}  # Impressão digital por tamanho de página (uma vez por documento)
             
             for page_num in range(num_pages):
                 print(f"📖 Página {page_num + 1}/{num_pages}...")
                 
                 page = pdf_document[page_num]
                 
-                # Converter para imagem
-                mat = fitz.Matrix(2.0, 2.0)
-                pix = page.get_pixmap(matrix=mat)
-                img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(
-                    pix.height, pix.width, pix.n
-                )
-                if pix.n == 4:
-                    img_array = img_array[:, :, :3]
+                fingerprint = page_fingerprint(page, known=page_layouts)
                 
-                # Pré-processar imagem (com fallback)
-                try:
-                    processed_img = preprocess_image(img_array)
-                except Exception as e:
-                    print(f"⚠️  Erro no pré-processamento, usando imagem original: {e}")
-                    processed_img = img_array
+                # Indexar bboxes das tabelas (para evitar duplicação)
+                page_tables = all_tables.get(page_num, [])
+                table_bboxes = get_table_bboxes(all_tables, page_num)
+                table_index = TableSpatialIndex(table_bboxes)
                 
-                # Garantir que imagem tem 3 canais (RGB) para PaddleOCR
-                if len(processed_img.shape) == 2:
-                    processed_img = cv2.cvtColor(processed_img, cv2.COLOR_GRAY2RGB)
-                elif processed_img.shape[2] == 4:
-                    processed_img = processed_img[:, :, :3]
-                
-                # OCR
-                result = ocr.predict(processed_img)
-                
-                # Extrair textos das tabelas (para evitar duplicação)
-                table_texts = extract_table_texts_simple(all_tables, page_num)
-                
-                # Extrair palavras com coordenadas
+                # Extrair textos com coordenadas (em pixels da renderização)
                 page_data = []
-                if result:
-                    for ocr_result in result:
-                        rec_texts = ocr_result.get('rec_texts', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_texts', [])
-                        rec_scores = ocr_result.get('rec_scores', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_scores', [])
-                        rec_polys = ocr_result.get('rec_polys', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_polys', [])
-                        
-                        for i, text in enumerate(rec_texts):
-                            if text and i < len(rec_scores) and rec_scores[i] > 0.5:
-                                # Verificar se não está na tabela
-                                if not is_text_in_table(text, table_texts):
+                if page_num in cached_words:
+                    # Caminho rápido: segmentos das palavras anexadas (pontos -> pixels)
+                    for text, bbox in words_to_segments(cached_words[page_num]):
+                        text_bbox = [value * RENDER_ZOOM for value in bbox]
+                        x, y, _, y_bottom = text_bbox
+                        if not is_text_in_table(text_bbox, table_index):
+                            page_data.append((y, x, text, y_bottom))
+                else:
+                    if ocr is None:
+                        ocr = get_ocr()
+                    
+                    # Renderizar direto em cinza, sem alpha (view zero-copy do pixmap)
+                    pix, gray = render_page_gray(page)
+                    
+                    # Pré-processar imagem (com fallback)
+                    try:
+                        processed_img = preprocess_image(gray, buffer_pool)
+                    except Exception as e:
+                        print(f"⚠️  Erro no pré-processamento, usando imagem original: {e}")
+                        processed_img = gray_to_rgb(gray, buffer_pool)
+                    
+                    # OCR
+                    result = ocr.predict(processed_img)
+                    del gray, pix
+                    
+                    if result:
+                        for ocr_result in result:
+                            rec_texts = ocr_result.get('rec_texts', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_texts', [])
+                            rec_scores = ocr_result.get('rec_scores', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_scores', [])
+                            rec_polys = ocr_result.get('rec_polys', []) if isinstance(ocr_result, dict) else getattr(ocr_result, 'rec_polys', [])
+                            
+                            for i, text in enumerate(rec_texts):
+                                if text and i < len(rec_scores) and rec_scores[i] > 0.5:
                                     if i < len(rec_polys) and rec_polys[i] is not None:
                                         poly = rec_polys[i]
                                         if len(poly) > 0:
-                                            y = min(point[1] for point in poly)
-                                            x = min(point[0] for point in poly)
-                                            page_data.append((y, x, text))
+                                            text_bbox = poly_to_bbox(poly)
+                                            x, y, _, y_bottom = text_bbox
+                                            # Verificar se não está na tabela
+                                            if not is_text_in_table(text_bbox, table_index):
+                                                page_data.append((y, x, text, y_bottom))
                 
                 # Organizar texto em grid
-                text_grid = organize_text_into_grid(page_data)
+                text_grid, row_bounds = organize_text_into_grid(page_data, fingerprint=fingerprint)
                 
                 # ETAPA 3: Combinar tabelas + texto em ordem Y
                 combined_rows = []
                 
-                # Criar lista de itens com posição Y
-                items_with_y = []
-                
-                # Adicionar linhas de texto
-                for row_idx, row in enumerate(text_grid):
-                    if any(cell.strip() for cell in row):  # Linha não-vazia
-                        # Estimar Y médio da linha
-                        y_estimate = row_idx * 50  # Estimativa simples
-                        items_with_y.append((y_estimate, 'text', row))
+                # Linhas de texto já saem do grid ordenadas pelo Y real (em pontos)
+                text_items = [
+                    (y_min / RENDER_ZOOM, 'text', row)
+                    for row, (y_min, _) in zip(text_grid, row_bounds)
+                    if any(cell.strip() for cell in row)  # Linha não-vazia
+                ]
                 
-                # Adicionar tabelas
-                if page_num in all_tables:
-                    for table in all_tables[page_num]:
-                        table_y = get_table_y_position(table.df, page_data)
-                        items_with_y.append((table_y, 'table', table.df))
+                # Tabelas ordenadas pelo topo da bbox (em pontos)
+                table_items = sorted(
+                    ((bbox[1], 'table', table.df) for bbox, table in zip(table_bboxes, page_tables)),
+                    key=lambda item: item[0]
+                )
                 
-                # Ordenar por Y e montar resultado final
-                items_with_y.sort(key=lambda x: x[0])
+                # Merge das duas sequências já ordenadas (texto primeiro em empate)
+                items_with_y = heapq.merge(text_items, table_items, key=lambda item: item[0])
                 
                 for _, item_type, item_data in items_with_y:
                     if item_type == 'table':
@@ -403,6 +644,9 @@ def process_pdf():
                     df = pd.DataFrame([["Nenhum conteúdo encontrado"]])
                     all_pages_data.append((page_num + 1, df))
             
+            # Templates aprendidos neste documento vão para o disco uma vez só
+            layout_templates.flush()
+            
             # ETAPA 4: Criar Excel
             excel_buffer = io.BytesIO()
             with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
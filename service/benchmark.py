@@ -0,0 +1,393 @@
+"""
+Benchmark ponta a ponta de /process-pdf, /compress-pdf e /convert
+As requisições rodam em processo, sem rede: o app ASGI do serviço unificado
+via httpx.ASGITransport, ou (com --alvo flask) a API Flask pelo test client
+e a API TIFF pelo ASGI. A entrada é o corpus de validation/gerar_pdf_teste.py.
+Para cada etapa e concorrência registra latência (p50/p95/p99), páginas/s,
+tempo de CPU e pico de RSS, grava tudo em JSON e, com --baseline, falha
+(código de saída 1) se o throughput cair mais que a tolerância.
+
+O pool de CPU roda em threads por padrão (TIFF_POOL=thread), para que CPU e
+memória do trabalho pesado entrem na medição do processo.
+
+Uso:
+    cd service
+    python benchmark.py --corpus ../validation/corpus --concorrencia 1 4
+    python benchmark.py --corpus ../validation/corpus --baseline baseline.json --tolerancia 0.10
+"""
+
+import os
+import sys
+
+os.environ.setdefault('TIFF_POOL', 'thread')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SERVICE_DIR)
+for _path in (SERVICE_DIR, os.path.join(ROOT_DIR, 'api'), os.path.join(ROOT_DIR, 'tiff-to-pdf-api'),
+              os.path.join(ROOT_DIR, 'validation'), ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+# Etapas: endpoint e tipos de arquivo do corpus usados
+ETAPAS = {
+    'process-pdf': {'rota': '/process-pdf', 'tipos': ('digital', 'scan'), 'mime': 'application/pdf'},
+    'compress-pdf': {'rota': '/compress-pdf', 'tipos': ('digital', 'scan'), 'mime': 'application/pdf'},
+    'convert': {'rota': '/convert', 'tipos': ('tiff',), 'mime': 'image/tiff'},
+}
+# Perfis gerados quando a pasta do corpus ainda não tem manifesto.json
+PERFIS_PADRAO = ['digital_p001', 'digital_p010_bordas', 'scan_200dpi_leve', 'tiff_200dpi_g4']
+AMOSTRAGEM_RSS = 0.02  # segundos entre leituras do RSS
+
+
+def rss_atual():
+    """RSS do processo em bytes (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def rss_maximo():
+    """Pico de RSS do processo desde o início, em bytes"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def tempo_cpu():
+    """CPU (usuário + sistema) do processo e dos filhos já finalizados"""
+    tempos = os.times()
+    return tempos.user + tempos.system + tempos.children_user + tempos.children_system
+
+
+class MonitorMemoria:
+    """
+    Pico de RSS durante uma etapa, amostrado numa thread
+    (ru_maxrss é o pico do processo inteiro, não da etapa; é o fallback sem /proc)
+    """
+
+    def __init__(self, intervalo=AMOSTRAGEM_RSS):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while True:
+            rss = rss_atual()
+            if rss is None:
+                return
+            self.pico = max(self.pico, rss)
+            if self._parar.wait(self.intervalo):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        if not self.pico:
+            self.pico = rss_maximo()
+
+
+class ClienteASGI:
+    """Requisições direto no app ASGI (httpx.ASGITransport, sem socket)"""
+
+    def __init__(self, app):
+        self._cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url='http://benchmark', timeout=None
+        )
+
+    async def enviar(self, etapa, caminho, dados):
+        config = ETAPAS[etapa]
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+        resposta = await self._cliente.post(
+            config['rota'],
+            files={'file': (os.path.basename(caminho), conteudo, config['mime'])},
+            data=dados
+        )
+        return resposta.status_code
+
+    async def fechar(self):
+        await self._cliente.aclose()
+
+
+class ClienteFlask:
+    """API Flask pelo test client (em threads, para haver concorrência)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _enviar(self, etapa, caminho, dados):
+        with open(caminho, 'rb') as f, self.app.test_client() as cliente:
+            resposta = cliente.post(
+                ETAPAS[etapa]['rota'],
+                data={**dados, 'file': (f, os.path.basename(caminho))},
+                content_type='multipart/form-data'
+            )
+        return resposta.status_code
+
+    async def enviar(self, etapa, caminho, dados):
+        return await asyncio.to_thread(self._enviar, etapa, caminho, dados)
+
+    async def fechar(self):
+        pass
+
+
+def criar_clientes(alvo, usar_cache):
+    """
+    Clientes por etapa e a função que encerra os pools no fim
+
+    Returns:
+        tuple: ({etapa: cliente}, encerrar)
+    """
+    import main as tiff_api
+
+    if alvo == 'servico':
+        import server
+        # Limites por IP e cache distorcem o benchmark (todas as requisições vêm do mesmo "IP")
+        server.process_pdf_limiter.limit = float('inf')
+        server.compress_pdf_limiter.limit = float('inf')
+        if not usar_cache:
+            server.result_cache.max_bytes = 0
+        cliente = ClienteASGI(server.app)
+
+        def encerrar():
+            tiff_api.shutdown_executor()
+            server.shutdown_ocr()
+        return {etapa: cliente for etapa in ETAPAS}, encerrar
+
+    import pdf_ocr_api
+    pdf_ocr_api.limiter.enabled = False
+    cliente_flask = ClienteFlask(pdf_ocr_api.app)
+    return {
+        'process-pdf': cliente_flask,
+        'compress-pdf': cliente_flask,
+        'convert': ClienteASGI(tiff_api.app),
+    }, tiff_api.shutdown_executor
+
+
+def carregar_corpus(pasta):
+    """Lê o manifesto do corpus (gera os perfis padrão se a pasta ainda não tiver um)"""
+    manifesto_path = os.path.join(pasta, 'manifesto.json')
+    if not os.path.exists(manifesto_path):
+        from gerar_pdf_teste import SEMENTE_CORPUS, gerar_corpus
+        print(f"📚 Gerando corpus em {pasta} ({', '.join(PERFIS_PADRAO)})")
+        gerar_corpus(pasta, SEMENTE_CORPUS, PERFIS_PADRAO)
+
+    with open(manifesto_path, encoding='utf-8') as f:
+        manifesto = json.load(f)
+    for entrada in manifesto['arquivos']:
+        entrada['caminho'] = os.path.join(pasta, entrada['arquivo'])
+    return manifesto
+
+
+def percentis(latencias):
+    if not latencias:
+        return None
+    valores = np.asarray(latencias)
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 4),
+        'p95': round(float(p95), 4),
+        'p99': round(float(p99), 4),
+        'media': round(float(valores.mean()), 4),
+        'max': round(float(valores.max()), 4),
+    }
+
+
+async def medir_etapa(cliente, etapa, arquivos, concorrencia, repeticoes, dados):
+    """
+    Envia todos os arquivos da etapa (`repeticoes` vezes) com até `concorrencia` requisições simultâneas
+
+    Returns:
+        dict: Resultado da etapa
+    """
+    fila = [arquivo for _ in range(repeticoes) for arquivo in arquivos]
+    limite = asyncio.Semaphore(concorrencia)
+    latencias = []
+    status_erro = {}
+    paginas = 0
+
+    async def enviar(arquivo):
+        nonlocal paginas
+        async with limite:
+            inicio = time.perf_counter()
+            status = await cliente.enviar(etapa, arquivo['caminho'], dados)
+            duracao = time.perf_counter() - inicio
+        if status == 200:
+            latencias.append(duracao)
+            paginas += arquivo['paginas']
+        else:
+            status_erro[status] = status_erro.get(status, 0) + 1
+
+    cpu_inicio = tempo_cpu()
+    with MonitorMemoria() as memoria:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(enviar(arquivo) for arquivo in fila))
+        duracao = time.perf_counter() - inicio
+    cpu = tempo_cpu() - cpu_inicio
+
+    return {
+        'etapa': etapa,
+        'concorrencia': concorrencia,
+        'requisicoes': len(fila),
+        'erros': sum(status_erro.values()),
+        'status_erro': {str(status): n for status, n in status_erro.items()},
+        'paginas': paginas,
+        'tempo_s': round(duracao, 4),
+        'paginas_por_s': round(paginas / duracao, 3) if duracao else None,
+        'requisicoes_por_s': round(len(latencias) / duracao, 3) if duracao else None,
+        'latencia_s': percentis(latencias),
+        'cpu_s': round(cpu, 3),
+        'pico_rss_mb': round(memoria.pico / 1024 / 1024, 1),
+    }
+
+
+async def executar(args):
+    manifesto = carregar_corpus(args.corpus)
+    clientes, encerrar = criar_clientes(args.alvo, args.com_cache)
+    resultados = []
+    try:
+        for etapa in args.etapas:
+            arquivos = [
+                entrada for entrada in manifesto['arquivos']
+                if entrada['tipo'] in ETAPAS[etapa]['tipos']
+                and (not args.perfis or entrada['nome'] in args.perfis)
+            ]
+            if not arquivos:
+                print(f"⚠️  {etapa}: nenhum arquivo do corpus para esta etapa")
+                continue
+            dados = {'compression_level': args.nivel_compressao} if etapa == 'compress-pdf' else {}
+
+            # Aquecimento: carga de modelo/pool fora da medição
+            for arquivo in arquivos[:args.aquecimento]:
+                await clientes[etapa].enviar(etapa, arquivo['caminho'], dados)
+
+            for concorrencia in args.concorrencia:
+                resultado = await medir_etapa(
+                    clientes[etapa], etapa, arquivos, concorrencia, args.repeticoes, dados
+                )
+                resultados.append(resultado)
+                mostrar_resultado(resultado)
+    finally:
+        for cliente in {id(c): c for c in clientes.values()}.values():
+            await cliente.fechar()
+        encerrar()
+    return resultados
+
+
+def mostrar_resultado(resultado):
+    latencia = resultado['latencia_s'] or {}
+    print(
+        f"{resultado['etapa']:<13} c={resultado['concorrencia']:<3} "
+        f"{resultado['paginas_por_s'] or 0:>9.2f} pág/s  "
+        f"p50 {latencia.get('p50', 0):>7.3f}s  p95 {latencia.get('p95', 0):>7.3f}s  "
+        f"p99 {latencia.get('p99', 0):>7.3f}s  CPU {resultado['cpu_s']:>7.2f}s  "
+        f"RSS {resultado['pico_rss_mb']:>7.1f}MB"
+        + (f"  ❌ {resultado['erros']} erro(s) {resultado['status_erro']}" if resultado['erros'] else "")
+    )
+
+
+def comparar_baseline(resultados, baseline, tolerancia):
+    """
+    Compara páginas/s com o baseline (mesma etapa e concorrência)
+
+    Returns:
+        list: Regressões acima da tolerância
+    """
+    anteriores = {(r['etapa'], r['concorrencia']): r for r in baseline['etapas']}
+    regressoes = []
+    for resultado in resultados:
+        anterior = anteriores.get((resultado['etapa'], resultado['concorrencia']))
+        if not anterior or not anterior.get('paginas_por_s'):
+            continue
+        queda = 1 - (resultado['paginas_por_s'] or 0) / anterior['paginas_por_s']
+        situacao = '❌' if queda > tolerancia else '✅'
+        print(f"{situacao} {resultado['etapa']:<13} c={resultado['concorrencia']:<3} "
+              f"{anterior['paginas_por_s']:.2f} -> {resultado['paginas_por_s'] or 0:.2f} pág/s ({-queda:+.1%})")
+        if queda > tolerancia:
+            regressoes.append({
+                'etapa': resultado['etapa'],
+                'concorrencia': resultado['concorrencia'],
+                'baseline_paginas_por_s': anterior['paginas_por_s'],
+                'paginas_por_s': resultado['paginas_por_s'],
+                'queda': round(queda, 4),
+            })
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark em processo de /process-pdf, /compress-pdf e /convert")
+    parser.add_argument('--corpus', default=os.path.join(ROOT_DIR, 'validation', 'corpus'),
+                        help="Pasta do corpus (manifesto.json de gerar_pdf_teste.py --corpus)")
+    parser.add_argument('--perfis', nargs='+', help="Usar só estes arquivos do corpus (nomes dos perfis)")
+    parser.add_argument('--alvo', choices=['servico', 'flask'], default='servico',
+                        help="servico: app unificado (ASGI); flask: API Flask (test client) + API TIFF (ASGI)")
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=list(ETAPAS), help="Endpoints medidos")
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1], help="Requisições simultâneas")
+    parser.add_argument('--repeticoes', type=int, default=1, help="Vezes que cada arquivo é enviado")
+    parser.add_argument('--aquecimento', type=int, default=1, help="Requisições não medidas por etapa")
+    parser.add_argument('--nivel-compressao', default='medium', help="compression_level do /compress-pdf")
+    parser.add_argument('--com-cache', action='store_true', help="Manter o cache de respostas do serviço")
+    parser.add_argument('--saida', default='benchmark_resultado.json', help="Arquivo JSON com os resultados")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="Queda de páginas/s aceita (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    resultados = asyncio.run(executar(args))
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'alvo': args.alvo,
+        'corpus': os.path.abspath(args.corpus),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'TIFF_POOL': os.environ.get('TIFF_POOL'),
+            'TIFF_WORKERS': os.environ.get('TIFF_WORKERS'),
+        },
+        'parametros': {
+            'repeticoes': args.repeticoes,
+            'aquecimento': args.aquecimento,
+            'nivel_compressao': args.nivel_compressao,
+            'com_cache': args.com_cache,
+        },
+        'etapas': resultados,
+    }
+
+    regressoes = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n📏 Comparando com {args.baseline} (tolerância {args.tolerancia:.0%})")
+        regressoes = comparar_baseline(resultados, baseline, args.tolerancia)
+        relatorio['baseline'] = {'arquivo': args.baseline, 'tolerancia': args.tolerancia, 'regressoes': regressoes}
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\n🧾 Resultados: {args.saida}")
+
+    if regressoes:
+        print(f"❌ {len(regressoes)} regressão(ões) de throughput acima de {args.tolerancia:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+"""
+Serviço unificado (ASGI): OCR -> Excel, compressão de PDF e TIFF -> PDF
+Os endpoints das duas APIs rodam num único processo FastAPI e
+compartilham o mesmo pool de CPU, o cache de resultados e o /health.
+Nenhum trabalho pesado roda no event loop: compressão e páginas TIFF vão
+para o pool de CPU (processos ou threads, TIFF_POOL) e passam pela fila
+de conversões; o OCR tem pool de threads e fila próprios, para que um
+único PaddleOCR seja carregado no processo do serviço e OCRs lentos não
+tomem os slots das conversões.
+
+Uso:
+    cd service
+    uvicorn server:app --host 0.0.0.0 --port 8080
+"""
+
+import os
+import sys
+
+# As duas APIs continuam sendo módulos soltos nos seus diretórios; a raiz
+# (pacote shared/) fica na frente
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in (os.path.join(ROOT_DIR, 'api'), os.path.join(ROOT_DIR, 'tiff-to-pdf-api'), ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import asyncio
+import base64
+import hashlib
+import logging
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+import main as tiff_api
+import pdf_ocr_api
+import tiff_engine
+from shared import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+MAX_PDF_SIZE = 20 * 1024 * 1024  # /process-pdf (mesmo limite da API Flask)
+MAX_COMPRESS_SIZE = tiff_api.MAX_FILE_SIZE  # /compress-pdf (50MB)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_MB', '256')) * 1024 * 1024
+# Requisições por IP por hora (mesmos limites do flask-limiter da API Flask)
+PROCESS_PDF_LIMIT = int(os.getenv('PROCESS_PDF_LIMIT', '10'))
+COMPRESS_PDF_LIMIT = int(os.getenv('COMPRESS_PDF_LIMIT', '20'))
+POOL_POLL_INTERVAL = 0.5  # segundos entre verificações de cancelamento de um job no pool
+# OCR em threads (como o gunicorn da API Flask): o modelo (~1GB) não se repete por worker
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '2'))
+MAX_QUEUED_OCR = int(os.getenv('MAX_QUEUED_OCR', '8'))
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+class ResultCache:
+    """
+    Cache LRU das respostas por conteúdo do upload (sha256 + parâmetros),
+    limitado pelo total de bytes guardados
+    O mesmo PDF reenviado (retry do cliente, outra aba) não volta para o pool
+    Só é acessado pelo event loop, então não precisa de lock
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # chave -> (payload, bytes)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            metrics.CACHE.inc(cache='result', result='miss')
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.CACHE.inc(cache='result', result='hit')
+        return entry[0]
+
+    def put(self, key, payload, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        self._entries[key] = (payload, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class RateLimiter:
+    """
+    Limite de requisições por IP em janela fixa de 1 hora
+    (equivalente ao flask-limiter com storage memory:// da API Flask)
+    """
+
+    MAX_TRACKED = 10000  # IPs guardados antes de descartar as janelas vencidas
+
+    def __init__(self, limit: int, window: float = 3600.0):
+        self.limit = limit
+        self.window = window
+        self._windows = {}  # ip -> (início da janela, requisições)
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        start, count = self._windows.get(key, (now, 0))
+        if now - start >= self.window:
+            start, count = now, 0
+        if count >= self.limit:
+            return False
+        self._windows[key] = (start, count + 1)
+
+        if len(self._windows) > self.MAX_TRACKED:
+            self._windows = {
+                ip: window for ip, window in self._windows.items()
+                if now - window[0] < self.window
+            }
+        return True
+
+
+result_cache = ResultCache(RESULT_CACHE_SIZE)
+metrics.Gauge('result_cache_bytes', 'Bytes guardados no cache de respostas', func=lambda: result_cache.stats()['bytes'])
+process_pdf_limiter = RateLimiter(PROCESS_PDF_LIMIT)
+compress_pdf_limiter = RateLimiter(COMPRESS_PDF_LIMIT)
+
+# Criar app FastAPI
+app = FastAPI(
+    title="PDFUtilities API",
+    description="OCR de tabelas (PDF -> Excel), compressão de PDF e conversão TIFF -> PDF",
+    version="1.0.0"
+)
+
+# Configurar CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.middleware("http")
+async def security_headers(request: Request, call_next):
+    """Headers de segurança (os mesmos da API Flask)"""
+    response = await call_next(request)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['X-Frame-Options'] = 'DENY'
+    response.headers['X-XSS-Protection'] = '1; mode=block'
+    return response
+
+
+# Server-Timing + log JSON por requisição e métricas por rota (mesmos middlewares da API TIFF)
+app.middleware("http")(tiff_api.server_timing)
+app.middleware("http")(tiff_api.request_metrics)
+
+
+# Rotas da API TIFF (/convert, /convert/batch, /convert/info, /metrics); / e /health são do serviço
+for _route in tiff_api.app.router.routes:
+    if isinstance(_route, APIRoute) and _route.path not in ('/', '/health'):
+        app.router.routes.append(_route)
+app.router.add_event_handler("shutdown", tiff_api.shutdown_executor)
+
+
+def run_in_pool(func, *args, cancel_check=None, executor=None, max_pending=None):
+    """
+    Roda `func(*args)` no pool de CPU compartilhado e espera o resultado
+    Usado como `convert` em tiff_api.run_conversion, que já cuida da fila,
+    do limite de jobs simultâneos e da desconexão do cliente, e repassa o
+    pool recebido em `executor`
+
+    Se a conversão for cancelada antes de o job começar, ele sai do pool;
+    um job já em execução não é interrompido, mas o slot só é liberado
+    quando ele termina (a CPU continua contabilizada)
+    As etapas medidas no pool voltam com o resultado (tracing.run_traced)
+    """
+    traced = tracing.active()
+    future = executor.submit(tracing.run_traced, func, *args) if traced else executor.submit(func, *args)
+    while True:
+        try:
+            result = future.result(timeout=POOL_POLL_INTERVAL)
+        except FuturesTimeout:
+            if cancel_check is not None and cancel_check() and future.cancel():
+                raise tiff_engine.ConversionCancelled("Job cancelado antes de começar")
+            continue
+        if traced:
+            result, spans = result
+            tracing.add_spans(spans)
+        return result
+
+
+# Pool e fila próprios do OCR: com TIFF_POOL=process cada processo carregaria o
+# próprio PaddleOCR (e o get_ocr/_unload_ocr ficaria nos filhos), e OCRs lentos
+# na fila das conversões deixariam /convert sem slot (503)
+ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix='ocr')
+ocr_jobs = tiff_api.ConversionQueue('ocr', OCR_WORKERS, MAX_QUEUED_OCR)
+
+
+def shutdown_ocr():
+    """Encerra o pool e a fila do OCR junto com a aplicação"""
+    ocr_jobs.shutdown()
+    ocr_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app.router.add_event_handler("shutdown", shutdown_ocr)
+
+
+def error_response(status_code: int, message: str) -> JSONResponse:
+    """Erro no formato da API Flask ({"error": ...}), que é o que o frontend lê"""
+    return JSONResponse(status_code=status_code, content={"error": message})
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else 'unknown'
+
+
+def file_digest(path: str) -> str:
+    """sha256 do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_base64(path: str) -> str:
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+@app.get("/")
+async def root():
+    """Health check básico"""
+    return {
+        "status": "online",
+        "service": "PDFUtilities API",
+        "version": "1.0.0",
+        "endpoints": {
+            "process_pdf": "/process-pdf",
+            "compress_pdf": "/compress-pdf",
+            "convert": "/convert",
+            "batch": "/convert/batch",
+            "info": "/convert/info",
+            "health": "/health",
+            "metrics": "/metrics"
+        }
+    }
+
+
+@app.get("/health")
+async def health_check():
+    """Health check detalhado: dependências, pool/fila compartilhados e cache"""
+    tiff_health = await tiff_api.health_check()
+    return {
+        "status": "healthy",
+        "service": "pdf-utilities",
+        "dependencies": {
+            **tiff_health["dependencies"],
+            "img2table": "ok",
+            "ghostscript": "ok" if shutil.which('gs') else "indisponível"
+        },
+        "conversions": tiff_health["conversions"],
+        "ocr": {"workers": OCR_WORKERS, **ocr_jobs.health()},
+        "cache": result_cache.stats()
+    }
+
+
+@app.post("/process-pdf")
+async def process_pdf(request: Request, file: UploadFile = File(...)):
+    """
+    Extrai as tabelas do PDF (img2table + PaddleOCR) e retorna o Excel em base64
+    Mesma resposta da API Flask
+    """
+    if not process_pdf_limiter.allow(client_ip(request)):
+        return error_response(429, f"Limite de {PROCESS_PDF_LIMIT} conversões por hora atingido")
+
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
+        return error_response(400, "Arquivo deve ser PDF")
+
+    pdf_path = None
+    try:
+        pdf_path, file_size = await tiff_api.spool_upload(file, suffix='.pdf', max_size=MAX_PDF_SIZE)
+        with tracing.span('digest'):
+            key = ('process-pdf', await asyncio.to_thread(file_digest, pdf_path))
+
+        payload = result_cache.get(key)
+        if payload is None:
+            logger.info(f"OCR: {key[1][:12]} ({file_size / 1024 / 1024:.2f}MB)")
+            excel_bytes = await tiff_api.run_conversion(
+                request, run_in_pool, pdf_ocr_api.pdf_to_excel, pdf_path,
+                queue=ocr_jobs, executor=ocr_executor
+            )
+            with tracing.span('base64'):
+                excel_base64 = await asyncio.to_thread(lambda: base64.b64encode(excel_bytes).decode('utf-8'))
+            payload = {"success": True, "excel_base64": excel_base64}
+            result_cache.put(key, payload, len(excel_base64))
+        else:
+            logger.info(f"OCR: {key[1][:12]} servido do cache")
+
+        return {**payload, "filename": file.filename.replace('.pdf', '_OCR.xlsx')}
+
+    except HTTPException as e:
+        return error_response(e.status_code, e.detail)
+    except Exception as e:
+        logger.error(f"Erro no OCR: {str(e)}")
+        return error_response(500, f"Erro ao processar PDF: {str(e)}")
+    finally:
+        if pdf_path:
+            tiff_api.remove_files(pdf_path)
+
+
+@app.post("/compress-pdf")
+async def compress_pdf(
+    request: Request,
+    file: UploadFile = File(...),
+    compression_level: str = Form('medium')
+):
+    """
+    Comprime o PDF (Ghostscript para escaneados, PyMuPDF para PDFs com texto)
+    Mesma resposta da API Flask
+    """
+    if not compress_pdf_limiter.allow(client_ip(request)):
+        return error_response(429, f"Limite de {COMPRESS_PDF_LIMIT} compressões por hora atingido")
+
+    if not file.filename:
+        return error_response(400, "Nome de arquivo vazio")
+    if not file.filename.lower().endswith('.pdf'):
+        return error_response(400, "Apenas arquivos PDF são aceitos")
+
+    input_path = None
+    output_path = None
+    try:
+        input_path, _ = await tiff_api.spool_upload(file, suffix='.pdf', max_size=MAX_COMPRESS_SIZE)
+        with tracing.span('digest'):
+            key = ('compress-pdf', await asyncio.to_thread(file_digest, input_path), compression_level)
+
+        payload = result_cache.get(key)
+        if payload is None:
+            fd, output_path = tempfile.mkstemp(suffix='_compressed.pdf')
+            os.close(fd)
+            stats = await tiff_api.run_conversion(
+                request, run_in_pool, pdf_ocr_api.compress_pdf_file,
+                input_path, output_path, compression_level,
+                executor=tiff_api.get_executor()
+            )
+            with tracing.span('base64'):
+                pdf_base64 = await asyncio.to_thread(file_base64, output_path)
+            payload = {"success": True, "pdf": pdf_base64, **stats}
+            result_cache.put(key, payload, len(pdf_base64))
+
+        return {**payload, "filename": file.filename.replace('.pdf', '_comprimido.pdf')}
+
+    except HTTPException as e:
+        return error_response(e.status_code, e.detail)
+    except Exception as e:
+        logger.error(f"Erro na compressão: {str(e)}")
+        return error_response(500, f"Erro ao comprimir PDF: {str(e)}")
+    finally:
+        tiff_api.remove_files(*[path for path in (input_path, output_path) if path])
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT', 8080)))
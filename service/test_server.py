@@ -0,0 +1,143 @@
+"""
+Testes do serviço unificado (app FastAPI em processo, sem servidor)
+Rodar com: python -m pytest test_server.py
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault('TIFF_POOL', 'thread')
+
+# Dependências da API OCR (api/requirements.txt)
+pytest.importorskip('flask')
+fitz = pytest.importorskip('fitz')
+pytest.importorskip('img2table')
+
+from fastapi.testclient import TestClient
+
+import server  # põe api/, tiff-to-pdf-api/ e a raiz (pacote shared) no sys.path
+import pdf_ocr_api
+
+
+class LightOCR:
+    """No lugar do PaddleOCR: o teste mede o ciclo de vida do modelo, não o OCR"""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+
+class NoTablesPDF:
+    """No lugar do img2table: nenhuma tabela em nenhuma página"""
+
+    def __init__(self, src):
+        self.src = src
+
+    def extract_tables(self, **kwargs):
+        return {}
+
+
+class ConnectedRequest:
+    """Request que nunca desconecta"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+def pdf_bytes(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f'Página {number + 1} - {time.time_ns()}')
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def metric_value(text: str, sample: str) -> float:
+    """Valor de uma amostra do /metrics (0 se ela ainda não existe)"""
+    match = re.search(rf'^{re.escape(sample)} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_process_pdf_ocr_counters_show_up_in_metrics(monkeypatch):
+    monkeypatch.setattr(pdf_ocr_api, 'Img2TableOCR', LightOCR)
+    monkeypatch.setattr(pdf_ocr_api, 'Img2TablePDF', NoTablesPDF)
+    monkeypatch.setattr(pdf_ocr_api, '_ocr_instance', None)
+    # Descarrega logo depois do uso (o timer roda numa thread do próprio processo)
+    monkeypatch.setattr(pdf_ocr_api, 'OCR_UNLOAD_TIMEOUT', 0.2)
+
+    # Sem `with`: o shutdown da app encerraria os pools usados pelos outros testes
+    client = TestClient(server.app)
+    before = client.get('/metrics').text
+
+    response = client.post('/process-pdf', files={'file': ('tabela.pdf', pdf_bytes(3), 'application/pdf')})
+    assert response.status_code == 200
+    assert response.json()['success'] is True
+
+    after = client.get('/metrics').text
+    assert metric_value(after, 'pages_processed_total{operation="process-pdf"}') == \
+        metric_value(before, 'pages_processed_total{operation="process-pdf"}') + 3
+    assert metric_value(after, 'ocr_model_events_total{event="load"}') == \
+        metric_value(before, 'ocr_model_events_total{event="load"}') + 1
+    assert metric_value(after, 'cache_requests_total{cache="ocr_model",result="miss"}') == \
+        metric_value(before, 'cache_requests_total{cache="ocr_model",result="miss"}') + 1
+    assert metric_value(after, 'ocr_model_load_seconds_count') == \
+        metric_value(before, 'ocr_model_load_seconds_count') + 1
+    assert metric_value(after, 'ocr_model_loaded') == 1
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        unloaded = client.get('/metrics').text
+        if metric_value(unloaded, 'ocr_model_loaded') == 0:
+            break
+        time.sleep(0.05)
+    assert metric_value(unloaded, 'ocr_model_loaded') == 0
+    assert metric_value(unloaded, 'ocr_model_events_total{event="unload"}') == \
+        metric_value(before, 'ocr_model_events_total{event="unload"}') + 1
+
+
+def test_ocr_burst_does_not_take_conversion_slots(monkeypatch):
+    tiff_api = server.tiff_api
+    monkeypatch.setattr(tiff_api, 'DISCONNECT_POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(tiff_api, '_executor', None)
+    release = threading.Event()
+
+    def slow_ocr(pdf_path):
+        release.wait(5)
+        return b'xlsx'
+
+    def instant_convert(value, cancel_check=None, executor=None, max_pending=None):
+        return value
+
+    async def scenario():
+        # Semáforos criados dentro do event loop do teste
+        monkeypatch.setattr(server.ocr_jobs, 'slots', asyncio.Semaphore(server.ocr_jobs.max_concurrent))
+        monkeypatch.setattr(tiff_api.conversions, 'slots', asyncio.Semaphore(1))
+        request = ConnectedRequest()
+
+        # Todas as threads de OCR ocupadas e mais um OCR na fila do OCR
+        burst = [
+            asyncio.ensure_future(tiff_api.run_conversion(
+                request, server.run_in_pool, slow_ocr, 'a.pdf',
+                queue=server.ocr_jobs, executor=server.ocr_executor
+            ))
+            for _ in range(server.ocr_jobs.max_concurrent + 1)
+        ]
+        await asyncio.sleep(0.1)
+        assert server.ocr_jobs.stats['queued'] == 1
+        assert tiff_api.conversions.stats['queued'] == tiff_api.conversions.stats['running'] == 0
+
+        # A conversão TIFF não espera pelos OCRs
+        assert await asyncio.wait_for(tiff_api.run_conversion(request, instant_convert, 'c'), 2) == 'c'
+        # e o OCR não criou o pool de páginas
+        assert tiff_api._executor is None
+
+        release.set()
+        assert await asyncio.gather(*burst) == [b'xlsx'] * len(burst)
+        assert server.ocr_jobs.stats['queued'] == server.ocr_jobs.stats['running'] == 0
+
+    asyncio.run(scenario())
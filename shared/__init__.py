@@ -0,0 +1,6 @@
+"""
+Módulos comuns às duas APIs e ao serviço unificado (tracing, metrics)
+
+Importados como pacote (`from shared import metrics, tracing`); o ponto de
+entrada de cada app põe a raiz do repositório no início do sys.path.
+"""
@@ -0,0 +1,221 @@
+"""
+Métricas no formato texto do Prometheus (endpoint /metrics)
+
+Contadores, gauges e histogramas em memória, sem dependências: cada
+métrica tem nome, ajuda e labels fixos, e render() gera o texto servido
+em /metrics. As métricas de processo (RSS, CPU, threads, início) são lidas
+na hora do scrape. Um Counter/Gauge criado com `func` não guarda valor:
+func() é chamado no render e devolve o número (ou {labels: número}).
+
+Os valores são do processo: com vários workers (gunicorn) ou com o pool em
+processos, cada processo tem os seus. Quando um worker reinicia
+(max_requests) os contadores voltam a zero, o que o Prometheus trata
+como reset (rate/increase continuam corretos).
+
+Módulo único das duas APIs e do serviço unificado (pacote shared/,
+importado com `from shared import metrics`), então no serviço as métricas das duas
+APIs saem no mesmo registro.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Requisições vão de milissegundos (/health) a minutos (OCR de PDFs grandes)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_registry = {}  # nome -> métrica (recriar com o mesmo nome substitui)
+_START_TIME = time.time()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), func=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.func = func
+        self._values = {}  # tupla de valores dos labels -> valor
+        _registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.label_names)
+
+    def _samples(self):
+        if self.func is None:
+            return list(self._values.items())
+        value = self.func()
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return list(value.items())
+        return [((), value)]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Contador crescente (total de requisições, páginas, eventos...)"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (requisições em andamento, modelo carregado...)"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribuição em buckets cumulativos (_bucket, _sum, _count)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [contagem por bucket (+Inf no fim), soma]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Texto do /metrics com todas as métricas registradas"""
+    with _lock:
+        lines = []
+        for metric in _registry.values():
+            lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------------
+# Métricas de processo
+# ----------------------------------------------------------------------------
+
+def _rss_bytes():
+    """RSS atual em bytes (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+
+Gauge('process_resident_memory_bytes', 'Memória residente (RSS) do processo em bytes', func=_rss_bytes)
+Counter('process_cpu_seconds_total', 'CPU (usuário + sistema) usada pelo processo', func=_cpu_seconds)
+Gauge('process_start_time_seconds', 'Início do processo (epoch); muda a cada reinício do worker',
+      func=lambda: _START_TIME)
+Gauge('process_threads', 'Threads Python ativas', func=threading.active_count)
+
+# ----------------------------------------------------------------------------
+# Requisições HTTP
+# ----------------------------------------------------------------------------
+
+REQUESTS = Counter('http_requests_total', 'Requisições atendidas', ('method', 'endpoint', 'status'))
+LATENCY = Histogram('http_request_duration_seconds', 'Duração das requisições', ('method', 'endpoint'))
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requisições em andamento')
+IN_FLIGHT.set(0)
+
+
+def observe_request(method: str, endpoint: str, status: int, seconds: float) -> None:
+    """Registra uma requisição concluída (endpoint = rota, não o caminho bruto)"""
+    REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+    LATENCY.observe(seconds, method=method, endpoint=endpoint)
+
+
+# ----------------------------------------------------------------------------
+# Processamento
+# ----------------------------------------------------------------------------
+
+PAGES = Counter('pages_processed_total', 'Páginas processadas', ('operation',))
+
+# Ciclo de vida do PaddleOCR (get_ocr / _unload_ocr da API OCR)
+OCR_MODEL_EVENTS = Counter('ocr_model_events_total', 'Carregamentos e descargas do modelo OCR', ('event',))
+OCR_MODEL_LOADED = Gauge('ocr_model_loaded', 'Modelo OCR em memória (1) ou descarregado (0)')
+OCR_MODEL_LOAD_SECONDS = Histogram(
+    'ocr_model_load_seconds', 'Tempo para carregar o modelo OCR',
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+
+# Caches (cache="result" | "ocr_model" | "ocr_words")
+CACHE = Counter('cache_requests_total', 'Consultas aos caches', ('cache', 'result'))
+
+
+def _cache_hit_ratio() -> dict:
+    totals = {}
+    for (cache, result), count in list(CACHE._values.items()):
+        hits, total = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), total + count)
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+Gauge('cache_hit_ratio', 'Acertos / consultas de cada cache desde o início do processo', ('cache',),
+      func=_cache_hit_ratio)
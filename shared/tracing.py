@@ -0,0 +1,139 @@
+"""
+Tempos por etapa das requisições (header Server-Timing + log JSON)
+
+Cada requisição abre um trace (start/finish, chamados pelo middleware) e
+o código das etapas marca os trechos com `with span('etapa'):`. Etapas
+repetidas (ex.: uma vez por página) são somadas. Sem trace ativo
+(TRACING=0 ou fora de uma requisição) span() devolve um contexto vazio
+compartilhado: o custo é uma leitura de ContextVar.
+
+Trabalho em outra thread ou processo não enxerga o trace da requisição:
+run_traced() roda a função com um trace próprio e devolve (resultado,
+etapas), que o chamador junta ao trace dele com add_spans().
+
+Módulo único das duas APIs e do serviço unificado (pacote shared/,
+importado com `from shared import tracing`).
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import time
+
+TRACING_ENABLED = os.getenv('TRACING', '1').lower() not in ('0', 'false', 'no')
+
+logger = logging.getLogger('tracing')
+
+_current = contextvars.ContextVar('trace', default=None)
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Trace:
+    """Etapas de uma requisição (ou de um job no pool): nome -> segundos"""
+
+    __slots__ = ('name', 'spans', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans = {}
+        self.start = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """Valor do header Server-Timing (durações em ms)"""
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(metrics)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name: str):
+    """Mede o bloco `with` como a etapa `name` do trace atual (no-op sem trace)"""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+def active() -> bool:
+    """True se há um trace aberto neste contexto"""
+    return _current.get() is not None
+
+
+def add_spans(spans: dict) -> None:
+    """Soma ao trace atual as etapas medidas em outra thread/processo"""
+    trace = _current.get()
+    if trace is not None:
+        for name, seconds in spans.items():
+            trace.add(name, seconds)
+
+
+def run_traced(func, *args, **kwargs):
+    """
+    Roda `func` com um trace próprio (para jobs em threads/processos do pool)
+
+    Returns:
+        tuple: (resultado de func, {etapa: segundos})
+    """
+    trace = Trace(getattr(func, '__name__', 'job'))
+    token = _current.set(trace)
+    try:
+        return func(*args, **kwargs), trace.spans
+    finally:
+        _current.reset(token)
+
+
+def start(name: str):
+    """
+    Abre o trace da requisição
+
+    Returns:
+        Token para finish(), ou None com o tracing desligado
+    """
+    if not TRACING_ENABLED:
+        return None
+    return _current.set(Trace(name))
+
+
+def finish(token, **fields):
+    """
+    Fecha o trace aberto por start(): grava uma linha JSON no log
+
+    Args:
+        token: Retorno de start()
+        **fields: Campos extras do log (método, status...)
+
+    Returns:
+        str: Valor do header Server-Timing (None com o tracing desligado)
+    """
+    if token is None:
+        return None
+    trace = _current.get()
+    _current.reset(token)
+    total = time.perf_counter() - trace.start
+    logger.info(json.dumps({
+        'trace': trace.name,
+        **fields,
+        'total_ms': round(total * 1000, 1),
+        'spans_ms': {name: round(seconds * 1000, 1) for name, seconds in trace.spans.items()},
+    }, ensure_ascii=False))
+    return trace.server_timing(total)
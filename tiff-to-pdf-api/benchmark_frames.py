@@ -0,0 +1,83 @@
+"""
+Benchmark da conversão TIFF -> PDF: serial vs páginas em paralelo
+Gera TIFFs sintéticos que exigem recodificação (PackBits RGB) com
+quantidades crescentes de páginas e mede o tempo de cada modo
+
+Uso:
+    python benchmark_frames.py --pages 1 4 16 64 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Pacote shared/ (tracing, metrics) na raiz do repositório: no início do
+# sys.path para que nenhum pacote instalado com o mesmo nome tenha prioridade
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import tiff_engine
+
+
+def gerar_tiff(path: str, pages: int, width: int, height: int) -> None:
+    """Gera um TIFF multi-página com conteúdo pseudo-aleatório (seed fixa)"""
+    rng = np.random.default_rng(42)
+    # Blocos 8x8 aleatórios: comprime de forma realista (nem trivial, nem ruído puro)
+    blocks = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    base = np.repeat(np.repeat(blocks, 8, axis=0), 8, axis=1)[:height, :width]
+    frames = [Image.fromarray(np.roll(base, page * 13, axis=1)) for page in range(pages)]
+    frames[0].save(path, 'TIFF', save_all=True, append_images=frames[1:], compression='packbits', dpi=(200, 200))
+
+
+def medir(tiff_path: str, executor=None, max_pending: int = 8) -> float:
+    """Converte uma vez e retorna o tempo em segundos"""
+    fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        tiff_engine.convert_tiff_file(tiff_path, pdf_path, executor=executor, max_pending=max_pending)
+        return time.perf_counter() - start
+    finally:
+        os.unlink(pdf_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de conversão TIFF -> PDF em paralelo")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 4, 16, 64], help="Quantidades de páginas")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos no pool de páginas")
+    parser.add_argument('--width', type=int, default=2480, help="Largura da página (px)")
+    parser.add_argument('--height', type=int, default=3508, help="Altura da página (px)")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições (usa o melhor tempo)")
+    args = parser.parse_args()
+
+    print(f"Páginas {args.width}x{args.height} RGB PackBits, {args.workers} worker(s), melhor de {args.repeat}")
+    print(f"{'páginas':>8} {'serial (s)':>11} {'paralelo (s)':>13} {'speedup':>8}")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Aquecer o pool (criação dos processos não entra na medida)
+        list(executor.map(abs, range(args.workers)))
+
+        for pages in args.pages:
+            fd, tiff_path = tempfile.mkstemp(suffix='.tiff')
+            os.close(fd)
+            try:
+                gerar_tiff(tiff_path, pages, args.width, args.height)
+                serial = min(medir(tiff_path) for _ in range(args.repeat))
+                paralelo = min(
+                    medir(tiff_path, executor, max_pending=2 * args.workers)
+                    for _ in range(args.repeat)
+                )
+                print(f"{pages:>8} {serial:>11.3f} {paralelo:>13.3f} {serial / paralelo:>7.2f}x")
+            finally:
+                os.unlink(tiff_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Fixtures dos testes da API TIFF
+"""
+
+import asyncio
+
+import pytest
+
+import main
+
+# Script manual contra a API rodando (python test_api.py arquivo.tiff)
+collect_ignore = ['test_api.py']
+
+
+class ConnectedRequest:
+    """Request que nunca desconecta"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.fixture
+def connected_request():
+    return ConnectedRequest()
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    """Um único slot de conversão, sem pool de páginas"""
+    monkeypatch.setattr(main, 'get_executor', lambda: None)
+    monkeypatch.setattr(main, 'DISCONNECT_POLL_INTERVAL', 0.01)
+
+    def install() -> asyncio.Semaphore:
+        # Criado dentro do event loop do teste
+        slots = asyncio.Semaphore(1)
+        monkeypatch.setattr(main.conversions, 'slots', slots)
+        return slots
+    return install
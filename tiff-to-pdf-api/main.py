@@ -3,18 +3,38 @@ API para conversão de arquivos TIFF para PDF
 Suporta TIFF single e multi-página
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import io
+from starlette.background import BackgroundTask
+import os
+import json
+import shutil
+import sys
+import asyncio
+import zipfile
+import functools
 import logging
-from PIL import Image
-import img2pdf
-from typing import Optional
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import traceback
 import unicodedata
 import re
 
+# Pacote shared/ (tracing, metrics) na raiz do repositório: no início do
+# sys.path para que nenhum pacote instalado com o mesmo nome tenha prioridade
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from shared import metrics, tracing
+import tiff_engine
+import tiff_ocr
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,10 +55,121 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Tempos por etapa da requisição no header Server-Timing e no log (TRACING=0 desliga)"""
+    token = tracing.start(request.url.path)
+    try:
+        response = await call_next(request)
+    except Exception:
+        tracing.finish(token, method=request.method, status=500)
+        raise
+    header = tracing.finish(token, method=request.method, status=response.status_code)
+    if header:
+        response.headers['Server-Timing'] = header
+    return response
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    """Contagem, latência e requisições em andamento por rota (/metrics)"""
+    metrics.IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec()
+        # Rota (ex.: /convert) e não o caminho bruto: limita a cardinalidade
+        route = request.scope.get('route')
+        metrics.observe_request(
+            request.method, route.path if route else 'unmatched', status, time.perf_counter() - start
+        )
+
 # Configurações
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Uploads são gravados em disco em blocos de 1MB
 SUPPORTED_FORMATS = ['tiff', 'tif']
 
+# Lote (/convert/batch)
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', '500'))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', str(1024 * 1024 * 1024)))  # 1GB (já descompactado)
+
+# Pool de páginas (decodificar/recomprimir é CPU-bound e não pode rodar no event loop)
+# TIFF_POOL=process usa vários núcleos; TIFF_POOL=thread evita o custo de processos
+TIFF_POOL = os.getenv('TIFF_POOL', 'process')
+TIFF_WORKERS = int(os.getenv('TIFF_WORKERS', str(os.cpu_count() or 1)))
+# Páginas de um mesmo arquivo em andamento (convertidas e ainda não gravadas)
+TIFF_FRAME_WINDOW = int(os.getenv('TIFF_FRAME_WINDOW', str(2 * TIFF_WORKERS)))
+MAX_CONCURRENT_CONVERSIONS = int(os.getenv('MAX_CONCURRENT_CONVERSIONS', str(TIFF_WORKERS)))
+MAX_QUEUED_CONVERSIONS = int(os.getenv('MAX_QUEUED_CONVERSIONS', '32'))
+DISCONNECT_POLL_INTERVAL = 0.5  # segundos entre verificações de desconexão do cliente
+
+
+
+class ConversionQueue:
+    """
+    Fila de conversões: limita os jobs simultâneos (slots) e os que esperam
+    por um slot (acima de max_queued a requisição recebe 503), com os
+    contadores do /health e do /metrics
+    
+    Cada tipo de job pesado tem a sua fila (no serviço unificado o OCR tem
+    uma própria): jobs lentos de um tipo não tomam os slots do outro
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.stats = {
+            "queued": 0,
+            "running": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0
+        }
+        # Threads que orquestram cada job (ex.: leem os IFDs, gravam o PDF em ordem)
+        self.orchestrator = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f'{name}-conv')
+        conversion_queues.append(self)
+
+    def health(self) -> dict:
+        return {"max_concurrent": self.max_concurrent, "max_queued": self.max_queued, **self.stats}
+
+    def abandon_slot(self, acquire: asyncio.Future) -> None:
+        """
+        Desiste da espera por um slot
+        Cancela o acquire pendente; se ele já obteve o slot, devolve o slot
+        (senão o semáforo nunca mais volta ao valor original)
+        """
+        if not acquire.done():
+            acquire.cancel()
+        elif not acquire.cancelled() and acquire.exception() is None:
+            self.slots.release()
+
+    def shutdown(self) -> None:
+        self.orchestrator.shutdown(wait=False, cancel_futures=True)
+
+
+conversion_queues = []  # Todas as filas do processo (label "queue" das métricas)
+# Conversões TIFF -> PDF
+conversions = ConversionQueue('tiff', MAX_CONCURRENT_CONVERSIONS, MAX_QUEUED_CONVERSIONS)
+metrics.Gauge(
+    'conversion_jobs', 'Conversões na fila / em execução', ('queue', 'state'),
+    func=lambda: {(queue.name, state): queue.stats[state]
+                  for queue in conversion_queues for state in ('queued', 'running')}
+)
+metrics.Counter(
+    'conversion_jobs_total', 'Conversões encerradas por resultado', ('queue', 'outcome'),
+    func=lambda: {(queue.name, outcome): queue.stats[outcome]
+                  for queue in conversion_queues for outcome in ('completed', 'failed', 'cancelled', 'rejected')}
+)
+_executor: Optional[Executor] = None
+
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -84,7 +215,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "convert": "/convert",
-            "health": "/health"
+            "batch": "/convert/batch",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -97,96 +230,224 @@ async def health_check():
         "service": "tiff-to-pdf-api",
         "dependencies": {
             "pillow": "ok",
-            "img2pdf": "ok",
-            "fastapi": "ok"
+            "fastapi": "ok",
+            "tesseract": "ok" if tiff_ocr.ocr_available() else "indisponível"
+        },
+        "conversions": {
+            "pool": TIFF_POOL,
+            "workers": TIFF_WORKERS,
+            "frame_window": TIFF_FRAME_WINDOW,
+            **conversions.health()
         }
     }
 
 
-def detect_tiff_pages(image: Image.Image) -> int:
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas no formato do Prometheus (requisições, páginas, fila, memória)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def get_executor() -> Executor:
+    """
+    Retorna o pool de páginas (criado na primeira conversão)
+    Compartilhado por todas as conversões: o total de CPU fica limitado a TIFF_WORKERS
+    Processos usam 'spawn' para não herdar threads/event loop do uvicorn
+    """
+    global _executor
+    if _executor is None:
+        if TIFF_POOL == 'thread':
+            _executor = ThreadPoolExecutor(max_workers=TIFF_WORKERS, thread_name_prefix='tiff')
+        else:
+            _executor = ProcessPoolExecutor(
+                max_workers=TIFF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        logger.info(f"Pool de páginas criado: {TIFF_POOL} x {TIFF_WORKERS}")
+    return _executor
+
+
+def shutdown_executor():
+    """Encerra os pools de conversão junto com a aplicação"""
+    global _executor
+    conversions.shutdown()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+app.router.add_event_handler("shutdown", shutdown_executor)
+
+
+async def wait_unless_disconnected(request: Request, future: asyncio.Future) -> bool:
     """
-    Detecta número de páginas em um arquivo TIFF
+    Espera o future terminar, verificando periodicamente se o cliente desconectou
     
     Args:
-        image: Objeto PIL Image
+        request: Request da conversão
+        future: Tarefa/future a aguardar (não é cancelado aqui)
         
     Returns:
-        int: Número de páginas
+        bool: True se o future terminou, False se o cliente desconectou antes
     """
-    try:
-        n_frames = 0
-        while True:
-            try:
-                image.seek(n_frames)
-                n_frames += 1
-            except EOFError:
-                break
-        return n_frames
-    except Exception as e:
-        logger.error(f"Erro ao detectar páginas: {str(e)}")
-        return 1
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return True
+        if await request.is_disconnected():
+            return future.done()
 
 
-def tiff_to_pdf(tiff_bytes: bytes, optimize: bool = True) -> bytes:
+async def run_conversion(request: Request, convert, *args, queue: Optional[ConversionQueue] = None,
+                         executor: Optional[Executor] = None) -> object:
     """
-    Converte TIFF para PDF mantendo todas as páginas
+    Roda uma conversão do tiff_engine fora do event loop
+    Páginas CCITT G4 / JPEG / LZW / Deflate são embutidas com os dados
+    comprimidos originais; as demais são decodificadas e recodificadas em
+    paralelo no pool de páginas e gravadas na ordem original.
+    Respeita o limite de conversões simultâneas e cancela a conversão
+    (na fila ou em andamento) se o cliente desconectar
     
     Args:
-        tiff_bytes: Bytes do arquivo TIFF
-        optimize: Se True, otimiza o PDF final
+        request: Request da conversão
+        convert: tiff_engine.convert_tiff_file ou tiff_engine.merge_tiff_files
+        *args: Argumentos posicionais de `convert`
+        queue: Fila/limite do job (default: a das conversões TIFF)
+        executor: Pool repassado a `convert` (get_executor() para as páginas
+            TIFF; None converte na própria thread, sem criar o pool)
         
     Returns:
-        bytes: PDF gerado
+        Resultado de `convert`
     """
+    queue = queue or conversions
+    stats = queue.stats
+    if stats["queued"] >= queue.max_queued:
+        stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Servidor ocupado: fila de conversão cheia, tente novamente")
+    
+    # Esperar um slot livre (na fila)
+    stats["queued"] += 1
     try:
-        # Abrir TIFF com Pillow
-        tiff_image = Image.open(io.BytesIO(tiff_bytes))
-        
-        # Detectar número de páginas
-        num_pages = detect_tiff_pages(tiff_image)
-        logger.info(f"TIFF detectado com {num_pages} página(s)")
-        
-        # Se for single page, conversão direta
-        if num_pages == 1:
-            logger.info("Convertendo TIFF single-page")
-            pdf_bytes = img2pdf.convert(tiff_bytes)
-            return pdf_bytes
-        
-        # Se for multi-page, processar cada página
-        logger.info("Convertendo TIFF multi-page")
-        tiff_image = Image.open(io.BytesIO(tiff_bytes))
-        
-        images_bytes = []
-        for i in range(num_pages):
-            tiff_image.seek(i)
-            
-            # Converter para RGB se necessário
-            if tiff_image.mode not in ('RGB', 'L'):
-                img = tiff_image.convert('RGB')
-            else:
-                img = tiff_image.copy()
-            
-            # Salvar página como bytes
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG', optimize=optimize)
-            images_bytes.append(img_byte_arr.getvalue())
+        with tracing.span('queue'):
+            acquire = asyncio.ensure_future(queue.slots.acquire())
+            try:
+                acquired = await wait_unless_disconnected(request, acquire)
+            except asyncio.CancelledError:
+                # Tarefa cancelada na fila (ex.: lote abortado): o acquire não pode ficar órfão
+                queue.abandon_slot(acquire)
+                stats["cancelled"] += 1
+                raise
+            if not acquired:
+                queue.abandon_slot(acquire)
+                stats["cancelled"] += 1
+                raise HTTPException(status_code=499, detail="Conversão cancelada: cliente desconectou")
+    finally:
+        stats["queued"] -= 1
+    
+    cancelled = threading.Event()
+    stats["running"] += 1
+    try:
+        job_call = functools.partial(
+            convert, *args,
+            cancel_check=cancelled.is_set,
+            executor=executor,
+            max_pending=TIFF_FRAME_WINDOW
+        )
+        # A conversão roda em outra thread: as etapas voltam junto com o resultado
+        traced = tracing.active()
+        if traced:
+            job_call = functools.partial(tracing.run_traced, job_call)
+        job = asyncio.get_running_loop().run_in_executor(queue.orchestrator, job_call)
+        try:
+            finished = await wait_unless_disconnected(request, job)
+        except asyncio.CancelledError:
+            # Tarefa cancelada (ex.: resposta em streaming abortada)
+            cancelled.set()
+            stats["cancelled"] += 1
+            raise
         
-        # Converter todas as páginas para PDF
-        pdf_bytes = img2pdf.convert(images_bytes)
+        if not finished:
+            # Sinalizar a conversão e esperar ela parar (o slot só é liberado depois)
+            cancelled.set()
+            await asyncio.wait({job})
+            job.exception()
+            stats["cancelled"] += 1
+            logger.info("Cliente desconectou: conversão cancelada")
+            raise HTTPException(status_code=499, detail="Conversão cancelada: cliente desconectou")
         
-        logger.info(f"PDF gerado com sucesso: {len(pdf_bytes)} bytes")
-        return pdf_bytes
+        result = job.result()
+        if traced:
+            result, spans = result
+            tracing.add_spans(spans)
+        stats["completed"] += 1
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        stats["failed"] += 1
         logger.error(f"Erro na conversão: {str(e)}")
-        logger.error(traceback.format_exc())
         raise
+    finally:
+        stats["running"] -= 1
+        queue.slots.release()
+
+
+async def spool_upload(file: UploadFile, suffix: str = '.tiff', directory: Optional[str] = None,
+                       max_size: int = MAX_FILE_SIZE) -> Tuple[str, int]:
+    """
+    Grava o upload em arquivo temporário em blocos, validando o tamanho
+    durante a leitura (o arquivo nunca fica inteiro em memória)
+    
+    Args:
+        file: Arquivo enviado
+        suffix: Extensão do arquivo temporário
+        directory: Diretório do arquivo temporário (default: o do sistema)
+        max_size: Tamanho máximo aceito
+        
+    Returns:
+        Tuple[str, int]: Caminho do arquivo temporário e tamanho em bytes
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    size = 0
+    try:
+        with tracing.span('upload'), os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Arquivo muito grande. Tamanho máximo: {max_size / 1024 / 1024}MB"
+                    )
+                tmp.write(chunk)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Arquivo vazio")
+    except BaseException:
+        remove_files(path)
+        raise
+    
+    return path, size
+
+
+def remove_files(*paths: str) -> None:
+    """Remove arquivos temporários (ignora os que já não existem)"""
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
 
 
 @app.post("/convert")
 async def convert_tiff_to_pdf(
+    request: Request,
     file: UploadFile = File(...),
-    optimize: Optional[bool] = True
+    optimize: Optional[bool] = True,
+    searchable: Optional[bool] = False
 ):
     """
     Converte arquivo TIFF para PDF
@@ -194,11 +455,18 @@ async def convert_tiff_to_pdf(
     Args:
         file: Arquivo TIFF (single ou multi-página)
         optimize: Otimizar PDF final (default: True)
+        searchable: Adicionar camada de texto invisível via OCR (default: False)
         
     Returns:
         PDF file
     """
     
+    if searchable and not tiff_ocr.ocr_available():
+        raise HTTPException(
+            status_code=501,
+            detail="❌ OCR indisponível neste servidor (pytesseract/tesseract não instalados)"
+        )
+    
     # Validar nome do arquivo
     if not file.filename:
         raise HTTPException(status_code=400, detail="Nome do arquivo não fornecido")
@@ -219,41 +487,48 @@ async def convert_tiff_to_pdf(
             detail=f"❌ Tipo de arquivo inválido: {file.content_type}. Apenas TIFF é aceito."
         )
     
+    tiff_path = None
+    pdf_path = None
     try:
-        # Ler arquivo (usando repr para log seguro)
+        # Gravar upload em disco (usando repr para log seguro)
         logger.info(f"Recebendo arquivo: {repr(file.filename)}")
-        file_bytes = await file.read()
-        file_size = len(file_bytes)
-        
-        # Validar tamanho
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
-        
+        tiff_path, file_size = await spool_upload(file)
         logger.info(f"Arquivo recebido: {file_size} bytes")
         
         # Converter TIFF para PDF
-        pdf_bytes = tiff_to_pdf(file_bytes, optimize=optimize)
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            result = await run_conversion(
+                request, tiff_engine.convert_tiff_file, tiff_path, pdf_path, optimize, searchable,
+                executor=get_executor()
+            )
+        except ValueError as e:
+            # Estrutura TIFF inválida (detectada pelo walker de IFDs)
+            raise HTTPException(status_code=400, detail=f"❌ {str(e)}")
+        remove_files(tiff_path)
+        logger.info(f"TIFF convertido: {result['pages']} página(s), codecs: {result['encodings']}")
+        logger.info(f"PDF gerado com sucesso: {os.path.getsize(pdf_path)} bytes")
         
         # Gerar nome do arquivo de saída (sanitizado)
         sanitized_name = sanitize_filename(file.filename)
         output_filename = sanitized_name.rsplit('.', 1)[0] + '.pdf'
         
-        # Retornar PDF
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
+        # Retornar PDF direto do disco (arquivos removidos após o envio)
+        return FileResponse(
+            pdf_path,
             media_type="application/pdf",
             headers={
-                "Content-Disposition": f"attachment; filename=\"{output_filename}\"",
-                "Content-Length": str(len(pdf_bytes))
-            }
+                "Content-Disposition": f"attachment; filename=\"{output_filename}\""
+            },
+            background=BackgroundTask(remove_files, pdf_path)
         )
         
     except HTTPException:
+        remove_files(*[path for path in (tiff_path, pdf_path) if path])
         raise
     except Exception as e:
+        remove_files(*[path for path in (tiff_path, pdf_path) if path])
         logger.error(f"Erro ao processar arquivo: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(
@@ -262,6 +537,316 @@ async def convert_tiff_to_pdf(
         )
 
 
+def pdf_name_for(filename: str, used: set) -> str:
+    """Nome (sanitizado e único no lote) do PDF gerado para `filename`"""
+    base = sanitize_filename(os.path.basename(filename)).rsplit('.', 1)[0] or 'documento'
+    name = f"{base}.pdf"
+    counter = 2
+    while name in used:
+        name = f"{base}_{counter}.pdf"
+        counter += 1
+    used.add(name)
+    return name
+
+
+def extract_zip_entries(zip_path: str, source: str, workdir: str, max_files: int, max_bytes: int) -> Tuple[list, int]:
+    """
+    Extrai os TIFFs de um ZIP para `workdir`, com limites contra zip bomb:
+    número de arquivos, tamanho por arquivo e total do lote, contados nos
+    bytes realmente descompactados (o cabeçalho do ZIP pode mentir)
+    Taxa de compressão não é limitada: TIFFs P&B sem compressão comprimem
+    centenas de vezes legitimamente
+    
+    Args:
+        zip_path: Caminho do ZIP
+        source: Nome do ZIP enviado (vai para o manifesto)
+        workdir: Diretório de destino
+        max_files: Máximo de arquivos ainda aceitos no lote
+        max_bytes: Máximo de bytes ainda aceitos no lote
+        
+    Returns:
+        Tuple[list, int]: Entradas do manifesto e bytes extraídos
+    """
+    entries = []
+    used = 0
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            name = member.filename
+            base = os.path.basename(name)
+            # Pastas e metadados do macOS
+            if member.is_dir() or name.startswith('__MACOSX/') or base.startswith('._'):
+                continue
+            if len(entries) >= max_files:
+                raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo: {MAX_BATCH_FILES} arquivos")
+            
+            entry = {"filename": base, "source": source}
+            entries.append(entry)
+            if base.rsplit('.', 1)[-1].lower() not in SUPPORTED_FORMATS:
+                entry.update({"status": "error", "error": "Formato não suportado. Apenas TIFF é aceito (.tiff ou .tif)"})
+                continue
+            if member.file_size > MAX_FILE_SIZE:
+                entry.update({"status": "error", "error": f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE / 1024 / 1024}MB"})
+                continue
+            
+            fd, path = tempfile.mkstemp(suffix='.tiff', dir=workdir)
+            size = 0
+            try:
+                with os.fdopen(fd, 'wb') as target, archive.open(member) as data:
+                    while True:
+                        chunk = data.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if size > MAX_FILE_SIZE or used + size > max_bytes:
+                            break
+                        target.write(chunk)
+            except NotImplementedError:
+                # Subclasse de RuntimeError: precisa vir antes
+                remove_files(path)
+                entry.update({"status": "error", "error": "Método de compressão do ZIP não suportado"})
+                continue
+            except RuntimeError:
+                # zipfile recusa membros criptografados sem senha
+                remove_files(path)
+                entry.update({"status": "error", "error": "Arquivo protegido por senha no ZIP"})
+                continue
+            
+            if used + size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo: {MAX_BATCH_SIZE / 1024 / 1024}MB")
+            if size > MAX_FILE_SIZE:
+                remove_files(path)
+                entry.update({"status": "error", "error": f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE / 1024 / 1024}MB"})
+                continue
+            used += size
+            entry.update({"size_bytes": size, "path": path})
+    
+    return entries, used
+
+
+async def collect_batch(files: List[UploadFile], workdir: str) -> list:
+    """
+    Grava os arquivos do lote em `workdir` (TIFFs soltos e/ou ZIPs)
+    Arquivos inválidos entram no manifesto com erro, sem falhar o lote
+    
+    Args:
+        files: Arquivos enviados
+        workdir: Diretório temporário do lote
+        
+    Returns:
+        list: Entradas do manifesto (as válidas têm 'path')
+    """
+    entries = []
+    total = 0
+    for file in files:
+        filename = file.filename or ''
+        extension = filename.rsplit('.', 1)[-1].lower()
+        remaining_files = MAX_BATCH_FILES - len(entries)
+        
+        if extension == 'zip':
+            try:
+                zip_path, size = await spool_upload(file, '.zip', workdir, MAX_BATCH_SIZE - total)
+                extracted, size = await asyncio.to_thread(
+                    extract_zip_entries, zip_path, filename, workdir, remaining_files, MAX_BATCH_SIZE - total
+                )
+                remove_files(zip_path)
+            except zipfile.BadZipFile:
+                entries.append({"filename": filename, "status": "error", "error": "ZIP inválido"})
+                continue
+            entries.extend(extracted)
+            total += size
+            continue
+        
+        if remaining_files <= 0:
+            raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo: {MAX_BATCH_FILES} arquivos")
+        
+        entry = {"filename": filename}
+        entries.append(entry)
+        if extension not in SUPPORTED_FORMATS:
+            entry.update({"status": "error", "error": "Formato não suportado. Apenas TIFF é aceito (.tiff ou .tif)"})
+            continue
+        if total >= MAX_BATCH_SIZE:
+            raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo: {MAX_BATCH_SIZE / 1024 / 1024}MB")
+        try:
+            path, size = await spool_upload(file, '.tiff', workdir, min(MAX_FILE_SIZE, MAX_BATCH_SIZE - total))
+        except HTTPException as e:
+            entry.update({"status": "error", "error": e.detail})
+            continue
+        total += size
+        entry.update({"size_bytes": size, "path": path})
+    
+    return entries
+
+
+def public_manifest(entries: list) -> list:
+    """Manifesto sem os caminhos internos"""
+    return [{key: value for key, value in entry.items() if key != 'path'} for entry in entries]
+
+
+class ZipChunkBuffer:
+    """Destino (não-seekable) do ZipFile: acumula os bytes gravados para o streaming"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_batch_zip(request: Request, entries: list, workdir: str, optimize: bool):
+    """
+    Converte os arquivos do lote em paralelo e gera o ZIP de resposta em
+    streaming: cada PDF entra no ZIP assim que fica pronto, e o
+    manifest.json (com os erros por arquivo) fecha o ZIP
+    
+    Args:
+        request: Request do lote
+        entries: Entradas do manifesto (collect_batch)
+        workdir: Diretório temporário do lote (removido no final)
+        optimize: Otimizar PDFs
+        
+    Yields:
+        bytes: Pedaços do ZIP
+    """
+    buffer = ZipChunkBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED)
+    used_names = set()
+    # Um lote não ocupa mais que os slots de conversão (nem enche a fila sozinho)
+    batch_slots = asyncio.Semaphore(MAX_CONCURRENT_CONVERSIONS)
+    
+    async def convert_entry(entry: dict) -> Tuple[dict, str]:
+        pdf_path = entry['path'].rsplit('.', 1)[0] + '.pdf'
+        async with batch_slots:
+            try:
+                result = await run_conversion(
+                    request, tiff_engine.convert_tiff_file, entry['path'], pdf_path, optimize,
+                    executor=get_executor()
+                )
+                entry.update({
+                    "status": "ok",
+                    "pdf": pdf_names[id(entry)],
+                    "pages": result['pages'],
+                    "encodings": result['encodings']
+                })
+            except HTTPException as e:
+                if e.status_code == 499:
+                    raise
+                entry.update({"status": "error", "error": e.detail})
+            except Exception as e:
+                entry.update({"status": "error", "error": str(e)})
+            finally:
+                remove_files(entry['path'])
+        return entry, pdf_path
+    
+    # Nomes definidos na ordem do lote (não na ordem em que as conversões terminam)
+    pdf_names = {id(entry): pdf_name_for(entry['filename'], used_names) for entry in entries if entry.get('path')}
+    tasks = [asyncio.ensure_future(convert_entry(entry)) for entry in entries if entry.get('path')]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            entry, pdf_path = await next_done
+            if entry['status'] == 'ok':
+                with archive.open(entry['pdf'], 'w') as target, open(pdf_path, 'rb') as source:
+                    while True:
+                        chunk = source.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield buffer.drain()
+            remove_files(pdf_path)
+            data = buffer.drain()
+            if data:
+                yield data
+        
+        manifest = public_manifest(entries)
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+        archive.close()
+        yield buffer.drain()
+        
+        converted = sum(1 for entry in entries if entry.get('status') == 'ok')
+        logger.info(f"Lote convertido: {converted}/{len(entries)} arquivo(s)")
+    finally:
+        for task in tasks:
+            task.cancel()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@app.post("/convert/batch")
+async def convert_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    optimize: Optional[bool] = True,
+    merge: Optional[bool] = False
+):
+    """
+    Converte vários TIFFs de uma vez (arquivos soltos e/ou ZIPs de TIFFs)
+    
+    Args:
+        files: Arquivos TIFF e/ou ZIP
+        optimize: Otimizar PDFs (default: True)
+        merge: Se True, gera um único PDF com todos os arquivos (na ordem enviada)
+        
+    Returns:
+        ZIP em streaming (um PDF por arquivo + manifest.json) ou, com merge,
+        um único PDF com o manifesto anexado (manifest.json)
+    """
+    workdir = tempfile.mkdtemp(prefix='tiff-batch-')
+    try:
+        entries = await collect_batch(files, workdir)
+        logger.info(f"Lote recebido: {len(entries)} arquivo(s)")
+        
+        if not merge:
+            return StreamingResponse(
+                stream_batch_zip(request, entries, workdir, optimize),
+                media_type="application/zip",
+                headers={"Content-Disposition": "attachment; filename=\"pdfs.zip\""},
+                background=BackgroundTask(shutil.rmtree, workdir, True)
+            )
+        
+        pdf_path = os.path.join(workdir, 'merged.pdf')
+        await run_conversion(request, tiff_engine.merge_tiff_files, entries, pdf_path, optimize,
+                             executor=get_executor())
+        converted = sum(1 for entry in entries if entry.get('status') == 'ok')
+        if not converted:
+            shutil.rmtree(workdir, ignore_errors=True)
+            return JSONResponse(
+                status_code=422,
+                content={"detail": "Nenhum arquivo do lote foi convertido", "manifest": public_manifest(entries)}
+            )
+        
+        logger.info(f"Lote unido: {converted}/{len(entries)} arquivo(s)")
+        return FileResponse(
+            pdf_path,
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": "attachment; filename=\"lote.pdf\"",
+                "X-Batch-Files": str(len(entries)),
+                "X-Batch-Converted": str(converted),
+                "X-Batch-Failed": str(len(entries) - converted)
+            },
+            background=BackgroundTask(shutil.rmtree, workdir, True)
+        )
+        
+    except HTTPException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        logger.error(f"Erro ao processar lote: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao processar lote: {str(e)}"
+        )
+
+
 @app.post("/convert/info")
 async def get_tiff_info(file: UploadFile = File(...)):
     """
@@ -294,34 +879,47 @@ async def get_tiff_info(file: UploadFile = File(...)):
             detail=f"❌ Tipo de arquivo inválido: {file.content_type}. Apenas TIFF é aceito."
         )
     
+    tiff_path = None
     try:
-        file_bytes = await file.read()
-        tiff_image = Image.open(io.BytesIO(file_bytes))
+        tiff_path, file_size = await spool_upload(file)
         
-        num_pages = detect_tiff_pages(tiff_image)
-        tiff_image.seek(0)
+        # Só o cabeçalho e os IFDs são lidos - nenhum pixel é decodificado
+        try:
+            pages = tiff_engine.read_tiff_info(tiff_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"❌ {str(e)}")
+        if not pages:
+            raise HTTPException(status_code=400, detail="❌ TIFF inválido: nenhuma página encontrada")
+        
+        page_details = [tiff_engine.describe_page(page) for page in pages]
+        first_page = page_details[0]
         
         info = {
             "filename": file.filename,
-            "size_bytes": len(file_bytes),
-            "size_mb": round(len(file_bytes) / 1024 / 1024, 2),
-            "pages": num_pages,
-            "format": tiff_image.format,
-            "mode": tiff_image.mode,
-            "width": tiff_image.width,
-            "height": tiff_image.height,
-            "dpi": tiff_image.info.get('dpi', 'unknown')
+            "size_bytes": file_size,
+            "size_mb": round(file_size / 1024 / 1024, 2),
+            "pages": len(pages),
+            "format": "TIFF",
+            "mode": first_page["mode"],
+            "width": first_page["width"],
+            "height": first_page["height"],
+            "dpi": first_page["dpi"],
+            "page_details": page_details
         }
         
         return JSONResponse(content=info)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao obter informações: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao processar arquivo: {str(e)}"
         )
-
+    finally:
+        if tiff_path:
+            remove_files(tiff_path)
 
 if __name__ == "__main__":
     import uvicorn
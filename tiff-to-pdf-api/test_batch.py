@@ -0,0 +1,99 @@
+"""
+Testes do lote (/convert/batch): extração dos ZIPs e streaming abortado
+Rodar com: python -m pytest test_batch.py
+"""
+
+import asyncio
+import io
+import os
+import struct
+import threading
+import zipfile
+
+import pytest
+
+import main
+
+
+def zip_with_broken_members() -> bytes:
+    """ZIP com um membro criptografado, um com método de compressão desconhecido e um válido"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('senha.tiff', b'II*\x00')
+        archive.writestr('aes.tiff', b'II*\x00')
+        archive.writestr('ok.tiff', b'II*\x00')
+    data = bytearray(buffer.getvalue())
+    # Diretório central: flags em +8, método de compressão em +10
+    first = data.find(b'PK\x01\x02')
+    second = data.find(b'PK\x01\x02', first + 4)
+    struct.pack_into('<H', data, first + 8, 0x1)
+    struct.pack_into('<H', data, second + 10, 99)
+    return bytes(data)
+
+
+def test_unreadable_zip_members_are_reported_per_file(tmp_path):
+    zip_path = tmp_path / 'lote.zip'
+    zip_path.write_bytes(zip_with_broken_members())
+
+    entries, used = main.extract_zip_entries(str(zip_path), 'lote.zip', str(tmp_path), 10, 1024 * 1024)
+
+    by_name = {entry['filename']: entry for entry in entries}
+    assert by_name['senha.tiff']['status'] == 'error'
+    assert 'senha' in by_name['senha.tiff']['error']
+    assert by_name['aes.tiff']['status'] == 'error'
+    assert 'compressão' in by_name['aes.tiff']['error']
+    assert 'path' not in by_name['senha.tiff'] and 'path' not in by_name['aes.tiff']
+    assert os.path.exists(by_name['ok.tiff']['path'])
+    assert used == 4
+    # Só o TIFF válido ficou no disco (além do ZIP)
+    assert sorted(os.listdir(tmp_path)) == sorted(['lote.zip', os.path.basename(by_name['ok.tiff']['path'])])
+
+
+def test_aborted_batch_does_not_leak_conversion_slots(one_slot, connected_request, monkeypatch, tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_convert(tiff_path, pdf_path, optimize, cancel_check=None, executor=None, max_pending=None):
+        started.set()
+        release.wait(5)
+        return {'pages': 1, 'encodings': ['g4']}
+
+    def instant_convert(value, cancel_check=None, executor=None, max_pending=None):
+        return value
+
+    async def scenario():
+        slots = one_slot()
+        # Conversão de outra requisição ocupa o único slot: o lote fica na fila
+        running = asyncio.ensure_future(
+            main.run_conversion(connected_request, blocking_convert, 'x.tiff', 'x.pdf', True)
+        )
+        await asyncio.to_thread(started.wait, 5)
+
+        workdir = tmp_path / 'lote'
+        workdir.mkdir()
+        entries = []
+        for index in range(3):
+            path = workdir / f'{index}.tiff'
+            path.write_bytes(b'II*\x00')
+            entries.append({'filename': f'{index}.tiff', 'path': str(path)})
+
+        monkeypatch.setattr(main.tiff_engine, 'convert_tiff_file', blocking_convert)
+        stream = main.stream_batch_zip(connected_request, entries, str(workdir), True)
+        first_chunk = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert main.conversions.stats['queued'] > 0
+
+        # Cliente abortou o download do ZIP
+        first_chunk.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first_chunk
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+
+        release.set()
+        await running
+        assert main.conversions.stats['queued'] == 0
+        assert await asyncio.wait_for(main.run_conversion(connected_request, instant_convert, 'c'), 2) == 'c'
+        assert slots._value == 1
+        assert not workdir.exists()
+
+    asyncio.run(scenario())
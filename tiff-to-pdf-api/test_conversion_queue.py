@@ -0,0 +1,66 @@
+"""
+Testes da fila de conversões (run_conversion)
+Rodar com: python -m pytest test_conversion_queue.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import main
+
+
+def blocking_convert(started: threading.Event, release: threading.Event):
+    """Conversão falsa que ocupa o slot até `release`"""
+    def convert(value, cancel_check=None, executor=None, max_pending=None):
+        started.set()
+        release.wait(5)
+        return value
+    return convert
+
+
+def instant_convert(value, cancel_check=None, executor=None, max_pending=None):
+    return value
+
+
+def test_cancelled_queued_conversion_releases_slot(one_slot, connected_request):
+    async def scenario():
+        slots = one_slot()
+        request = connected_request
+        started, release = threading.Event(), threading.Event()
+
+        running = asyncio.ensure_future(main.run_conversion(request, blocking_convert(started, release), 'a'))
+        await asyncio.to_thread(started.wait, 5)
+
+        # Segunda conversão fica na fila e é cancelada lá
+        cancelled_before = main.conversions.stats['cancelled']
+        queued = asyncio.ensure_future(main.run_conversion(request, instant_convert, 'b'))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert main.conversions.stats['cancelled'] == cancelled_before + 1
+
+        release.set()
+        assert await running == 'a'
+
+        # O slot voltou: uma conversão nova roda
+        assert await asyncio.wait_for(main.run_conversion(request, instant_convert, 'c'), 2) == 'c'
+        assert slots._value == 1
+        assert main.conversions.stats['queued'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_already_acquired_is_returned_on_cancel(one_slot):
+    async def scenario():
+        slots = one_slot()
+        acquire = asyncio.ensure_future(slots.acquire())
+        await acquire
+        assert slots._value == 0
+
+        main.conversions.abandon_slot(acquire)
+        assert slots._value == 1
+
+    asyncio.run(scenario())
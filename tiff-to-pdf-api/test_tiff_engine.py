@@ -0,0 +1,154 @@
+"""
+Testes das páginas do tiff_engine: codecs embutidos sem recodificar
+(comparados pixel a pixel com o Pillow depois de renderizar o PDF) e
+recodificação
+Rodar com: python -m pytest test_tiff_engine.py
+"""
+
+import io
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import tiff_engine
+
+
+def gradient(width: int = 64, height: int = 48) -> Image.Image:
+    """Cinza 8 bits com diagonais (toda linha e coluna muda)"""
+    values = np.add.outer(np.arange(height), np.arange(width)) * 2 % 256
+    return Image.fromarray(values.astype(np.uint8))
+
+
+def rgb_gradient() -> Image.Image:
+    gray = gradient()
+    return Image.merge('RGB', [gray, gray.transpose(Image.FLIP_LEFT_RIGHT), gray.transpose(Image.FLIP_TOP_BOTTOM)])
+
+
+def bilevel() -> Image.Image:
+    return gradient().point(lambda v: 255 if v > 128 else 0).convert('1')
+
+
+def tiff_bytes(image: Image.Image, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, 'TIFF', **options)
+    return output.getvalue()
+
+
+def render_pdf(pdf: bytes, gray: bool) -> np.ndarray:
+    """Primeira página do PDF renderizada no DPI do TIFF (1 pixel do PDF = 1 pixel da imagem)"""
+    fitz = pytest.importorskip('fitz')  # PyMuPDF (requirements-test.txt)
+    with fitz.open(stream=pdf, filetype='pdf') as doc:
+        pixmap = doc[0].get_pixmap(dpi=int(tiff_engine.DEFAULT_DPI), alpha=False,
+                                   colorspace=fitz.csGRAY if gray else fitz.csRGB)
+        return np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+
+
+PASSTHROUGH_CASES = {
+    'g4': (bilevel, {'compression': 'group4'}, 'ccitt-g4'),
+    'jpeg-rgb': (rgb_gradient, {'compression': 'jpeg'}, 'dct'),
+    'jpeg-gray': (gradient, {'compression': 'jpeg'}, 'dct'),
+    'lzw': (rgb_gradient, {'compression': 'tiff_lzw'}, 'lzw'),
+    'lzw-predictor': (rgb_gradient, {'compression': 'tiff_lzw', 'tiffinfo': {tiff_engine.TAG_PREDICTOR: 2}}, 'lzw'),
+    'flate': (gradient, {'compression': 'tiff_adobe_deflate'}, 'flate'),
+    'flate-predictor': (rgb_gradient, {'compression': 'tiff_adobe_deflate',
+                                       'tiffinfo': {tiff_engine.TAG_PREDICTOR: 2}}, 'flate'),
+    'flate-strips': (gradient, {'compression': 'tiff_adobe_deflate', 'strip_size': 512}, 'flate'),
+    'raw': (rgb_gradient, {}, 'raw'),
+}
+
+
+@pytest.mark.parametrize('case', sorted(PASSTHROUGH_CASES))
+def test_passthrough_renders_the_same_pixels_as_pillow(case, tmp_path):
+    make_image, options, codec = PASSTHROUGH_CASES[case]
+    data = tiff_bytes(make_image(), **options)
+    tiff_path = tmp_path / 'pagina.tiff'
+    tiff_path.write_bytes(data)
+
+    output = io.BytesIO()
+    result = tiff_engine.convert_tiff(str(tiff_path), output)
+
+    # Embutida sem recodificar
+    assert result['encodings'] == [codec]
+    with Image.open(io.BytesIO(data)) as expected:
+        gray = expected.mode in ('1', 'L')
+        reference = np.asarray(expected.convert('L' if gray else 'RGB'))
+    rendered = render_pdf(output.getvalue(), gray)
+    assert rendered.shape[:2] == reference.shape[:2]
+    assert np.array_equal(rendered.reshape(reference.shape), reference)
+
+
+def gray16_tiff(width: int = 64, height: int = 8) -> bytes:
+    """TIFF em escala de cinza 16 bits com um degradê de 0 a 65535"""
+    frame = Image.new('I;16', (width, height))
+    frame.putdata([x * 65535 // (width - 1) for _ in range(height) for x in range(width)])
+    output = io.BytesIO()
+    frame.save(output, 'TIFF', compression='tiff_adobe_deflate')
+    return output.getvalue()
+
+
+def test_gray16_is_planned_as_gray():
+    info = tiff_engine.read_tiff_ifds(gray16_tiff())[0]
+    assert tiff_engine.describe_page(info)['encoding'] == 'reencode-gray'
+
+
+def test_gray16_is_encoded_as_8bit_gray_scaled_down():
+    data = gray16_tiff()
+    info = tiff_engine.read_tiff_ifds(data)[0]
+
+    codec, image = tiff_engine.encode_page(memoryview(data), info)
+
+    assert codec == 'reencode-gray'
+    assert image['colorspace'] == '/DeviceGray'
+    assert image['bits'] == 8
+    pixels = zlib.decompress(image['data'])
+    assert len(pixels) == info['width'] * info['height']
+    # Degradê preservado (reduzido para 8 bits, sem cortar em 255)
+    row = pixels[:info['width']]
+    assert row[0] == 0 and row[-1] == 255
+    assert row[info['width'] // 2] in range(120, 136)
+
+
+def corrupt_second_page_tiff() -> bytes:
+    """Duas páginas Deflate em vários strips; um strip da 2ª página estragado"""
+    output = io.BytesIO()
+    gradient().save(output, 'TIFF', save_all=True, append_images=[gradient()],
+                    compression='tiff_adobe_deflate', strip_size=512)
+    data = bytearray(output.getvalue())
+    second = tiff_engine.read_tiff_ifds(bytes(data))[1]
+    middle = second['strip_offsets'][1] + 4
+    data[middle:middle + 4] = b'\xff\xff\xff\xff'
+    return bytes(data)
+
+
+def test_merge_rolls_back_a_failed_file_and_keeps_xref_valid(tmp_path):
+    good = tmp_path / 'bom.tiff'
+    good.write_bytes(tiff_bytes(gradient(), compression='tiff_adobe_deflate'))
+    bad = tmp_path / 'ruim.tiff'
+    bad.write_bytes(corrupt_second_page_tiff())
+    entries = [{'name': 'a', 'path': str(good)}, {'name': 'b', 'path': str(bad)}, {'name': 'c', 'path': str(good)}]
+    pdf_path = tmp_path / 'lote.pdf'
+
+    tiff_engine.merge_tiff_files(entries, str(pdf_path))
+
+    assert [entry['status'] for entry in entries] == ['ok', 'error', 'ok']
+    assert 'TIFF inválido' in entries[1]['error']
+    # A 1ª página do arquivo com erro foi gravada e descartada
+    assert [entries[0]['first_page'], entries[2]['first_page']] == [1, 2]
+
+    pdf = pdf_path.read_bytes()
+    # Toda entrada da xref aponta para o início do seu objeto
+    xref_pos = int(pdf.rsplit(b'startxref\n', 1)[1].split()[0])
+    lines = pdf[xref_pos:].split(b'trailer', 1)[0].splitlines()
+    assert lines[0] == b'xref'
+    size = int(lines[1].split()[1])
+    for obj_id, line in enumerate(lines[3:2 + size], start=1):
+        offset = int(line.split()[0])
+        assert pdf.startswith(b'%d 0 obj' % obj_id, offset)
+
+    fitz = pytest.importorskip('fitz')
+    with fitz.open(pdf_path) as doc:
+        assert not doc.is_repaired
+        assert doc.page_count == 2
+        assert 'manifest.json' in doc.embfile_names()
@@ -0,0 +1,163 @@
+"""
+Testes do walker de IFDs (read_tiff_ifds): TIFF clássico e BigTIFF,
+little e big endian, várias páginas e arquivos truncados/corrompidos
+Rodar com: python -m pytest test_tiff_walker.py
+"""
+
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+import tiff_engine
+
+
+def build_tiff(frames: list, order: str = '<', big: bool = False, compression: int = 1) -> bytes:
+    """
+    TIFF em cinza 8 bits montado à mão, um strip por página
+    frames: lista de (largura, altura, bytes do strip já comprimido)
+    """
+    count_fmt, entry_size, offset_fmt = ('Q', 20, 'Q') if big else ('H', 12, 'I')
+    inline_size = struct.calcsize(offset_fmt)
+    if big:
+        out = bytearray((b'II' if order == '<' else b'MM') + struct.pack(order + 'HHHQ', 43, 8, 0, 0))
+        next_ifd_pos = 8
+    else:
+        out = bytearray((b'II' if order == '<' else b'MM') + struct.pack(order + 'HI', 42, 0))
+        next_ifd_pos = 4
+
+    for width, height, strip in frames:
+        strip_offset = len(out)
+        out += strip
+        if len(out) % 2:
+            out += b'\0'
+        entries = [
+            (tiff_engine.TAG_WIDTH, 4, width),
+            (tiff_engine.TAG_HEIGHT, 4, height),
+            (tiff_engine.TAG_BITS_PER_SAMPLE, 3, 8),
+            (tiff_engine.TAG_COMPRESSION, 3, compression),
+            (tiff_engine.TAG_PHOTOMETRIC, 3, tiff_engine.PHOTOMETRIC_BLACK_IS_ZERO),
+            (tiff_engine.TAG_STRIP_OFFSETS, 4, strip_offset),
+            (tiff_engine.TAG_SAMPLES_PER_PIXEL, 3, 1),
+            (278, 4, height),  # RowsPerStrip
+            (tiff_engine.TAG_STRIP_BYTE_COUNTS, 4, len(strip)),
+        ]
+        ifd_offset = len(out)
+        struct.pack_into(order + offset_fmt, out, next_ifd_pos, ifd_offset)
+        out += struct.pack(order + count_fmt, len(entries))
+        for tag, field_type, value in entries:
+            value_fmt = 'H' if field_type == 3 else 'I'
+            value_bytes = struct.pack(order + value_fmt, value).ljust(inline_size, b'\0')
+            out += struct.pack(order + 'HH' + offset_fmt, tag, field_type, 1) + value_bytes
+        assert len(out) == ifd_offset + struct.calcsize(count_fmt) + len(entries) * entry_size
+        next_ifd_pos = len(out)
+        out += b'\0' * inline_size
+    return bytes(out)
+
+
+def page_pixels(width: int, height: int, seed: int) -> bytes:
+    return bytes((x * 3 + y * 5 + seed) % 256 for y in range(height) for x in range(width))
+
+
+@pytest.mark.parametrize('order', ['<', '>'])
+@pytest.mark.parametrize('big', [False, True])
+def test_walks_every_ifd_in_classic_and_bigtiff(order, big):
+    sizes = [(16, 8), (24, 4), (8, 12)]
+    frames = [(width, height, page_pixels(width, height, seed)) for seed, (width, height) in enumerate(sizes)]
+    data = build_tiff(frames, order=order, big=big)
+
+    pages = tiff_engine.read_tiff_ifds(data)
+
+    assert [(page['width'], page['height']) for page in pages] == sizes
+    assert len({page['ifd_offset'] for page in pages}) == len(sizes)
+    for page, (_, _, strip) in zip(pages, frames):
+        assert page['bits'] == 8 and page['samples'] == 1
+        assert tiff_engine.plan_passthrough(page) == 'raw'
+        strips = tiff_engine._read_strips(memoryview(data), page)
+        assert b''.join(bytes(chunk) for chunk in strips) == strip
+    # O Pillow lê as mesmas páginas (ele não abre BigTIFF big endian)
+    if not (big and order == '>'):
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.n_frames == len(sizes)
+
+
+def test_walks_pillow_multipage_tiff():
+    first = Image.new('L', (32, 16), 40)
+    rest = [Image.new('RGB', (20, 10), (1, 2, 3)), Image.new('1', (64, 64), 1)]
+    output = io.BytesIO()
+    first.save(output, 'TIFF', save_all=True, append_images=rest, compression='tiff_adobe_deflate')
+
+    pages = tiff_engine.read_tiff_ifds(output.getvalue())
+
+    assert [(page['width'], page['height'], page['samples']) for page in pages] == [
+        (32, 16, 1), (20, 10, 3), (64, 64, 1)
+    ]
+
+
+def test_cyclic_ifd_chain_is_rejected():
+    data = bytearray(build_tiff([(8, 8, page_pixels(8, 8, 0))]))
+    ifd_offset = struct.unpack_from('<I', data, 4)[0]
+    num_entries = struct.unpack_from('<H', data, ifd_offset)[0]
+    # Próximo IFD aponta para ele mesmo
+    struct.pack_into('<I', data, ifd_offset + 2 + num_entries * 12, ifd_offset)
+    with pytest.raises(ValueError, match='cíclica'):
+        tiff_engine.read_tiff_ifds(bytes(data))
+
+
+def test_truncated_strip_raises_a_clear_error(tmp_path):
+    frames = [(16, 16, page_pixels(16, 16, 0)), (16, 16, page_pixels(16, 16, 1))]
+    data = build_tiff(frames)
+    # Os IFDs ficam depois dos strips: aumentar o StripByteCounts da página 2
+    # para além do fim do arquivo simula um upload cortado no meio do strip
+    pages = tiff_engine.read_tiff_ifds(data)
+    truncated = bytearray(data)
+    count_pos = pages[1]['ifd_offset'] + 2 + 8 * 12 + 8
+    struct.pack_into('<I', truncated, count_pos, len(data))
+
+    with pytest.raises(ValueError, match='strip fora do arquivo na página 2'):
+        tiff_engine.read_tiff_ifds(bytes(truncated))
+
+    tiff_path = tmp_path / 'truncado.tiff'
+    tiff_path.write_bytes(bytes(truncated))
+    with pytest.raises(ValueError, match='truncado'):
+        tiff_engine.convert_tiff(str(tiff_path), io.BytesIO())
+
+
+def test_strip_tags_with_different_lengths_are_rejected():
+    output = io.BytesIO()
+    Image.new('L', (8, 64), 0).save(output, 'TIFF', compression='tiff_adobe_deflate', strip_size=64)
+    data = bytearray(output.getvalue())
+    page = tiff_engine.read_tiff_ifds(bytes(data))[0]
+    assert len(page['strip_offsets']) > 1
+
+    # Reduz o count do StripByteCounts (mesmo offset do array, um valor a menos)
+    ifd = page['ifd_offset']
+    for index in range(struct.unpack_from('<H', data, ifd)[0]):
+        pos = ifd + 2 + index * 12
+        if struct.unpack_from('<H', data, pos)[0] == tiff_engine.TAG_STRIP_BYTE_COUNTS:
+            count = struct.unpack_from('<I', data, pos + 4)[0]
+            struct.pack_into('<I', data, pos + 4, count - 1)
+    with pytest.raises(ValueError, match='não batem'):
+        tiff_engine.read_tiff_ifds(bytes(data))
+
+
+def test_corrupt_deflate_strip_raises_value_error(tmp_path):
+    # Vários strips Deflate: a conversão descomprime cada um (um strip só
+    # vai para o PDF sem ser lido, não há o que validar)
+    output = io.BytesIO()
+    frames = [Image.frombytes('L', (16, 64), page_pixels(16, 64, seed)) for seed in range(2)]
+    frames[0].save(output, 'TIFF', save_all=True, append_images=frames[1:],
+                   compression='tiff_adobe_deflate', strip_size=256)
+    data = bytearray(output.getvalue())
+    pages = tiff_engine.read_tiff_ifds(bytes(data))
+    assert len(pages[1]['strip_offsets']) > 1
+    # Estraga o meio de um strip da segunda página
+    middle = pages[1]['strip_offsets'][1] + 4
+    data[middle:middle + 4] = b'\xff\xff\xff\xff'
+    tiff_path = tmp_path / 'corrompido.tiff'
+    tiff_path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match='TIFF inválido'):
+        tiff_engine.convert_tiff(str(tiff_path), io.BytesIO())
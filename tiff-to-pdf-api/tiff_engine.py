@@ -0,0 +1,1071 @@
+"""
+Motor de conversão TIFF -> PDF
+Embute os dados comprimidos originais de cada página (CCITT G4, JPEG,
+LZW, Deflate) direto no PDF, sem decodificar e recodificar a imagem.
+Só recodifica (Flate) as páginas com codecs/layouts não suportados.
+"""
+
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import BinaryIO, Callable, Optional
+
+from PIL import Image
+
+from shared import metrics
+from shared.tracing import span
+import tiff_ocr
+
+logger = logging.getLogger(__name__)
+
+# DPI assumido quando o TIFF não informa resolução (mesmo padrão do img2pdf)
+DEFAULT_DPI = 96.0
+# Resoluções abaixo disso são tratadas como ausentes (ex.: TIFF sem unidade gravado com 1x1)
+MIN_VALID_DPI = 10.0
+
+# Tags TIFF usadas na conversão
+TAG_WIDTH = 256
+TAG_HEIGHT = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_PHOTOMETRIC = 262
+TAG_FILL_ORDER = 266
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_X_RESOLUTION = 282
+TAG_Y_RESOLUTION = 283
+TAG_PLANAR_CONFIG = 284
+TAG_RESOLUTION_UNIT = 296
+TAG_PREDICTOR = 317
+TAG_TILE_WIDTH = 322
+TAG_EXTRA_SAMPLES = 338
+TAG_JPEG_TABLES = 347
+
+# Códigos de compressão TIFF
+COMPRESSION_NONE = 1
+COMPRESSION_CCITT_G4 = 4
+COMPRESSION_LZW = 5
+COMPRESSION_JPEG = 7
+COMPRESSION_DEFLATE = 8
+COMPRESSION_DEFLATE_OLD = 32946
+
+COMPRESSION_NAMES = {
+    1: 'none',
+    2: 'ccitt-rle',
+    3: 'ccitt-g3',
+    4: 'ccitt-g4',
+    5: 'lzw',
+    6: 'ojpeg',
+    7: 'jpeg',
+    8: 'deflate',
+    32773: 'packbits',
+    32946: 'deflate',
+    34712: 'jpeg2000',
+}
+
+# PhotometricInterpretation
+PHOTOMETRIC_WHITE_IS_ZERO = 0
+PHOTOMETRIC_BLACK_IS_ZERO = 1
+PHOTOMETRIC_RGB = 2
+PHOTOMETRIC_YCBCR = 6
+
+
+class ConversionCancelled(Exception):
+    """Conversão interrompida a pedido (ex.: cliente desconectou)"""
+
+
+# Tipos de campo TIFF: código -> (formato struct, tamanho em bytes)
+FIELD_TYPES = {
+    1: ('B', 1), 2: ('B', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8),
+    6: ('b', 1), 7: ('B', 1), 8: ('h', 2), 9: ('i', 4), 10: ('ii', 8),
+    11: ('f', 4), 12: ('d', 8), 13: ('I', 4), 16: ('Q', 8), 17: ('q', 8), 18: ('Q', 8),
+}
+
+# Tags lidas pelo walker (as demais são puladas sem ler o valor)
+WALKER_TAGS = {
+    TAG_WIDTH, TAG_HEIGHT, TAG_BITS_PER_SAMPLE, TAG_COMPRESSION, TAG_PHOTOMETRIC,
+    TAG_FILL_ORDER, TAG_STRIP_OFFSETS, TAG_SAMPLES_PER_PIXEL, TAG_STRIP_BYTE_COUNTS,
+    TAG_X_RESOLUTION, TAG_Y_RESOLUTION, TAG_PLANAR_CONFIG, TAG_RESOLUTION_UNIT,
+    TAG_PREDICTOR, TAG_TILE_WIDTH, TAG_EXTRA_SAMPLES, TAG_JPEG_TABLES,
+}
+
+# Strip único no G4 recodificado (o CCITTFaxDecode do PDF espera um stream só)
+G4_STRIP_SIZE = 2 ** 31 - 1
+
+# Limite de páginas (protege contra cadeias de IFD cíclicas/malformadas)
+MAX_TIFF_PAGES = 10000
+
+
+def _read_field(buffer: memoryview, order: str, field_type: int, count: int, value_pos: int):
+    """Lê o valor de uma entrada de IFD (tupla, ou bytes para UNDEFINED/ASCII)"""
+    fmt, size = FIELD_TYPES[field_type]
+    total = size * count
+    if value_pos + total > len(buffer):
+        raise ValueError("TIFF inválido: valor de tag fora do arquivo")
+    if field_type in (2, 7):
+        return bytes(buffer[value_pos:value_pos + total])
+    values = struct.unpack_from(f"{order}{fmt * count}", buffer, value_pos)
+    if field_type in (5, 10):
+        return tuple(values[i] / values[i + 1] if values[i + 1] else 0.0 for i in range(0, len(values), 2))
+    return values
+
+
+def _resolution_dpi(tags: dict) -> tuple:
+    """DPI (x, y) a partir de XResolution/YResolution/ResolutionUnit"""
+    unit = tags.get(TAG_RESOLUTION_UNIT, (2,))[0]
+    x_res = tags.get(TAG_X_RESOLUTION, (0.0,))[0]
+    y_res = tags.get(TAG_Y_RESOLUTION, (x_res,))[0]
+    if unit == 3:  # centímetro
+        x_res, y_res = x_res * 2.54, y_res * 2.54
+    if unit == 1 or min(x_res, y_res) < MIN_VALID_DPI:
+        return DEFAULT_DPI, DEFAULT_DPI
+    return float(x_res), float(y_res)
+
+
+def read_tiff_ifds(buffer) -> list:
+    """
+    Percorre a cadeia de IFDs do TIFF lendo só o cabeçalho e as entradas
+    das tags necessárias - nenhum pixel é lido ou decodificado
+    Suporta TIFF clássico e BigTIFF, little e big endian
+
+    Args:
+        buffer: Bytes do TIFF (bytes, memoryview ou mmap)
+
+    Returns:
+        list: Um dict por página com as tags usadas na conversão
+        e o offset do IFD)
+    """
+    # View própria, liberada mesmo em erro (senão o mmap do chamador não fecha)
+    with memoryview(buffer) as view:
+        return _walk_ifds(view)
+
+
+def _walk_ifds(buffer: memoryview) -> list:
+    """Percorre a cadeia de IFDs (ver read_tiff_ifds)"""
+    if len(buffer) < 8:
+        raise ValueError("TIFF inválido: arquivo muito pequeno")
+
+    byte_order = bytes(buffer[:2])
+    if byte_order == b'II':
+        order = '<'
+    elif byte_order == b'MM':
+        order = '>'
+    else:
+        raise ValueError("TIFF inválido: byte order desconhecido")
+
+    magic = struct.unpack_from(order + 'H', buffer, 2)[0]
+    if magic == 42:
+        count_fmt, entry_size, offset_fmt = 'H', 12, 'I'
+        next_ifd = struct.unpack_from(order + 'I', buffer, 4)[0]
+    elif magic == 43 and len(buffer) >= 16:
+        count_fmt, entry_size, offset_fmt = 'Q', 20, 'Q'
+        next_ifd = struct.unpack_from(order + 'Q', buffer, 8)[0]
+    else:
+        raise ValueError("TIFF inválido: assinatura desconhecida")
+
+    count_size = struct.calcsize(count_fmt)
+    inline_size = struct.calcsize(offset_fmt)
+    pages = []
+    visited = set()
+
+    while next_ifd:
+        if next_ifd in visited or len(pages) >= MAX_TIFF_PAGES:
+            raise ValueError("TIFF inválido: cadeia de IFDs cíclica ou longa demais")
+        if next_ifd + count_size > len(buffer):
+            raise ValueError("TIFF inválido: IFD fora do arquivo")
+        visited.add(next_ifd)
+
+        ifd_offset = next_ifd
+        num_entries = struct.unpack_from(order + count_fmt, buffer, ifd_offset)[0]
+        entries_pos = ifd_offset + count_size
+        end_pos = entries_pos + num_entries * entry_size
+        if end_pos + inline_size > len(buffer):
+            raise ValueError("TIFF inválido: IFD truncado")
+
+        tags = {}
+        for pos in range(entries_pos, end_pos, entry_size):
+            tag, field_type = struct.unpack_from(order + 'HH', buffer, pos)
+            if tag not in WALKER_TAGS or field_type not in FIELD_TYPES:
+                continue
+            count = struct.unpack_from(order + offset_fmt, buffer, pos + 4)[0]
+            value_pos = pos + 4 + inline_size
+            if FIELD_TYPES[field_type][1] * count > inline_size:
+                value_pos = struct.unpack_from(order + offset_fmt, buffer, value_pos)[0]
+            tags[tag] = _read_field(buffer, order, field_type, count, value_pos)
+
+        next_ifd = struct.unpack_from(order + offset_fmt, buffer, end_pos)[0]
+
+        # Strips fora do arquivo (upload truncado) ou tags incoerentes: erro
+        # claro aqui em vez de fatias curtas e um PDF corrompido mais adiante
+        strip_offsets = tags.get(TAG_STRIP_OFFSETS, ())
+        strip_byte_counts = tags.get(TAG_STRIP_BYTE_COUNTS, ())
+        if strip_byte_counts and len(strip_byte_counts) != len(strip_offsets):
+            raise ValueError(f"TIFF inválido: StripOffsets e StripByteCounts não batem (página {len(pages) + 1})")
+        if any(offset + count > len(buffer) for offset, count in zip(strip_offsets, strip_byte_counts)):
+            raise ValueError(f"TIFF inválido: strip fora do arquivo na página {len(pages) + 1} (arquivo truncado?)")
+
+        bits = tags.get(TAG_BITS_PER_SAMPLE, (1,))
+        pages.append({
+            'ifd_offset': ifd_offset,
+            'width': tags.get(TAG_WIDTH, (0,))[0],
+            'height': tags.get(TAG_HEIGHT, (0,))[0],
+            'bits': bits[0] if len(set(bits)) == 1 else None,
+            'samples': tags.get(TAG_SAMPLES_PER_PIXEL, (1,))[0],
+            'photometric': tags.get(TAG_PHOTOMETRIC, (None,))[0],
+            'compression': tags.get(TAG_COMPRESSION, (COMPRESSION_NONE,))[0],
+            'planar': tags.get(TAG_PLANAR_CONFIG, (1,))[0],
+            'fill_order': tags.get(TAG_FILL_ORDER, (1,))[0],
+            'predictor': tags.get(TAG_PREDICTOR, (1,))[0],
+            'tiled': TAG_TILE_WIDTH in tags,
+            'extra_samples': bool(tags.get(TAG_EXTRA_SAMPLES)),
+            'strip_offsets': strip_offsets,
+            'strip_byte_counts': strip_byte_counts,
+            'jpeg_tables': tags.get(TAG_JPEG_TABLES),
+            'dpi': _resolution_dpi(tags),
+        })
+
+    return pages
+
+
+def read_tiff_info(tiff_path: str) -> list:
+    """
+    Lê as informações das páginas de um TIFF em disco via mmap
+    (só as páginas do arquivo tocadas pelos IFDs são carregadas)
+
+    Args:
+        tiff_path: Caminho do arquivo TIFF
+
+    Returns:
+        list: Um dict por página (read_tiff_ifds)
+    """
+    with open(tiff_path, 'rb') as raw:
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = memoryview(mapped)
+            try:
+                return read_tiff_ifds(buffer)
+            finally:
+                buffer.release()
+
+
+def describe_page(info: dict) -> dict:
+    """
+    Resumo de uma página para o endpoint de informações
+
+    Args:
+        info: Informações do frame (read_tiff_ifds)
+
+    Returns:
+        dict: Dimensões, compressão, bits por amostra, DPI, modo e
+        codificação prevista no PDF
+    """
+    return {
+        'width': info['width'],
+        'height': info['height'],
+        'compression': COMPRESSION_NAMES.get(info['compression'], str(info['compression'])),
+        'bits_per_sample': info['bits'],
+        'samples_per_pixel': info['samples'],
+        'dpi': [round(info['dpi'][0], 2), round(info['dpi'][1], 2)],
+        'mode': _pil_mode(info),
+        'encoding': plan_page(info),
+    }
+
+
+def _pil_mode(info: dict) -> str:
+    """Modo equivalente do Pillow (só para exibição)"""
+    photometric, samples, bits = info['photometric'], info['samples'], info['bits']
+    if photometric in (PHOTOMETRIC_WHITE_IS_ZERO, PHOTOMETRIC_BLACK_IS_ZERO):
+        base = '1' if bits == 1 else ('L' if bits == 8 else f"I;{bits}")
+        return base + ('A' if info['extra_samples'] and base == 'L' else '')
+    if photometric == PHOTOMETRIC_RGB:
+        return 'RGBA' if info['extra_samples'] else 'RGB'
+    return {3: 'P', 5: 'CMYK', PHOTOMETRIC_YCBCR: 'YCbCr', 8: 'LAB'}.get(photometric, f"photometric-{photometric}")
+
+
+def _colorspace(info: dict) -> Optional[str]:
+    """Colorspace PDF para as combinações de samples/photometric suportadas"""
+    if info['extra_samples'] or (info['samples'] > 1 and info['planar'] != 1):
+        return None
+    if info['samples'] == 1 and info['photometric'] in (PHOTOMETRIC_WHITE_IS_ZERO, PHOTOMETRIC_BLACK_IS_ZERO):
+        return '/DeviceGray'
+    if info['samples'] == 3 and info['photometric'] == PHOTOMETRIC_RGB and info['bits'] == 8:
+        return '/DeviceRGB'
+    return None
+
+
+def plan_passthrough(info: dict) -> Optional[str]:
+    """
+    Decide se o frame pode ser embutido sem decodificar
+
+    Args:
+        info: Informações do frame (read_tiff_ifds)
+
+    Returns:
+        str ou None: Codec embutido ('ccitt-g4', 'dct', 'lzw', 'flate', 'raw')
+        ou None se o frame precisa ser recodificado
+    """
+    if info['tiled'] or not info['strip_byte_counts'] or info['bits'] not in (1, 8):
+        return None
+
+    compression = info['compression']
+    single_strip = len(info['strip_offsets']) == 1
+
+    if compression == COMPRESSION_CCITT_G4:
+        if (single_strip and info['bits'] == 1 and info['samples'] == 1 and info['fill_order'] == 1
+                and info['photometric'] in (PHOTOMETRIC_WHITE_IS_ZERO, PHOTOMETRIC_BLACK_IS_ZERO)):
+            return 'ccitt-g4'
+        return None
+
+    if compression == COMPRESSION_JPEG:
+        if not single_strip or info['bits'] != 8 or info['extra_samples']:
+            return None
+        if info['samples'] == 1 and info['photometric'] == PHOTOMETRIC_BLACK_IS_ZERO:
+            return 'dct'
+        if info['samples'] == 3 and info['planar'] == 1 and info['photometric'] in (PHOTOMETRIC_RGB, PHOTOMETRIC_YCBCR):
+            return 'dct'
+        return None
+
+    if _colorspace(info) is None or info['fill_order'] != 1:
+        return None
+
+    if info['predictor'] not in (1, 2):
+        return None
+
+    if compression == COMPRESSION_LZW:
+        return 'lzw' if single_strip else None
+
+    if compression in (COMPRESSION_DEFLATE, COMPRESSION_DEFLATE_OLD):
+        return 'flate'
+
+    if compression == COMPRESSION_NONE:
+        return 'raw'
+
+    return None
+
+
+def _read_strips(buffer: memoryview, info: dict) -> list:
+    """Fatias (zero-copy) dos strips comprimidos do frame"""
+    return [
+        buffer[offset:offset + count]
+        for offset, count in zip(info['strip_offsets'], info['strip_byte_counts'])
+    ]
+
+
+def _pdf_image(info: dict, colorspace: str, bits: int, data, filter_name: Optional[str] = None,
+               decode_parms: Optional[str] = None, invert: bool = False) -> dict:
+    return {
+        'width': info['width'],
+        'height': info['height'],
+        'dpi': info['dpi'],
+        'colorspace': colorspace,
+        'bits': bits,
+        'filter': filter_name,
+        'decode_parms': decode_parms,
+        'decode': '[1 0]' if invert else None,
+        'data': data,
+    }
+
+
+def encode_passthrough(buffer: memoryview, info: dict, codec: str, flate_level: int = 6) -> Optional[dict]:
+    """
+    Monta a imagem PDF reaproveitando os strips comprimidos do TIFF
+
+    Args:
+        buffer: Bytes do TIFF (memoryview)
+        info: Informações do frame
+        codec: Resultado de plan_passthrough
+        flate_level: Nível zlib para frames sem compressão
+
+    Returns:
+        dict ou None: Imagem PDF, ou None se os dados não são compatíveis
+    """
+    strips = _read_strips(buffer, info)
+    inverted = info['photometric'] == PHOTOMETRIC_WHITE_IS_ZERO
+
+    if codec == 'ccitt-g4':
+        parms = f"<< /K -1 /Columns {info['width']} /Rows {info['height']}"
+        if info['photometric'] == PHOTOMETRIC_BLACK_IS_ZERO:
+            parms += " /BlackIs1 true"
+        return _pdf_image(info, '/DeviceGray', 1, strips[0], '/CCITTFaxDecode', parms + " >>")
+
+    if codec == 'dct':
+        data = strips[0]
+        if info['jpeg_tables']:
+            # Strip "abreviado": juntar tabelas (sem EOI) + strip (sem SOI)
+            data = bytes(info['jpeg_tables'])[:-2] + bytes(data[2:])
+        if bytes(data[:2]) != b'\xff\xd8':
+            return None
+        colorspace = '/DeviceGray' if info['samples'] == 1 else '/DeviceRGB'
+        # JPEG RGB (sem conversão YCbCr) precisa desligar o ColorTransform
+        parms = "<< /ColorTransform 0 >>" if info['photometric'] == PHOTOMETRIC_RGB else None
+        return _pdf_image(info, colorspace, 8, data, '/DCTDecode', parms)
+
+    colorspace = _colorspace(info)
+    parms = None
+    if info['predictor'] == 2:
+        parms = (f"<< /Predictor 2 /Colors {info['samples']} "
+                 f"/BitsPerComponent {info['bits']} /Columns {info['width']} >>")
+
+    if codec == 'lzw':
+        # LZW "old-style" (LSB-first) não é compatível com o LZWDecode do PDF
+        if bytes(strips[0][:1]) != b'\x80':
+            return None
+        return _pdf_image(info, colorspace, info['bits'], strips[0], '/LZWDecode', parms, inverted)
+
+    if codec == 'flate':
+        if len(strips) == 1:
+            return _pdf_image(info, colorspace, info['bits'], strips[0], '/FlateDecode', parms, inverted)
+        # Vários strips: cada um é um stream zlib independente; junta as linhas
+        # (só a camada zlib, os pixels não são interpretados) num stream único
+        compressor = zlib.compressobj(flate_level)
+        try:
+            data = b''.join(compressor.compress(zlib.decompress(strip)) for strip in strips) + compressor.flush()
+        except zlib.error as e:
+            error = str(e)
+        else:
+            return _pdf_image(info, colorspace, info['bits'], data, '/FlateDecode', parms, inverted)
+        # Soltar as fatias do mmap antes do erro: o traceback as manteria
+        # vivas e o mmap do chamador não fecharia (BufferError no lugar do erro)
+        strips.clear()
+        raise ValueError(f"TIFF inválido: strip Deflate corrompido ({error})")
+
+    if codec == 'raw':
+        compressor = zlib.compressobj(flate_level)
+        data = b''.join(compressor.compress(strip) for strip in strips) + compressor.flush()
+        return _pdf_image(info, colorspace, info['bits'], data, '/FlateDecode', None, inverted)
+
+    return None
+
+
+def _decoded_target(mode: str) -> str:
+    """Codificação usada no PDF para um frame decodificado, pelo modo Pillow"""
+    if mode == '1':
+        return 'bilevel'
+    # 'I;16' (scanners em 16 bits) e 'I' também vão para cinza em 8 bits
+    if mode in ('L', 'LA', 'I') or mode.startswith('I;'):
+        return 'gray'
+    if mode == 'P':
+        return 'indexed'
+    return 'rgb'
+
+
+def plan_page(info: dict) -> str:
+    """
+    Codificação prevista para a página no PDF (a mesma que a conversão usa)
+    Codecs embutidos sem recodificar: 'ccitt-g4', 'dct', 'lzw', 'flate', 'raw'
+    Recodificados: 'reencode-bilevel' (P&B em 1 bit: a conversão informa
+    'reencode-g4' ou 'reencode-1bit', o que ficar menor), 'reencode-gray',
+    'reencode-indexed' (paleta) e 'reencode-rgb'
+
+    Args:
+        info: Informações do frame (read_tiff_ifds)
+
+    Returns:
+        str: Nome da codificação
+    """
+    return plan_passthrough(info) or 'reencode-' + _decoded_target(_pil_mode(info))
+
+
+def _encode_bilevel(frame: Image.Image, info: dict, flate_level: int) -> tuple:
+    """
+    Frame P&B: 1 bit por pixel, em CCITT G4 (strip único, via libtiff do
+    Pillow) ou Flate - o que ficar menor (G4 ganha em scans com ruído,
+    Flate em páginas limpas e repetitivas)
+    """
+    # Modo '1' do Pillow: linhas empacotadas, 1 = branco (igual ao DeviceGray)
+    flate = _pdf_image(info, '/DeviceGray', 1, zlib.compress(frame.tobytes(), flate_level), '/FlateDecode')
+
+    try:
+        output = io.BytesIO()
+        frame.save(output, 'TIFF', compression='group4', strip_size=G4_STRIP_SIZE)
+        data = output.getvalue()
+        g4_info = read_tiff_ifds(data)[0]
+        if plan_passthrough(g4_info) == 'ccitt-g4' and len(data) < len(flate['data']):
+            g4_info['dpi'] = info['dpi']
+            image = encode_passthrough(memoryview(data), g4_info, 'ccitt-g4')
+            if image is not None:
+                image['data'] = bytes(image['data'])
+                return 'reencode-g4', image
+    except (OSError, ValueError) as e:
+        logger.warning(f"CCITT G4 indisponível, usando Flate 1 bit: {str(e)}")
+
+    return 'reencode-1bit', flate
+
+
+def encode_decoded(frame: Image.Image, info: dict, flate_level: int = 6) -> tuple:
+    """
+    Fallback: decodifica o frame com Pillow e recodifica conforme o modo:
+    P&B em 1 bit (CCITT G4 ou Flate), escala de cinza em 8 bits (inclusive
+    a de 16 bits), paleta como cor indexada e o resto em RGB
+
+    Args:
+        frame: Objeto PIL Image posicionado no frame
+        info: Informações do frame
+        flate_level: Nível zlib
+
+    Returns:
+        tuple: (codificação usada, imagem PDF)
+    """
+    target = _decoded_target(frame.mode)
+
+    if target == 'bilevel':
+        return _encode_bilevel(frame, info, flate_level)
+
+    if target == 'indexed':
+        palette = frame.getpalette('RGB') or []
+        if palette:
+            colorspace = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{bytes(palette).hex().upper()}>]"
+            data = zlib.compress(frame.tobytes(), flate_level)
+            return 'reencode-indexed', _pdf_image(info, colorspace, 8, data, '/FlateDecode')
+        target = 'rgb'
+
+    if target == 'gray' and frame.mode.startswith('I'):
+        # convert('L') corta em 255 em vez de reduzir a escala: 16 -> 8 bits
+        img = frame.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    else:
+        img = frame.convert('L' if target == 'gray' else 'RGB') if frame.mode not in ('L', 'RGB') else frame
+    colorspace = '/DeviceGray' if img.mode == 'L' else '/DeviceRGB'
+    data = zlib.compress(img.tobytes(), flate_level)
+    return 'reencode-' + target, _pdf_image(info, colorspace, 8, data, '/FlateDecode')
+
+
+class IfdView(io.RawIOBase):
+    """
+    Arquivo TIFF somente leitura cujo cabeçalho aponta direto para um IFD
+    O Pillow abre o frame desejado como se fosse a primeira página, sem
+    seek pela cadeia e sem copiar o arquivo (os bytes vêm do buffer)
+    """
+
+    def __init__(self, buffer: memoryview, ifd_offset: int):
+        super().__init__()
+        order = '<' if bytes(buffer[:2]) == b'II' else '>'
+        magic = struct.unpack_from(order + 'H', buffer, 2)[0]
+        if magic == 43:
+            self._header = bytes(buffer[:8]) + struct.pack(order + 'Q', ifd_offset)
+        else:
+            self._header = bytes(buffer[:4]) + struct.pack(order + 'I', ifd_offset)
+        self._buffer = buffer
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, target) -> int:
+        start = self._pos
+        end = min(start + len(target), len(self._buffer))
+        if start >= end:
+            return 0
+        size = end - start
+        target[:size] = self._buffer[start:end]
+        if start < len(self._header):
+            head = self._header[start:end]
+            target[:len(head)] = head
+        self._pos = end
+        return size
+
+
+def encode_page(buffer: memoryview, info: dict, flate_level: int = 6, searchable: bool = False) -> tuple:
+    """
+    Gera a imagem PDF de uma página: embute os dados originais quando o
+    codec permite, senão decodifica o frame (aberto pelo offset do IFD)
+    No modo pesquisável o frame é sempre decodificado para o OCR, e as
+    palavras vão em pdf_image['words']
+
+    Args:
+        buffer: Bytes do TIFF
+        info: Informações do frame (read_tiff_ifds)
+        flate_level: Nível zlib
+        searchable: Se True, roda OCR na página
+
+    Returns:
+        tuple: (codec usado, imagem PDF)
+    """
+    codec = plan_passthrough(info)
+    pdf_image = encode_passthrough(buffer, info, codec, flate_level) if codec else None
+    if pdf_image is not None and not searchable:
+        return codec, pdf_image
+
+    with Image.open(IfdView(buffer, info['ifd_offset'])) as frame:
+        if pdf_image is None:
+            try:
+                codec, pdf_image = encode_decoded(frame, info, flate_level)
+            except OSError as e:
+                # Decoder do Pillow: strip truncado/corrompido ou codec que ele não lê
+                raise ValueError(f"TIFF inválido: página não pôde ser decodificada ({e})") from e
+        if searchable:
+            pdf_image['words'] = tiff_ocr.ocr_words(frame, info)
+    return codec, pdf_image
+
+
+def encode_page_file(tiff_path: str, info: dict, flate_level: int = 6, searchable: bool = False) -> tuple:
+    """
+    Versão de encode_page para os workers do pool: abre o TIFF por conta
+    própria (via mmap) e devolve os dados da imagem como bytes
+
+    Args:
+        tiff_path: Caminho do arquivo TIFF
+        info: Informações do frame (read_tiff_ifds)
+        flate_level: Nível zlib
+        searchable: Se True, roda OCR na página
+
+    Returns:
+        tuple: (codec usado, imagem PDF)
+    """
+    with open(tiff_path, 'rb') as raw:
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = memoryview(mapped)
+            try:
+                codec, pdf_image = encode_page(buffer, info, flate_level, searchable)
+                pdf_image['data'] = bytes(pdf_image['data'])
+                return codec, pdf_image
+            finally:
+                pdf_image = None
+                buffer.release()
+
+
+def _is_zero_copy(codec: Optional[str], info: dict) -> bool:
+    """True se a página é embutida direto dos strips (não vale mandar ao pool)"""
+    return codec in ('ccitt-g4', 'dct', 'lzw') or (codec == 'flate' and len(info['strip_offsets']) == 1)
+
+
+def _pdf_string(text: str, encoding: str = 'ascii') -> bytes:
+    """String literal PDF (com escape de parênteses, barra e quebras de linha)"""
+    escaped = text.encode(encoding, 'replace').replace(b'\\', b'\\\\')
+    escaped = escaped.replace(b'\r', b' ').replace(b'\n', b' ')
+    return b'(' + escaped.replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _num(value: float) -> bytes:
+    """Formata número para o PDF (sem zeros à direita)"""
+    return (f"{value:.4f}".rstrip('0').rstrip('.')).encode('ascii')
+
+
+# Largura média de um caractere Helvetica (em em) - só para esticar a
+# palavra invisível até a largura da bbox com Tz
+HELVETICA_AVG_WIDTH = 0.5
+# Anexo com as palavras do OCR (lido pela API de OCR para pular o reconhecimento)
+OCR_WORDS_FILE = 'ocr_words.json'
+
+
+def _text_layer(words: list, page_h: float) -> bytes:
+    """
+    Camada de texto invisível (modo de renderização 3) com as palavras do
+    OCR posicionadas sobre a imagem; usa a fonte /F1 (Helvetica, WinAnsi)
+    """
+    ops = [b'BT 3 Tr']
+    for word in words:
+        x0, y0, x1, y1 = word['bbox']
+        size = max(y1 - y0, 1.0)
+        natural_width = HELVETICA_AVG_WIDTH * size * len(word['text'])
+        scale = 100.0 * (x1 - x0) / natural_width if natural_width else 100.0
+        # Linha de base um pouco acima da borda inferior (descendentes)
+        baseline = page_h - y1 + 0.2 * size
+        ops.append(
+            b'/F1 ' + _num(size) + b' Tf ' + _num(scale) + b' Tz 1 0 0 1 '
+            + _num(x0) + b' ' + _num(baseline) + b' Tm '
+            + _pdf_string(word['text'], 'cp1252') + b' Tj'
+        )
+    ops.append(b'ET')
+    return b'\n'.join(ops)
+
+
+class PdfStreamWriter:
+    """
+    Escritor de PDF incremental: cada página é gravada na saída assim que é
+    adicionada; só a árvore de páginas e a tabela xref ficam para o final
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, out: BinaryIO):
+        self._out = out
+        self._pos = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._embedded_files = []
+        # Por página: (largura, altura, palavras do OCR) ou None
+        self._ocr_pages = []
+        self._font_id = None
+        self._next_id = 3
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write(self, data) -> None:
+        self._out.write(data)
+        self._pos += len(data)
+
+    def _reserve_id(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id: int, body: bytes, stream=None) -> None:
+        self._offsets[obj_id] = self._pos
+        self._write(b'%d 0 obj\n' % obj_id)
+        self._write(body)
+        if stream is not None:
+            self._write(b'\nstream\n')
+            self._write(stream)
+            self._write(b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def _font(self) -> int:
+        """Fonte da camada de texto (gravada uma vez, na primeira página com OCR)"""
+        if self._font_id is None:
+            self._font_id = self._reserve_id()
+            self._write_object(
+                self._font_id,
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'
+            )
+        return self._font_id
+
+    def add_image_page(self, image: dict) -> None:
+        """
+        Adiciona uma página com a imagem ocupando a página inteira
+        O tamanho da página vem do DPI da imagem; se a imagem trouxer
+        'words' (OCR), a página ganha a camada de texto invisível
+
+        Args:
+            image: Imagem PDF (encode_passthrough / encode_decoded)
+        """
+        dpi_x, dpi_y = image['dpi']
+        page_w = image['width'] * 72.0 / dpi_x
+        page_h = image['height'] * 72.0 / dpi_y
+
+        image_id = self._reserve_id()
+        content_id = self._reserve_id()
+        page_id = self._reserve_id()
+
+        data = image['data']
+        entries = [
+            b'/Type /XObject /Subtype /Image',
+            b'/Width %d /Height %d' % (image['width'], image['height']),
+            b'/ColorSpace ' + image['colorspace'].encode('ascii'),
+            b'/BitsPerComponent %d' % image['bits'],
+        ]
+        if image['filter']:
+            entries.append(b'/Filter ' + image['filter'].encode('ascii'))
+        if image['decode_parms']:
+            entries.append(b'/DecodeParms ' + image['decode_parms'].encode('ascii'))
+        if image['decode']:
+            entries.append(b'/Decode ' + image['decode'].encode('ascii'))
+        entries.append(b'/Length %d' % len(data))
+        self._write_object(image_id, b'<< ' + b' '.join(entries) + b' >>', data)
+
+        content = b'q ' + _num(page_w) + b' 0 0 ' + _num(page_h) + b' 0 0 cm /Im0 Do Q'
+        resources = b'/XObject << /Im0 %d 0 R >>' % image_id
+        words = image.get('words')
+        if words is not None:
+            content += b'\n' + _text_layer(words, page_h)
+            resources += b' /Font << /F1 %d 0 R >>' % self._font()
+        self._write_object(content_id, b'<< /Length %d >>' % len(content), content)
+
+        self._write_object(
+            page_id,
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 ' % self.PAGES_ID
+            + _num(page_w) + b' ' + _num(page_h)
+            + b'] /Resources << ' + resources + b' >> /Contents %d 0 R >>' % content_id
+        )
+        self._page_ids.append(page_id)
+        self._ocr_pages.append((round(page_w, 2), round(page_h, 2), words) if words is not None else None)
+
+    def rollback(self, page_count: int) -> None:
+        """
+        Descarta as páginas adicionadas depois de `page_count`
+        Os objetos já gravados ficam no arquivo, mas sem referência na árvore
+        de páginas (não aparecem no PDF)
+        """
+        del self._page_ids[page_count:]
+        del self._ocr_pages[page_count:]
+
+    def add_embedded_file(self, name: str, data: bytes, mime_type: str = 'application/json') -> None:
+        """
+        Anexa um arquivo ao PDF (EmbeddedFiles do catálogo)
+
+        Args:
+            name: Nome do anexo (ASCII)
+            data: Conteúdo
+            mime_type: Tipo MIME do anexo
+        """
+        stream_id = self._reserve_id()
+        spec_id = self._reserve_id()
+        subtype = mime_type.replace('/', '#2F').encode('ascii')
+        compressed = zlib.compress(data, 6)
+        self._write_object(
+            stream_id,
+            b'<< /Type /EmbeddedFile /Subtype /' + subtype
+            + b' /Filter /FlateDecode /Params << /Size %d >> /Length %d >>' % (len(data), len(compressed)),
+            compressed
+        )
+        pdf_name = _pdf_string(name)
+        self._write_object(
+            spec_id,
+            b'<< /Type /Filespec /F ' + pdf_name + b' /UF ' + pdf_name + b' /EF << /F %d 0 R >> >>' % stream_id
+        )
+        self._embedded_files.append((pdf_name, spec_id))
+
+    def close(self) -> None:
+        """Grava árvore de páginas, catálogo, xref e trailer"""
+        if not self._page_ids:
+            raise ValueError("PDF sem páginas")
+
+        # Palavras do OCR anexadas (coordenadas em pontos, origem no topo)
+        if any(page is not None for page in self._ocr_pages):
+            pages = [
+                {'page': number, 'width': page[0], 'height': page[1], 'words': page[2]}
+                for number, page in enumerate(self._ocr_pages, start=1) if page is not None
+            ]
+            ocr_words = {'source': 'tiff-to-pdf-api', 'version': 1, 'page_count': len(self._page_ids), 'pages': pages}
+            self.add_embedded_file(OCR_WORDS_FILE, json.dumps(ocr_words, ensure_ascii=False).encode('utf-8'))
+
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        self._write_object(self.PAGES_ID, b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(self._page_ids))
+        catalog = b'<< /Type /Catalog /Pages %d 0 R' % self.PAGES_ID
+        if self._embedded_files:
+            # A name tree exige os nomes em ordem
+            names = b' '.join(name + b' %d 0 R' % spec_id for name, spec_id in sorted(self._embedded_files))
+            catalog += b' /Names << /EmbeddedFiles << /Names [' + names + b'] >> >>'
+        self._write_object(self.CATALOG_ID, catalog + b' >>')
+
+        xref_pos = self._pos
+        size = self._next_id
+        lines = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        lines.extend(b'%010d 00000 n \n' % self._offsets[obj_id] for obj_id in range(1, size))
+        self._write(b''.join(lines))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, self.CATALOG_ID, xref_pos))
+
+
+def write_tiff_pages(
+    tiff_path: str,
+    writer: PdfStreamWriter,
+    flate_level: int = 6,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    executor: Optional[Executor] = None,
+    max_pending: int = 8,
+    searchable: bool = False
+) -> list:
+    """
+    Adiciona todas as páginas de um TIFF ao `writer`, na ordem original
+    As páginas vêm do walker de IFDs; as embutidas sem cópia (G4, JPEG,
+    LZW, Deflate de 1 strip) são feitas aqui, as que exigem CPU (decodificar
+    ou recomprimir) vão para o `executor` em paralelo. Cada frame é aberto
+    pelo offset do seu IFD, então nada é compartilhado entre os workers.
+    No máximo `max_pending` páginas ficam em andamento (limita a memória)
+
+    Args:
+        tiff_path: Caminho do arquivo TIFF
+        writer: PDF de saída
+        flate_level: Nível zlib das páginas recomprimidas
+        cancel_check: Chamado antes de cada página; se retornar True a
+            conversão é interrompida com ConversionCancelled
+        executor: Pool para as páginas que exigem CPU (None = tudo serial)
+        max_pending: Máximo de páginas convertidas e ainda não gravadas
+        searchable: Se True, roda OCR em cada página (camada de texto)
+
+    Returns:
+        list: Codec usado em cada página
+    """
+    encodings = []
+    # Páginas em ordem: future do pool ou (codec, imagem) já pronta
+    pending = deque()
+
+    def write_head():
+        entry = pending.popleft()
+        if isinstance(entry, Future):
+            with span('wait_pages'):
+                codec, pdf_image = entry.result()
+        else:
+            codec, pdf_image = entry
+        with span('write'):
+            writer.add_image_page(pdf_image)
+        encodings.append(codec)
+
+    with open(tiff_path, 'rb') as raw:
+        mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+        try:
+            with span('ifds'):
+                pages = read_tiff_ifds(buffer)
+            for page, info in enumerate(pages):
+                if cancel_check is not None and cancel_check():
+                    raise ConversionCancelled(f"Conversão cancelada na página {page + 1}")
+
+                # Com OCR toda página exige CPU
+                if executor is not None and (searchable or not _is_zero_copy(plan_passthrough(info), info)):
+                    pending.append(executor.submit(encode_page_file, tiff_path, info, flate_level, searchable))
+                else:
+                    with span('encode'):
+                        pending.append(encode_page(buffer, info, flate_level, searchable))
+
+                # Gravar o que já está pronto no início da fila; esperar se a janela encheu
+                while pending and (len(pending) > max_pending or
+                                   not isinstance(pending[0], Future) or pending[0].done()):
+                    write_head()
+
+            while pending:
+                write_head()
+            metrics.PAGES.inc(len(encodings), operation='tiff-to-pdf')
+        finally:
+            # Soltar futures e fatias do mmap antes de fechá-lo
+            for entry in pending:
+                if isinstance(entry, Future):
+                    entry.cancel()
+            pending.clear()
+            buffer.release()
+            mapped.close()
+
+    return encodings
+
+
+def convert_tiff(
+    tiff_path: str,
+    out: BinaryIO,
+    optimize: bool = True,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    executor: Optional[Executor] = None,
+    max_pending: int = 8,
+    searchable: bool = False
+) -> dict:
+    """
+    Converte TIFF (single ou multi-página) para PDF gravando em `out`
+    (ver write_tiff_pages)
+
+    Args:
+        tiff_path: Caminho do arquivo TIFF
+        out: Saída binária do PDF
+        optimize: Se True, usa compressão Flate mais forte nas páginas recodificadas
+        cancel_check: Chamado antes de cada página para cancelar a conversão
+        executor: Pool para as páginas que exigem CPU (None = tudo serial)
+        max_pending: Máximo de páginas convertidas e ainda não gravadas
+        searchable: Se True, adiciona camada de texto (OCR) e anexa ocr_words.json
+
+    Returns:
+        dict: {'pages': int, 'encodings': [codec por página]}
+    """
+    writer = PdfStreamWriter(out)
+    encodings = write_tiff_pages(
+        tiff_path, writer, 6 if optimize else 1,
+        cancel_check=cancel_check, executor=executor, max_pending=max_pending,
+        searchable=searchable
+    )
+    with span('finalize'):
+        writer.close()
+    return {'pages': writer.page_count, 'encodings': encodings}
+
+
+def convert_tiff_file(
+    tiff_path: str,
+    pdf_path: str,
+    optimize: bool = True,
+    searchable: bool = False,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    executor: Optional[Executor] = None,
+    max_pending: int = 8
+) -> dict:
+    """
+    Converte um TIFF em disco para um PDF em disco (ver convert_tiff)
+
+    Args:
+        tiff_path: Caminho do arquivo TIFF
+        pdf_path: Caminho do PDF de saída
+        optimize: Se True, usa compressão Flate mais forte nas páginas recodificadas
+        searchable: Se True, adiciona camada de texto (OCR) e anexa ocr_words.json
+        cancel_check: Chamado antes de cada página para cancelar a conversão
+        executor: Pool para as páginas que exigem CPU (None = tudo serial)
+        max_pending: Máximo de páginas convertidas e ainda não gravadas
+
+    Returns:
+        dict: {'pages': int, 'encodings': [codec por página]}
+    """
+    with open(pdf_path, 'wb') as output:
+        return convert_tiff(
+            tiff_path, output, optimize=optimize, cancel_check=cancel_check,
+            executor=executor, max_pending=max_pending, searchable=searchable
+        )
+
+
+def merge_tiff_files(
+    entries: list,
+    pdf_path: str,
+    optimize: bool = True,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    executor: Optional[Executor] = None,
+    max_pending: int = 8,
+    manifest_name: Optional[str] = 'manifest.json'
+) -> list:
+    """
+    Converte vários TIFFs para um único PDF, na ordem de `entries`
+    Um arquivo com erro é descartado (suas páginas saem do PDF) sem
+    interromper os demais
+
+    Args:
+        entries: Dicts do manifesto; os que têm 'path' são convertidos e
+            recebem 'status', 'pages', 'first_page' e 'encodings' (ou 'error')
+        pdf_path: Caminho do PDF de saída
+        optimize: Se True, usa compressão Flate mais forte nas páginas recodificadas
+        cancel_check: Chamado antes de cada página para cancelar a conversão
+        executor: Pool para as páginas que exigem CPU (None = tudo serial)
+        max_pending: Máximo de páginas convertidas e ainda não gravadas
+        manifest_name: Se informado, anexa o manifesto (sem 'path') ao PDF
+
+    Returns:
+        list: As próprias `entries`, atualizadas (nenhuma com status 'ok'
+        significa que o PDF não foi finalizado)
+    """
+    flate_level = 6 if optimize else 1
+    with open(pdf_path, 'wb') as output:
+        writer = PdfStreamWriter(output)
+        for entry in entries:
+            if not entry.get('path'):
+                continue
+            first_page = writer.page_count
+            try:
+                encodings = write_tiff_pages(
+                    entry['path'], writer, flate_level,
+                    cancel_check=cancel_check, executor=executor, max_pending=max_pending
+                )
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                writer.rollback(first_page)
+                entry.update({'status': 'error', 'error': str(e)})
+                continue
+            entry.update({
+                'status': 'ok',
+                'pages': len(encodings),
+                'first_page': first_page + 1,
+                'encodings': encodings,
+            })
+
+        # Sem nenhuma página o PDF fica incompleto (o chamador descarta)
+        if writer.page_count:
+            if manifest_name:
+                manifest = [{key: value for key, value in entry.items() if key != 'path'} for entry in entries]
+                writer.add_embedded_file(manifest_name, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+            writer.close()
+
+    return entries
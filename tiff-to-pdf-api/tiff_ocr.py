@@ -0,0 +1,84 @@
+"""
+OCR das páginas TIFF para o modo pesquisável (searchable=true)
+Roda o Tesseract no frame já decodificado, na resolução original, e devolve
+as palavras em pontos PDF para a camada de texto invisível.
+pytesseract é opcional: sem ele (ou sem o binário tesseract) o modo fica
+indisponível e o resto da conversão funciona normalmente.
+"""
+
+import functools
+import logging
+import os
+
+from PIL import Image
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+OCR_LANG = os.getenv('TIFF_OCR_LANG', 'por')
+# Palavras com confiança abaixo disso são descartadas (mesmo corte da validação)
+OCR_MIN_CONFIDENCE = 30.0
+
+
+@functools.lru_cache(maxsize=1)
+def ocr_available() -> bool:
+    """True se pytesseract e o binário tesseract estão disponíveis"""
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception as e:
+        logger.warning(f"Tesseract indisponível: {str(e)}")
+        return False
+
+
+def ocr_words(frame: Image.Image, info: dict) -> list:
+    """
+    Reconhece as palavras de um frame
+
+    Args:
+        frame: Frame decodificado (resolução original)
+        info: Informações do frame (usa o DPI)
+
+    Returns:
+        list: [{'line', 'text', 'bbox': [x0, y0, x1, y1], 'conf'}] com a bbox
+        em pontos PDF e origem no canto superior esquerdo da página; 'line'
+        numera as linhas do Tesseract na ordem de leitura
+    """
+    image = frame if frame.mode in ('1', 'L', 'RGB') else frame.convert('RGB')
+    dpi_x, dpi_y = info['dpi']
+    data = pytesseract.image_to_data(
+        image,
+        lang=OCR_LANG,
+        config=f"--dpi {int(round(dpi_x))}",
+        output_type=pytesseract.Output.DICT
+    )
+
+    scale_x = 72.0 / dpi_x
+    scale_y = 72.0 / dpi_y
+    words = []
+    line_ids = {}
+    for text, conf, left, top, width, height, block, par, line in zip(
+        data['text'], data['conf'], data['left'], data['top'], data['width'], data['height'],
+        data['block_num'], data['par_num'], data['line_num']
+    ):
+        text = text.strip()
+        if not text or float(conf) < OCR_MIN_CONFIDENCE:
+            continue
+        words.append({
+            'line': line_ids.setdefault((block, par, line), len(line_ids)),
+            'text': text,
+            'bbox': [
+                round(left * scale_x, 2),
+                round(top * scale_y, 2),
+                round((left + width) * scale_x, 2),
+                round((top + height) * scale_y, 2),
+            ],
+            'conf': round(float(conf), 1),
+        })
+    return words
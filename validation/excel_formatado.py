@@ -0,0 +1,101 @@
+"""
+Exportação de Excel formatado em uma passada
+Os scripts gravavam com df.to_excel, reabriam com load_workbook, criavam
+Border/Alignment novos célula por célula e salvavam de novo. Aqui o
+workbook é escrito em modo write_only (linhas em streaming, sem manter a
+planilha em memória) e cada célula só referencia um estilo nomeado,
+registrado uma vez por arquivo.
+"""
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+_LADO_FINO = Side(style='thin')
+BORDA_FINA = Border(left=_LADO_FINO, right=_LADO_FINO, top=_LADO_FINO, bottom=_LADO_FINO)
+_FONTE_RODAPE = Font(italic=True, size=9, color="808080")
+
+# Estilos nomeados disponíveis (nome -> atributos do NamedStyle)
+ESTILOS = {
+    'cabecalho_cinza': {
+        'fill': PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid"),
+        'font': Font(bold=True, size=11),
+        'alignment': Alignment(horizontal="center", vertical="center"),
+        'border': BORDA_FINA,
+    },
+    'cabecalho_azul': {
+        'fill': PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+        'font': Font(bold=True, color="FFFFFF", size=11),
+        'alignment': Alignment(horizontal="center", vertical="center", wrap_text=True),
+        'border': BORDA_FINA,
+    },
+    'dados': {
+        'border': BORDA_FINA,
+        'alignment': Alignment(vertical="center"),
+    },
+    'dados_centro': {
+        'border': BORDA_FINA,
+        'alignment': Alignment(horizontal="center", vertical="center"),
+    },
+    'dados_quebra': {
+        'border': BORDA_FINA,
+        'alignment': Alignment(vertical="top", wrap_text=True),
+    },
+    'rodape': {
+        'font': _FONTE_RODAPE,
+    },
+    'rodape_direita': {
+        'font': _FONTE_RODAPE,
+        'alignment': Alignment(horizontal="right"),
+    },
+}
+
+
+def escrever_excel(caminho, aba, colunas, linhas, larguras, estilo_cabecalho, estilos_dados, rodape=()):
+    """
+    Grava um Excel formatado numa única passada
+
+    Args:
+        caminho: Arquivo .xlsx de saída
+        aba: Título da planilha
+        colunas: Nomes das colunas (cabeçalho)
+        linhas: Iterável de sequências de valores (consumido em streaming; None = célula vazia)
+        larguras: Largura de cada coluna
+        estilo_cabecalho: Nome do estilo do cabeçalho (ver ESTILOS)
+        estilos_dados: Nome do estilo de cada coluna de dados
+        rodape: Lista de (índice da coluna, texto, estilo), escrita após uma linha em branco
+
+    Returns:
+        int: Número de linhas de dados escritas
+    """
+    wb = Workbook(write_only=True)
+    for nome, atributos in ESTILOS.items():
+        wb.add_named_style(NamedStyle(name=nome, **atributos))
+    ws = wb.create_sheet(aba)
+
+    # Em write_only as larguras precisam vir antes da primeira linha
+    for indice, largura in enumerate(larguras, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = largura
+
+    def celula(valor, estilo):
+        cell = WriteOnlyCell(ws, value=valor)
+        cell.style = estilo
+        return cell
+
+    ws.append([celula(nome, estilo_cabecalho) for nome in colunas])
+
+    total = 0
+    for valores in linhas:
+        ws.append([celula(valor, estilo) for valor, estilo in zip(valores, estilos_dados)])
+        total += 1
+
+    if rodape:
+        ws.append([])
+        linha_rodape = [None] * (max(indice for indice, _, _ in rodape) + 1)
+        for indice, texto, estilo in rodape:
+            linha_rodape[indice] = celula(texto, estilo)
+        ws.append(linha_rodape)
+
+    wb.save(caminho)
+    return total
@@ -10,10 +10,10 @@ import re
 import pandas as pd
 from img2table.document import PDF
 from img2table.ocr import PaddleOCR
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
 
+from excel_formatado import escrever_excel
+
 # Correção SSL para Mac
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -107,62 +107,27 @@ def extrair_pdf_para_excel(pdf_path, output_excel="dados_extraidos.xlsx"):
         # 6. Exportar para Excel
         print(f"⏳ Exportando para Excel: {output_excel}...")
         
-        df_final.to_excel(output_excel, index=False, engine='openpyxl')
-        
-        # 7. Aplicar formatação
-        print("⏳ Aplicando formatação...")
-        wb = load_workbook(output_excel)
-        ws = wb.active
-        ws.title = "Dados Extraídos"
-        
-        # Estilo do cabeçalho
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        
-        # Bordas
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        # Largura automática pelo maior conteúdo da coluna (cabeçalho incluído), até 50
+        valores = df_final.astype(object).where(df_final.notna(), None)
+        larguras = [
+            min(max(len(str(coluna)), int(valores[coluna].astype(str).str.len().max())) + 2, 50)
+            for coluna in df_final.columns
+        ]
+        
+        # Gravar já formatado (uma passada, estilos nomeados, linhas em streaming)
+        escrever_excel(
+            output_excel,
+            aba="Dados Extraídos",
+            colunas=[str(coluna) for coluna in df_final.columns],
+            linhas=valores.itertuples(index=False, name=None),
+            larguras=larguras,
+            estilo_cabecalho='cabecalho_azul',
+            estilos_dados=['dados_quebra'] * len(df_final.columns),
+            rodape=[
+                (0, f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | Total: {len(df_final)} linhas", 'rodape'),
+            ]
         )
         
-        # Aplicar formatação ao cabeçalho
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-            cell.border = thin_border
-        
-        # Ajustar largura das colunas automaticamente
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Formatar células de dados
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-            for cell in row:
-                cell.border = thin_border
-                cell.alignment = Alignment(vertical="top", wrap_text=True)
-        
-        # Rodapé
-        footer_row = ws.max_row + 2
-        ws[f'A{footer_row}'] = f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | Total: {len(df_final)} linhas"
-        ws[f'A{footer_row}'].font = Font(italic=True, size=9, color="808080")
-        
-        wb.save(output_excel)
-        
         print(f"✅ Excel formatado salvo!\n")
         
         # 8. Mostrar resumo
@@ -5,15 +5,16 @@ Exporta para Excel formatado
 """
 
 import os
-from pdf2image import convert_from_path
-import pytesseract
 from PIL import Image
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
 import re
 
+from excel_formatado import escrever_excel
+from ocr_lote import PAGINAS_POR_LOTE, ocr_paginas
+from paginas_pdf import contar_paginas, renderizar_paginas
+from palavras_ocr import agrupar_por_linhas
+
 
 def extrair_tabela_generica(pdf_path, output_excel="resultado_extracao.xlsx"):
     """
@@ -35,28 +36,19 @@ def extrair_tabela_generica(pdf_path, output_excel="resultado_extracao.xlsx"):
         print(f"❌ Erro: Arquivo '{pdf_path}' não encontrado!")
         return None
     
-    # 1. Converter PDF para imagem
-    print("⏳ Convertendo PDF para imagem (DPI 300)...")
-    imagens = convert_from_path(pdf_path, dpi=300)
-    print(f"✅ {len(imagens)} página(s) convertida(s)\n")
+    # 1. Páginas renderizadas sob demanda (DPI 300, tons de cinza), um lote à frente do OCR
+    print(f"✅ {contar_paginas(pdf_path)} página(s) a processar (renderização sob demanda, DPI 300)\n")
+    imagens = renderizar_paginas(pdf_path, dpi=300, prefetch=PAGINAS_POR_LOTE)
     
-    # 2. Extrair dados de todas as páginas
+    # 2. Extrair dados de todas as páginas (OCR com dados estruturados, em lotes)
+    print("⏳ Executando OCR...")
     todas_linhas = []
     
-    for idx_pagina, imagem in enumerate(imagens, 1):
+    for idx_pagina, dados_ocr in enumerate(ocr_paginas(imagens, lang='por', config=''), 1):
         print(f"\n{'=' * 100}")
         print(f"📄 PÁGINA {idx_pagina}")
         print(f"{'=' * 100}\n")
         
-        print("⏳ Executando OCR...")
-        
-        # OCR com dados estruturados
-        dados_ocr = pytesseract.image_to_data(
-            imagem,
-            lang='por',
-            output_type=pytesseract.Output.DATAFRAME
-        )
-        
         # Filtrar apenas palavras com boa confiança
         dados_ocr = dados_ocr[dados_ocr['conf'] > 30]
         
@@ -69,11 +61,8 @@ def extrair_tabela_generica(pdf_path, output_excel="resultado_extracao.xlsx"):
         
         # Adicionar todas as linhas
         for num_linha, palavras in sorted(linhas_pagina.items()):
-            # Ordenar palavras por posição X
-            palavras_ordenadas = sorted(palavras, key=lambda x: x['left'])
-            
-            # Montar texto da linha
-            texto_linha = ' '.join([p['text'] for p in palavras_ordenadas])
+            # Montar texto da linha (palavras já ordenadas por posição X)
+            texto_linha = ' '.join(palavras['text'])
             
             if texto_linha.strip():
                 todas_linhas.append({
@@ -98,53 +87,20 @@ def extrair_tabela_generica(pdf_path, output_excel="resultado_extracao.xlsx"):
     # 4. Exportar para Excel
     print(f"\n⏳ Exportando para Excel: {output_excel}...")
     
-    # Criar Excel formatado
-    df_export = df[['texto']].copy()
-    df_export.columns = ['Texto Extraído']
-    
-    df_export.to_excel(output_excel, index=False, engine='openpyxl')
-    
-    # Aplicar formatação
-    wb = load_workbook(output_excel)
-    ws = wb.active
-    ws.title = "Dados Extraídos"
-    
-    # Estilo do cabeçalho
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    # Bordas
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    # Criar Excel formatado (uma passada, estilos nomeados)
+    escrever_excel(
+        output_excel,
+        aba="Dados Extraídos",
+        colunas=['Texto Extraído'],
+        linhas=((texto,) for texto in df['texto']),
+        larguras=[120],
+        estilo_cabecalho='cabecalho_azul',
+        estilos_dados=['dados_quebra'],
+        rodape=[
+            (0, f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | Total: {len(df)} linhas", 'rodape'),
+        ]
     )
     
-    # Aplicar formatação ao cabeçalho
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    # Largura da coluna
-    ws.column_dimensions['A'].width = 120
-    
-    # Formatar células de dados
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = thin_border
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-    
-    # Rodapé
-    footer_row = ws.max_row + 2
-    ws[f'A{footer_row}'] = f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | Total: {len(df)} linhas"
-    ws[f'A{footer_row}'].font = Font(italic=True, size=9, color="808080")
-    
-    wb.save(output_excel)
-    
     print(f"✅ Excel criado: {output_excel}")
     
     # 5. Mostrar preview
@@ -162,47 +118,6 @@ def extrair_tabela_generica(pdf_path, output_excel="resultado_extracao.xlsx"):
     return df
 
 
-def agrupar_por_linhas(dados_ocr, tolerancia_y=5):
-    """
-    Agrupa palavras por linha baseado na posição Y.
-    """
-    linhas = {}
-    linha_atual = 0
-    y_ref = None
-    
-    for i, row in dados_ocr.iterrows():
-        if not str(row['text']).strip() or row['conf'] < 0:
-            continue
-        
-        if row['level'] != 5:  # Só processar palavras
-            continue
-        
-        y_atual = row['top']
-        
-        # Determinar se é uma nova linha
-        if y_ref is None:
-            y_ref = y_atual
-        elif abs(y_atual - y_ref) > tolerancia_y:
-            linha_atual += 1
-            y_ref = y_atual
-        
-        # Adicionar palavra à linha
-        if linha_atual not in linhas:
-            linhas[linha_atual] = []
-        
-        palavra_info = {
-            'text': str(row['text']).strip(),
-            'left': row['left'],
-            'top': row['top'],
-            'width': row['width'],
-            'height': row['height'],
-            'conf': row['conf']
-        }
-        linhas[linha_atual].append(palavra_info)
-    
-    return linhas
-
-
 if __name__ == "__main__":
     # PDF a ser processado
     pdf_arquivo = "matriz-ES-2025-2.pdf"
@@ -1,156 +1,443 @@
-import random
+"""
+Gerador de PDFs de teste com ground truth
+- Sem argumentos: gera tabela_escaneada.pdf + ground_truth.json (10 linhas, texto real)
+- Com --corpus: gera o corpus de benchmark, determinístico pela semente, variando
+  número de páginas (1-500), linhas por página, tabela com/sem bordas,
+  PDF digital vs. escaneado (rasterizado em vários DPIs, com ruído) e TIFF
+  multipágina. Cada arquivo sai com o seu ground truth JSON e a pasta ganha
+  um manifesto.json com os parâmetros de tudo que foi gerado (caminhos relativos)
+
+Uso:
+    python gerar_pdf_teste.py
+    python gerar_pdf_teste.py --corpus corpus
+    python gerar_pdf_teste.py --corpus corpus --perfis digital_p001 scan_300dpi_forte --semente 7
+"""
+
+import argparse
+import hashlib
+import io
 import json
-from reportlab.pdfgen import canvas
+import os
+import random
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+SEMENTE_CORPUS = 42
+LARGURA_PAGINA, ALTURA_PAGINA = A4
+MAX_PAGINAS = 500
+MAX_LINHAS_POR_PAGINA = 45
+QUALIDADE_JPEG = 85  # páginas escaneadas entram no PDF como JPEG, como num scanner
+
+TITULO = "Relatório de Materiais"
+COLUNAS = ["Código", "Descrição Item", "Valor"]
+
+# Layout em pontos, origem no canto superior esquerdo
+X_COLUNAS = [50, 250, 450]  # início do texto de cada coluna
+X_BORDAS = [40, 240, 440, 555]  # linhas verticais da tabela com bordas
+Y_TITULO = 80
+Y_CABECALHO = 130
+Y_LIMITE_TABELA = ALTURA_PAGINA - 60
+ALTURA_LINHA = 20
 
-def gerar_codigo():
+# Fontes: nomes do reportlab (PDF digital) e tamanho em pontos
+ESTILOS = {
+    'titulo': ('Helvetica-Bold', 20),
+    'cabecalho': ('Helvetica-Bold', 12),
+    'dados': ('Courier', 11),  # monoespaçada: os espaços do código ficam visíveis
+    'rodape': ('Helvetica', 8),
+}
+# Equivalentes TrueType para as páginas rasterizadas (procurados nas pastas de fontes do sistema)
+FONTES_TTF = {
+    'Helvetica-Bold': ['DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf', 'arialbd.ttf',
+                       '/System/Library/Fonts/Supplemental/Arial Bold.ttf'],
+    'Helvetica': ['DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'arial.ttf',
+                  '/System/Library/Fonts/Supplemental/Arial.ttf'],
+    'Courier': ['DejaVuSansMono.ttf', 'LiberationMono-Regular.ttf', 'cour.ttf',
+                '/System/Library/Fonts/Supplemental/Courier New.ttf'],
+}
+
+# Ruído das páginas escaneadas: desvio do ruído gaussiano (níveis de cinza),
+# fração de pixels com sujeira e inclinação máxima (graus)
+RUIDOS = {
+    'nenhum': {'sigma': 0, 'manchas': 0.0, 'rotacao': 0.0},
+    'leve': {'sigma': 6, 'manchas': 0.0005, 'rotacao': 0.3},
+    'forte': {'sigma': 14, 'manchas': 0.002, 'rotacao': 0.8},
+}
+
+# Perfis do corpus de benchmark
+CORPUS = [
+    # PDFs digitais (texto real): escala de páginas
+    {'nome': 'digital_p001', 'tipo': 'digital', 'paginas': 1, 'linhas_por_pagina': 10, 'bordas': False},
+    {'nome': 'digital_p010_bordas', 'tipo': 'digital', 'paginas': 10, 'linhas_por_pagina': 30, 'bordas': True},
+    {'nome': 'digital_p100', 'tipo': 'digital', 'paginas': 100, 'linhas_por_pagina': 30, 'bordas': False},
+    {'nome': 'digital_p500_bordas', 'tipo': 'digital', 'paginas': 500, 'linhas_por_pagina': 45, 'bordas': True},
+    # PDFs escaneados: DPI x ruído x bordas
+    {'nome': 'scan_150dpi_limpo', 'tipo': 'scan', 'paginas': 5, 'linhas_por_pagina': 30, 'bordas': True,
+     'dpi': 150, 'ruido': 'nenhum'},
+    {'nome': 'scan_200dpi_leve', 'tipo': 'scan', 'paginas': 5, 'linhas_por_pagina': 30, 'bordas': False,
+     'dpi': 200, 'ruido': 'leve'},
+    {'nome': 'scan_300dpi_limpo', 'tipo': 'scan', 'paginas': 5, 'linhas_por_pagina': 30, 'bordas': False,
+     'dpi': 300, 'ruido': 'nenhum'},
+    {'nome': 'scan_300dpi_forte', 'tipo': 'scan', 'paginas': 5, 'linhas_por_pagina': 30, 'bordas': True,
+     'dpi': 300, 'ruido': 'forte'},
+    {'nome': 'scan_200dpi_p100_leve', 'tipo': 'scan', 'paginas': 100, 'linhas_por_pagina': 40, 'bordas': True,
+     'dpi': 200, 'ruido': 'leve'},
+    # TIFF multipágina (entrada da API TIFF -> PDF)
+    {'nome': 'tiff_200dpi_g4', 'tipo': 'tiff', 'paginas': 10, 'linhas_por_pagina': 30, 'bordas': True,
+     'dpi': 200, 'ruido': 'leve', 'compressao': 'group4'},
+    {'nome': 'tiff_300dpi_lzw', 'tipo': 'tiff', 'paginas': 10, 'linhas_por_pagina': 30, 'bordas': False,
+     'dpi': 300, 'ruido': 'nenhum', 'compressao': 'tiff_lzw'},
+]
+
+ITENS = [
+    "Parafuso sextavado M8x20",
+    "Arruela lisa de aço inox",
+    "Porca autotravante M10",
+    "Rebite de alumínio 4x12mm",
+    "Bucha plástica S8",
+    "Parafuso cabeça chata M6x15",
+    "Pino cilíndrico 6x30mm",
+    "Anel de vedação NBR 20x3",
+    "Mola de compressão 10x50",
+    "Chaveta paralela 8x7x40"
+]
+
+
+def gerar_codigo(rng=random):
     """Gera um código no padrão 92154-1368 com 1-3 espaços antes de 1A"""
-    parte1 = random.randint(10000, 99999)
-    parte2 = random.randint(1000, 9999)
-    num_espacos = random.randint(1, 3)
+    parte1 = rng.randint(10000, 99999)
+    parte2 = rng.randint(1000, 9999)
+    num_espacos = rng.randint(1, 3)
     espacos = ' ' * num_espacos
-    sufixo = f"{random.randint(1, 9)}A"
+    sufixo = f"{rng.randint(1, 9)}A"
     codigo_completo = f"{parte1}-{parte2}{espacos}{sufixo}"
-    
+
     return codigo_completo, num_espacos
 
-def gerar_descricao():
+
+def gerar_descricao(rng=random):
     """Gera descrições aleatórias de itens"""
-    itens = [
-        "Parafuso sextavado M8x20",
-        "Arruela lisa de aço inox",
-        "Porca autotravante M10",
-        "Rebite de alumínio 4x12mm",
-        "Bucha plástica S8",
-        "Parafuso cabeça chata M6x15",
-        "Pino cilíndrico 6x30mm",
-        "Anel de vedação NBR 20x3",
-        "Mola de compressão 10x50",
-        "Chaveta paralela 8x7x40"
-    ]
-    return random.choice(itens)
+    return rng.choice(ITENS)
+
 
-def gerar_valor():
+def gerar_valor(rng=random):
     """Gera valores monetários aleatórios"""
-    return f"R$ {random.uniform(5.50, 250.00):.2f}"
-
-# Criar dados da tabela e ground truth
-dados = []
-ground_truth = {
-    "titulo": "Relatório de Materiais",
-    "colunas": ["Código", "Descrição Item", "Valor"],
-    "linhas": []
-}
+    return f"R$ {rng.uniform(5.50, 250.00):.2f}"
+
+
+def _semente(semente, nome):
+    """Semente própria de cada arquivo: o mesmo perfil gera o mesmo conteúdo, gerado sozinho ou no corpus"""
+    if semente is None:
+        return None
+    return int.from_bytes(hashlib.sha256(f"{semente}:{nome}".encode()).digest()[:8], 'big')
+
+
+def gerar_linhas(rng, total, linhas_por_pagina):
+    """
+    Gera as linhas da tabela no formato do ground truth (codigo_base único no arquivo)
+
+    Returns:
+        list: Linhas do ground truth, com a página de cada uma
+    """
+    linhas = []
+    usados = set()
+    while len(linhas) < total:
+        codigo_completo, num_espacos = gerar_codigo(rng)
+
+        # Extrair partes do código para análise
+        partes_codigo = codigo_completo.split()
+        codigo_base = partes_codigo[0] if partes_codigo else codigo_completo
+        sufixo = partes_codigo[-1] if len(partes_codigo) > 1 else ""
+        if codigo_base in usados:
+            continue
+        usados.add(codigo_base)
+
+        linhas.append({
+            "linha_numero": len(linhas) + 1,
+            "pagina": len(linhas) // linhas_por_pagina + 1,
+            "codigo_completo": codigo_completo,
+            "codigo_base": codigo_base,
+            "sufixo": sufixo,
+            "espacos_no_codigo": num_espacos,
+            "descricao": gerar_descricao(rng),
+            "valor": gerar_valor(rng)
+        })
+    return linhas
+
+
+def layout_pagina(linhas, num_pagina, total_paginas, bordas, altura_linha):
+    """
+    Elementos de uma página, em pontos com origem no canto superior esquerdo
+
+    Returns:
+        list: ('texto', x, y da linha de base, estilo, texto) ou ('linha', x1, y1, x2, y2)
+    """
+    elementos = [
+        ('texto', 200, Y_TITULO, 'titulo', TITULO),
+        ('texto', 470, ALTURA_PAGINA - 30, 'rodape', f"Página {num_pagina}/{total_paginas}"),
+    ]
+    elementos += [
+        ('texto', x, Y_CABECALHO, 'cabecalho', coluna) for x, coluna in zip(X_COLUNAS, COLUNAS)
+    ]
+    # Linha separadora do cabeçalho
+    elementos.append(('linha', X_BORDAS[0], Y_CABECALHO + 5, X_BORDAS[-1], Y_CABECALHO + 5))
+
+    y = Y_CABECALHO + 30
+    for linha in linhas:
+        for x, texto in zip(X_COLUNAS, (linha['codigo_completo'], linha['descricao'], linha['valor'])):
+            elementos.append(('texto', x, y, 'dados', texto))
+        if bordas:
+            y_borda = y + altura_linha * 0.3
+            elementos.append(('linha', X_BORDAS[0], y_borda, X_BORDAS[-1], y_borda))
+        y += altura_linha
+
+    if bordas:
+        y_topo = Y_CABECALHO - 16
+        y_base = Y_CABECALHO + 30 + (len(linhas) - 1) * altura_linha + altura_linha * 0.3
+        elementos.append(('linha', X_BORDAS[0], y_topo, X_BORDAS[-1], y_topo))
+        elementos += [('linha', x, y_topo, x, y_base) for x in X_BORDAS]
+    return elementos
 
-print("=" * 100)
-print("📝 Gerando dados da tabela...")
-print("=" * 100)
-
-for i in range(10):
-    codigo_completo, num_espacos = gerar_codigo()
-    desc = gerar_descricao()
-    valor = gerar_valor()
-    
-    # Extrair partes do código para análise
-    partes_codigo = codigo_completo.split()
-    codigo_base = partes_codigo[0] if partes_codigo else codigo_completo
-    sufixo = partes_codigo[-1] if len(partes_codigo) > 1 else ""
-    
-    dados.append((codigo_completo, desc, valor))
-    
-    # Adicionar ao ground truth
-    ground_truth["linhas"].append({
-        "linha_numero": i + 1,
-        "codigo_completo": codigo_completo,
-        "codigo_base": codigo_base,
-        "sufixo": sufixo,
-        "espacos_no_codigo": num_espacos,
-        "descricao": desc,
-        "valor": valor
-    })
-    
-    espacos_visual = '·' * num_espacos
-    print(f"\n  Linha {i+1}: {codigo_completo}")
-    print(f"    ├─ Visual: {codigo_base}{espacos_visual}{sufixo}")
-    print(f"    ├─ Espaços: {num_espacos}")
-    print(f"    └─ Descrição: {desc} | {valor}")
-
-# Salvar ground truth em JSON
-ground_truth_path = "/Users/yanpedro/Documents/PDF extractor - Web Service/validation/ground_truth.json"
-with open(ground_truth_path, 'w', encoding='utf-8') as f:
-    json.dump(ground_truth, f, ensure_ascii=False, indent=2)
-
-print(f"\n✅ Ground truth salvo em: {ground_truth_path}")
-
-# Criar PDF usando Canvas (texto real, não imagem)
-print("\n" + "=" * 100)
-print("📄 Criando PDF com texto real (para OCR de alta qualidade)...")
-print("=" * 100)
-
-pdf_path = "/Users/yanpedro/Documents/PDF extractor - Web Service/validation/tabela_escaneada.pdf"
-c = canvas.Canvas(pdf_path, pagesize=A4)
-width, height = A4
-
-# Registrar fonte Courier (monospaced, boa para OCR)
-try:
-    pdfmetrics.registerFont(TTFont('Courier', '/System/Library/Fonts/Courier.ttf'))
-    fonte_disponivel = True
-except:
-    fonte_disponivel = False
-
-# Posições iniciais
-y_pos = height - 80
-
-# Título
-c.setFont("Helvetica-Bold", 20)
-c.drawString(200, y_pos, "Relatório de Materiais")
-y_pos -= 50
-
-# Cabeçalho da tabela
-c.setFont("Helvetica-Bold", 12)
-c.drawString(50, y_pos, "Código")
-c.drawString(250, y_pos, "Descrição Item")
-c.drawString(450, y_pos, "Valor")
-y_pos -= 5
-
-# Linha separadora
-c.line(40, y_pos, 550, y_pos)
-y_pos -= 25
-
-# Dados da tabela - usando Courier para melhor legibilidade
-if fonte_disponivel:
-    c.setFont("Courier", 11)
-else:
-    c.setFont("Helvetica", 11)
-
-for codigo, desc, valor in dados:
-    c.drawString(50, y_pos, codigo)
-    c.drawString(250, y_pos, desc)
-    c.drawString(450, y_pos, valor)
-    y_pos -= 20
-
-c.save()
-
-print(f"\n✅ PDF gerado com sucesso: {pdf_path}")
-
-print("\n" + "=" * 100)
-print("📊 GROUND TRUTH - ESPAÇOS CORRETOS POR CÓDIGO")
-print("=" * 100)
-
-for linha in ground_truth["linhas"]:
-    partes = linha["codigo_completo"].split()
-    if len(partes) >= 2:
-        codigo_base = partes[0]
-        sufixo = partes[-1]
+
+def desenhar_pdf(c, elementos):
+    """Desenha uma página com texto real no canvas do reportlab"""
+    for elemento in elementos:
+        if elemento[0] == 'texto':
+            _, x, y, estilo, texto = elemento
+            c.setFont(*ESTILOS[estilo])
+            c.drawString(x, ALTURA_PAGINA - y, texto)
+        else:
+            _, x1, y1, x2, y2 = elemento
+            c.line(x1, ALTURA_PAGINA - y1, x2, ALTURA_PAGINA - y2)
+    c.showPage()
+
+
+@lru_cache(maxsize=None)
+def _fonte_raster(estilo, dpi):
+    nome, tamanho = ESTILOS[estilo]
+    tamanho_px = round(tamanho * dpi / 72)
+    for arquivo in FONTES_TTF[nome]:
+        try:
+            return ImageFont.truetype(arquivo, tamanho_px)
+        except OSError:
+            continue
+    # Fonte embutida do Pillow (sem fontes do sistema instaladas)
+    return ImageFont.load_default(size=tamanho_px)
+
+
+def aplicar_ruido(imagem, ruido, rng):
+    """Simula o scanner: inclinação, ruído gaussiano e sujeira (pixels pretos)"""
+    if ruido['rotacao']:
+        angulo = rng.uniform(-ruido['rotacao'], ruido['rotacao'])
+        imagem = imagem.rotate(angulo, resample=Image.BICUBIC, fillcolor=255)
+    if ruido['sigma'] or ruido['manchas']:
+        pixels = np.asarray(imagem, dtype=np.float32)
+        if ruido['sigma']:
+            pixels = pixels + rng.standard_normal(pixels.shape, dtype=np.float32) * ruido['sigma']
+        if ruido['manchas']:
+            pixels[rng.random(pixels.shape, dtype=np.float32) < ruido['manchas']] = 0
+        imagem = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return imagem
+
+
+def rasterizar_pagina(elementos, dpi, ruido, rng):
+    """Desenha a página como imagem em tons de cinza no DPI pedido (página escaneada)"""
+    escala = dpi / 72
+    imagem = Image.new('L', (round(LARGURA_PAGINA * escala), round(ALTURA_PAGINA * escala)), 255)
+    desenho = ImageDraw.Draw(imagem)
+    espessura = max(1, round(escala))
+    for elemento in elementos:
+        if elemento[0] == 'texto':
+            _, x, y, estilo, texto = elemento
+            desenho.text((x * escala, y * escala), texto, fill=0, font=_fonte_raster(estilo, dpi), anchor='ls')
+        else:
+            _, x1, y1, x2, y2 = elemento
+            desenho.line([(x1 * escala, y1 * escala), (x2 * escala, y2 * escala)], fill=0, width=espessura)
+    return aplicar_ruido(imagem, RUIDOS[ruido], rng)
+
+
+def validar_perfil(perfil):
+    """Confere os limites do perfil (ValueError se inválido)"""
+    if perfil['tipo'] not in ('digital', 'scan', 'tiff'):
+        raise ValueError(f"Tipo inválido: {perfil['tipo']}")
+    if not 1 <= perfil['paginas'] <= MAX_PAGINAS:
+        raise ValueError(f"Páginas devem estar entre 1 e {MAX_PAGINAS}")
+    if not 1 <= perfil['linhas_por_pagina'] <= MAX_LINHAS_POR_PAGINA:
+        raise ValueError(f"Linhas por página devem estar entre 1 e {MAX_LINHAS_POR_PAGINA}")
+    if perfil['tipo'] != 'digital' and perfil.get('ruido', 'nenhum') not in RUIDOS:
+        raise ValueError(f"Ruído inválido: {perfil['ruido']}")
+
+
+def gerar_arquivo(pasta, perfil, semente=None):
+    """
+    Gera um arquivo do corpus e o seu ground truth
+
+    Args:
+        pasta: Pasta de saída
+        perfil: Dict com nome, tipo ('digital', 'scan' ou 'tiff'), paginas,
+            linhas_por_pagina, bordas e, para scan/tiff, dpi, ruido (e compressao do TIFF)
+        semente: Semente do corpus (None = aleatório)
+
+    Returns:
+        dict: Entrada do manifesto (parâmetros + caminhos relativos à pasta)
+    """
+    validar_perfil(perfil)
+    semente_arquivo = _semente(semente, perfil['nome'])
+    rng = random.Random(semente_arquivo)
+    rng_ruido = np.random.default_rng(semente_arquivo)
+
+    paginas = perfil['paginas']
+    linhas_por_pagina = perfil['linhas_por_pagina']
+    linhas = gerar_linhas(rng, paginas * linhas_por_pagina, linhas_por_pagina)
+    altura_linha = min(ALTURA_LINHA, (Y_LIMITE_TABELA - Y_CABECALHO - 30) / linhas_por_pagina)
+    layouts = (
+        layout_pagina(linhas[i:i + linhas_por_pagina], i // linhas_por_pagina + 1, paginas,
+                      perfil['bordas'], altura_linha)
+        for i in range(0, len(linhas), linhas_por_pagina)
+    )
+
+    extensao = '.tif' if perfil['tipo'] == 'tiff' else '.pdf'
+    arquivo = perfil['nome'] + extensao
+    caminho = os.path.join(pasta, arquivo)
+
+    if perfil['tipo'] == 'tiff':
+        imagens = [rasterizar_pagina(elementos, perfil['dpi'], perfil['ruido'], rng_ruido) for elementos in layouts]
+        compressao = perfil.get('compressao', 'tiff_lzw')
+        if compressao == 'group4':
+            imagens = [imagem.convert('1') for imagem in imagens]
+        imagens[0].save(caminho, 'TIFF', save_all=True, append_images=imagens[1:],
+                        compression=compressao, dpi=(perfil['dpi'], perfil['dpi']))
+    else:
+        # invariant=1: sem data/ID aleatório no PDF (mesma semente -> mesmos bytes)
+        c = canvas.Canvas(caminho, pagesize=A4, invariant=1)
+        c.setTitle(TITULO)
+        for elementos in layouts:
+            if perfil['tipo'] == 'digital':
+                desenhar_pdf(c, elementos)
+            else:
+                imagem = rasterizar_pagina(elementos, perfil['dpi'], perfil['ruido'], rng_ruido)
+                jpeg = io.BytesIO()
+                imagem.save(jpeg, 'JPEG', quality=QUALIDADE_JPEG, dpi=(perfil['dpi'], perfil['dpi']))
+                jpeg.seek(0)
+                c.drawImage(ImageReader(jpeg), 0, 0, LARGURA_PAGINA, ALTURA_PAGINA)
+                c.showPage()
+        c.save()
+
+    parametros = {chave: valor for chave, valor in perfil.items() if chave != 'nome'}
+    ground_truth = {
+        "titulo": TITULO,
+        "colunas": COLUNAS,
+        "parametros": {**parametros, "semente": semente},
+        "linhas": linhas
+    }
+    arquivo_gt = perfil['nome'] + '.json'
+    with open(os.path.join(pasta, arquivo_gt), 'w', encoding='utf-8') as f:
+        json.dump(ground_truth, f, ensure_ascii=False, indent=2)
+
+    return {
+        'nome': perfil['nome'],
+        'arquivo': arquivo,
+        'ground_truth': arquivo_gt,
+        **parametros,
+        'linhas': len(linhas),
+        'bytes': os.path.getsize(caminho)
+    }
+
+
+def gerar_corpus(pasta, semente=SEMENTE_CORPUS, perfis=None):
+    """
+    Gera o corpus de benchmark e o manifesto.json
+
+    Args:
+        pasta: Pasta de saída (criada se não existir)
+        semente: Semente do corpus
+        perfis: Nomes dos perfis de CORPUS a gerar (None = todos)
+
+    Returns:
+        dict: Manifesto
+    """
+    selecionados = [perfil for perfil in CORPUS if perfis is None or perfil['nome'] in perfis]
+    desconhecidos = set(perfis or ()) - {perfil['nome'] for perfil in CORPUS}
+    if desconhecidos:
+        raise ValueError(f"Perfis desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = {'semente': semente, 'arquivos': []}
+    for perfil in selecionados:
+        entrada = gerar_arquivo(pasta, perfil, semente)
+        manifesto['arquivos'].append(entrada)
+        print(f"  ✅ {entrada['arquivo']}: {entrada['paginas']} pág. x {entrada['linhas_por_pagina']} linhas "
+              f"({entrada['bytes'] / 1024 / 1024:.2f}MB)")
+
+    with open(os.path.join(pasta, 'manifesto.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    return manifesto
+
+
+def mostrar_ground_truth(ground_truth):
+    """Mostra os espaços corretos de cada código"""
+    print("\n" + "=" * 100)
+    print("📊 GROUND TRUTH - ESPAÇOS CORRETOS POR CÓDIGO")
+    print("=" * 100)
+
+    for linha in ground_truth["linhas"]:
         espacos_visual = '·' * linha["espacos_no_codigo"]
         print(f"\n  Linha {linha['linha_numero']}: {linha['codigo_completo']}")
-        print(f"    ├─ Código base: {codigo_base}")
-        print(f"    ├─ Sufixo: {sufixo}")
+        print(f"    ├─ Código base: {linha['codigo_base']}")
+        print(f"    ├─ Sufixo: {linha['sufixo']}")
         print(f"    ├─ Espaços: {linha['espacos_no_codigo']}")
-        print(f"    └─ Visual: {codigo_base}{espacos_visual}{sufixo}")
+        print(f"    ├─ Visual: {linha['codigo_base']}{espacos_visual}{linha['sufixo']}")
+        print(f"    └─ Descrição: {linha['descricao']} | {linha['valor']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera PDFs de teste e o corpus de benchmark com ground truth")
+    parser.add_argument('--corpus', metavar='PASTA', help="Gerar o corpus de benchmark nesta pasta")
+    parser.add_argument('--perfis', nargs='+', help="Perfis do corpus a gerar (default: todos)")
+    parser.add_argument('--semente', type=int, help=f"Semente (default do corpus: {SEMENTE_CORPUS})")
+    parser.add_argument('--listar', action='store_true', help="Listar os perfis do corpus")
+    args = parser.parse_args()
+
+    if args.listar:
+        for perfil in CORPUS:
+            print(f"{perfil['nome']:<24} {json.dumps({k: v for k, v in perfil.items() if k != 'nome'})}")
+        return
+
+    if args.corpus:
+        semente = SEMENTE_CORPUS if args.semente is None else args.semente
+        print("=" * 100)
+        print(f"📚 Gerando corpus de benchmark em {args.corpus} (semente {semente})")
+        print("=" * 100)
+        manifesto = gerar_corpus(args.corpus, semente, args.perfis)
+        print(f"\n✅ {len(manifesto['arquivos'])} arquivo(s) + manifesto.json em: {args.corpus}")
+        return
+
+    # PDF de teste da validação (script.py): uma página, 10 linhas, texto real
+    print("=" * 100)
+    print("📄 Criando PDF com texto real (para OCR de alta qualidade)...")
+    print("=" * 100)
+
+    perfil = {'nome': 'tabela_escaneada', 'tipo': 'digital', 'paginas': 1, 'linhas_por_pagina': 10, 'bordas': False}
+    entrada = gerar_arquivo(PASTA, perfil, args.semente)
+
+    # Ground truth com o nome que o script.py procura
+    ground_truth_path = os.path.join(PASTA, "ground_truth.json")
+    os.replace(os.path.join(PASTA, entrada['ground_truth']), ground_truth_path)
+    with open(ground_truth_path, encoding='utf-8') as f:
+        mostrar_ground_truth(json.load(f))
+
+    print(f"\n✅ Ground truth salvo em: {ground_truth_path}")
+    print(f"✅ PDF gerado com sucesso: {os.path.join(PASTA, entrada['arquivo'])}")
+    print("\n" + "=" * 100)
+    print("💡 PDF criado com TEXTO REAL (não imagem) para melhor qualidade de OCR!")
+    print("=" * 100)
+
 
-print("\n" + "=" * 100)
-print("💡 PDF criado com TEXTO REAL (não imagem) para melhor qualidade de OCR!")
-print("=" * 100)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+OCR em lote com Tesseract para o script de validação
+Em vez de um processo `tesseract` por página (que relê o traineddata a cada
+chamada), as páginas são agrupadas em lotes:
+- com tesserocr instalado, cada thread do pool tem uma única instância da
+  API C, reaproveitada em todos os seus lotes (modelo carregado uma vez
+  por thread)
+- sem tesserocr, cada lote é uma única execução do `tesseract` com uma
+  lista de imagens (arquivo .txt), gerando um TSV com todas as páginas
+Os lotes rodam em paralelo (threads: o trabalho pesado fica fora do GIL)
+e as páginas saem na ordem original, no mesmo formato do
+pytesseract.image_to_data(..., output_type=DATAFRAME)
+"""
+
+import csv
+import io
+import os
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import pandas as pd
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+PAGINAS_POR_LOTE = 8
+COLUNAS_TSV = [
+    'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+    'left', 'top', 'width', 'height', 'conf', 'text'
+]
+
+# Instâncias da API do tesserocr de cada thread do pool, por (lang, psm);
+# liberadas quando a thread termina (fim do ocr_paginas)
+_apis = threading.local()
+
+
+def _ler_tsv(tsv):
+    """Lê o TSV do Tesseract do mesmo jeito que o pytesseract (DATAFRAME)"""
+    return pd.read_csv(io.StringIO(tsv), sep='\t', quoting=csv.QUOTE_NONE)
+
+
+def _psm(config):
+    """Extrai o --psm da config (default do Tesseract: 3)"""
+    partes = config.split()
+    if '--psm' in partes and partes.index('--psm') + 1 < len(partes):
+        return int(partes[partes.index('--psm') + 1])
+    return 3
+
+
+def _api_tesserocr(lang, psm):
+    """API C do Tesseract desta thread (criada no primeiro lote, reaproveitada nos seguintes)"""
+    por_config = getattr(_apis, 'por_config', None)
+    if por_config is None:
+        por_config = _apis.por_config = {}
+    if (lang, psm) not in por_config:
+        por_config[(lang, psm)] = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+    return por_config[(lang, psm)]
+
+
+def _ocr_lote_tesserocr(imagens, lang, config):
+    """Um lote na API C do Tesseract da thread: o modelo não é recarregado"""
+    api = _api_tesserocr(lang, _psm(config))
+    paginas = []
+    for imagem in imagens:
+        api.SetImage(imagem)
+        tsv = api.GetTSVText(0)
+        paginas.append(_ler_tsv('\t'.join(COLUNAS_TSV) + '\n' + tsv))
+    return paginas
+
+
+def _ocr_lote_cli(imagens, lang, config):
+    """Um lote numa única execução do tesseract (lista de imagens -> um TSV)"""
+    with tempfile.TemporaryDirectory(prefix='ocr_lote_') as pasta:
+        caminhos = []
+        for i, imagem in enumerate(imagens):
+            caminho = os.path.join(pasta, f'pagina_{i:04d}.png')
+            dpi = imagem.info.get('dpi')
+            imagem.save(caminho, 'PNG', **({'dpi': dpi} if dpi else {}))
+            caminhos.append(caminho)
+
+        lista = os.path.join(pasta, 'lista.txt')
+        with open(lista, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(caminhos) + '\n')
+
+        saida = os.path.join(pasta, 'saida')
+        # Um thread do Tesseract por processo: o paralelismo vem dos lotes
+        env = dict(os.environ, OMP_THREAD_LIMIT='1')
+        comando = [pytesseract.pytesseract.tesseract_cmd, lista, saida, '-l', lang, *config.split(), 'tsv']
+        resultado = subprocess.run(comando, capture_output=True, env=env)
+        if resultado.returncode != 0:
+            raise pytesseract.TesseractError(
+                resultado.returncode, resultado.stderr.decode('utf-8', errors='ignore')
+            )
+
+        with open(saida + '.tsv', encoding='utf-8') as f:
+            dados = _ler_tsv(f.read())
+
+    # page_num é 1-based na ordem da lista
+    return [
+        dados[dados['page_num'] == num].reset_index(drop=True)
+        for num in range(1, len(imagens) + 1)
+    ]
+
+
+def ocr_paginas(imagens, lang='por', config='--psm 6', lote=PAGINAS_POR_LOTE, workers=None):
+    """
+    Roda o OCR de várias páginas em lotes paralelos
+
+    Args:
+        imagens: Iterável de imagens PIL (consumido aos poucos, pode ser um gerador)
+        lang: Idioma do Tesseract
+        config: Opções extras do Tesseract (ex.: '--psm 6')
+        lote: Páginas por lote (uma execução do tesseract por lote sem tesserocr)
+        workers: Lotes em paralelo (default: número de CPUs)
+
+    Yields:
+        DataFrame por página, na ordem de `imagens` (colunas do image_to_data)
+    """
+    workers = workers or os.cpu_count() or 1
+    ocr_lote = _ocr_lote_tesserocr if tesserocr is not None else _ocr_lote_cli
+    imagens = iter(imagens)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Um lote por worker + um pronto para entrar: as imagens em memória
+        # ficam limitadas a (workers + 1) * lote páginas, qualquer que seja o PDF
+        pendentes = deque()
+        while True:
+            while len(pendentes) <= workers:
+                paginas = list(islice(imagens, lote))
+                if not paginas:
+                    break
+                pendentes.append(executor.submit(ocr_lote, paginas, lang, config))
+            if not pendentes:
+                break
+            yield from pendentes.popleft().result()
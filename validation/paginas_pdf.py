@@ -0,0 +1,53 @@
+"""
+Fonte de páginas para os scripts de validação
+Renderiza uma página por vez (pdf2image com first_page/last_page) em tons
+de cinza, em vez de convert_from_path do documento inteiro (100 páginas A4
+a 300 DPI ~ 2.5GB de RGB em memória antes do primeiro OCR).
+Uma thread renderiza as próximas páginas enquanto a atual passa pelo OCR.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+
+def contar_paginas(pdf_path):
+    """Número de páginas do PDF (só lê o cabeçalho, não renderiza)"""
+    return pdfinfo_from_path(pdf_path)['Pages']
+
+
+def renderizar_paginas(pdf_path, dpi=300, prefetch=2, tons_de_cinza=True):
+    """
+    Gera as páginas do PDF uma a uma, renderizando à frente em paralelo
+
+    Args:
+        pdf_path: Caminho do PDF
+        dpi: Resolução da renderização
+        prefetch: Páginas renderizadas à frente da que está sendo consumida
+        tons_de_cinza: Renderizar em cinza (1/3 da memória do RGB; o Tesseract binariza de qualquer forma)
+
+    Yields:
+        PIL.Image de cada página, na ordem
+    """
+    total = contar_paginas(pdf_path)
+
+    def renderizar(num_pagina):
+        return convert_from_path(
+            pdf_path, dpi=dpi, first_page=num_pagina, last_page=num_pagina, grayscale=tons_de_cinza
+        )[0]
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='render') as executor:
+        pendentes = deque()
+        proxima = 1
+        try:
+            while pendentes or proxima <= total:
+                # A página atual + `prefetch` à frente
+                while proxima <= total and len(pendentes) <= prefetch:
+                    pendentes.append(executor.submit(renderizar, proxima))
+                    proxima += 1
+                yield pendentes.popleft().result()
+        finally:
+            # Consumidor parou antes do fim: não renderizar o resto
+            for futuro in pendentes:
+                futuro.cancel()
@@ -0,0 +1,92 @@
+"""
+Palavras do OCR (DataFrame do pytesseract.image_to_data) agrupadas por linha
+Versão vetorizada do agrupamento que os scripts faziam com iterrows():
+filtra, numera as linhas e agrupa com NumPy, e devolve cada linha como um
+array estruturado (colunas compactas) em vez de listas de dicts.
+Os registros continuam indexáveis por nome (palavra['text'], palavra['left']).
+"""
+
+import numpy as np
+
+PALAVRA_DTYPE = np.dtype([
+    ('text', object),
+    ('left', np.int64),
+    ('top', np.int64),
+    ('width', np.int64),
+    ('height', np.int64),
+    ('conf', np.float64),
+])
+
+
+def _ids_de_linha(tops, tolerancia_y):
+    """
+    Número da linha de cada palavra, na ordem do OCR
+
+    A regra é a do agrupamento original: uma palavra abre linha nova quando se
+    afasta mais de `tolerancia_y` do topo da PRIMEIRA palavra da linha atual.
+    O cumsum dos deltas entre palavras consecutivas dá o mesmo resultado na
+    prática; ele é conferido contra a regra e, se divergir (linha inclinada
+    que "anda" aos poucos), a numeração é refeita com a varredura sequencial.
+    """
+    n = len(tops)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    nova_linha = np.empty(n, dtype=bool)
+    nova_linha[0] = True
+    nova_linha[1:] = np.abs(np.diff(tops)) > tolerancia_y
+    ids = np.cumsum(nova_linha) - 1
+
+    # Conferir: cada palavra perto do início da sua linha, e cada início
+    # longe do início da linha anterior
+    inicios = np.flatnonzero(nova_linha)
+    distancia = np.abs(tops - tops[inicios[ids]])
+    if np.all(distancia[~nova_linha] <= tolerancia_y) and \
+            np.all(np.abs(np.diff(tops[inicios])) > tolerancia_y):
+        return ids
+
+    linha = 0
+    y_ref = None
+    for i, y in enumerate(tops.tolist()):
+        if y_ref is None:
+            y_ref = y
+        elif abs(y - y_ref) > tolerancia_y:
+            linha += 1
+            y_ref = y
+        ids[i] = linha
+    return ids
+
+
+def agrupar_por_linhas(dados_ocr, tolerancia_y=5):
+    """
+    Agrupa palavras por linha baseado na posição vertical (y).
+
+    Args:
+        dados_ocr: DataFrame do Tesseract com dados de OCR
+        tolerancia_y: Tolerância em pixels para considerar mesma linha
+
+    Returns:
+        dict: {número da linha: array estruturado (PALAVRA_DTYPE) com as
+        palavras da linha ordenadas pela posição horizontal (left)}
+    """
+    # Só palavras (level 5) com texto e confiança válida
+    textos = dados_ocr['text'].astype(str).str.strip()
+    mascara = (textos != '') & (dados_ocr['conf'] >= 0) & (dados_ocr['level'] == 5)
+    dados = dados_ocr[mascara]
+    if dados.empty:
+        return {}
+
+    palavras = np.empty(len(dados), dtype=PALAVRA_DTYPE)
+    palavras['text'] = textos[mascara].to_numpy()
+    for coluna in ('left', 'top', 'width', 'height', 'conf'):
+        palavras[coluna] = dados[coluna].to_numpy()
+
+    ids = _ids_de_linha(palavras['top'], tolerancia_y)
+
+    # Ordenar por linha e, dentro da linha, por left (estável, como o sorted())
+    ordem = np.lexsort((palavras['left'], ids))
+    palavras = palavras[ordem]
+    ids = ids[ordem]
+
+    cortes = np.flatnonzero(np.diff(ids)) + 1
+    return dict(zip(ids[np.r_[0, cortes]].tolist(), np.split(palavras, cortes)))
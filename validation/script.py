@@ -6,16 +6,26 @@ Valida contra ground truth para medir precisão
 """
 
 import os
+import sys
 import json
 import re
-from pdf2image import convert_from_path
-import pytesseract
+import time
+import numpy as np
 from PIL import Image
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
 
+from excel_formatado import escrever_excel
+from ocr_lote import PAGINAS_POR_LOTE, ocr_paginas
+from paginas_pdf import contar_paginas, renderizar_paginas
+from palavras_ocr import PALAVRA_DTYPE, agrupar_por_linhas
+from validacao import avaliar_deteccoes, gerar_relatorio, indexar_ground_truth, salvar_relatorio
+
+PADRAO_CODIGO = re.compile(r'\d{5}-\d{4}')
+PADRAO_SUFIXO = re.compile(r'\d+A')
+# Largura de um espaço em larguras de caractere
+FATOR_ESPACO = 0.4  # entre palavras (tipicamente 0.3-0.5)
+FATOR_ESPACO_CODIGO = 0.6  # dentro do código (ajustado empiricamente com base no ground truth)
+
 def exportar_para_excel(dados_extraidos, nome_arquivo="dados_extraidos.xlsx"):
     """
     Exporta os dados extraídos do PDF para um arquivo Excel formatado.
@@ -36,7 +46,7 @@ def exportar_para_excel(dados_extraidos, nome_arquivo="dados_extraidos.xlsx"):
     print("📊 EXPORTANDO DADOS PARA EXCEL")
     print(f"{'=' * 100}\n")
     
-    # Preparar dados para DataFrame - APENAS INFORMAÇÕES RELEVANTES
+    # Preparar linhas do Excel - APENAS INFORMAÇÕES RELEVANTES
     dados_formatados = []
     
     for item in dados_extraidos:
@@ -64,76 +74,24 @@ def exportar_para_excel(dados_extraidos, nome_arquivo="dados_extraidos.xlsx"):
             descricao = resto_texto
             valor = ""
         
-        # Adicionar apenas colunas relevantes do PDF
-        dados_formatados.append({
-            'Código': codigo_completo,
-            'Descrição Item': descricao,
-            'Valor': valor
-        })
-    
-    # Criar DataFrame
-    df = pd.DataFrame(dados_formatados)
-    
-    # Salvar no Excel
-    df.to_excel(nome_arquivo, index=False, engine='openpyxl')
-    
-    # Aplicar formatação
-    wb = load_workbook(nome_arquivo)
-    ws = wb.active
-    ws.title = "Dados PDF"
-    
-    # Estilo do cabeçalho (cinza mais neutro)
-    header_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-    header_font = Font(bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Bordas
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+        # Adicionar apenas colunas relevantes do PDF (Código | Descrição Item | Valor)
+        dados_formatados.append((codigo_completo, descricao, valor))
+    
+    # Gravar o Excel já formatado (uma passada, estilos nomeados)
+    escrever_excel(
+        nome_arquivo,
+        aba="Dados PDF",
+        colunas=['Código', 'Descrição Item', 'Valor'],
+        linhas=dados_formatados,
+        larguras=[20, 40, 15],
+        estilo_cabecalho='cabecalho_cinza',
+        estilos_dados=['dados', 'dados', 'dados_centro'],  # valor centralizado
+        rodape=[
+            (0, f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", 'rodape'),
+            (2, f"Total: {len(dados_formatados)} registros", 'rodape_direita'),
+        ]
     )
     
-    # Aplicar formatação ao cabeçalho
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    # Ajustar largura das colunas
-    column_widths = {
-        'A': 20,  # Código
-        'B': 40,  # Descrição Item
-        'C': 15   # Valor
-    }
-    
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
-    
-    # Formatar células de dados
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = thin_border
-            cell.alignment = Alignment(vertical="center")
-            
-            # Centralizar coluna de valor
-            if cell.column_letter == 'C':
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Adicionar informações no rodapé (opcional, discreto)
-    footer_row = ws.max_row + 2
-    ws[f'A{footer_row}'] = f"Extraído em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
-    ws[f'A{footer_row}'].font = Font(italic=True, size=9, color="808080")
-    
-    ws[f'C{footer_row}'] = f"Total: {len(dados_formatados)} registros"
-    ws[f'C{footer_row}'].font = Font(italic=True, size=9, color="808080")
-    ws[f'C{footer_row}'].alignment = Alignment(horizontal="right")
-    
-    # Salvar
-    wb.save(nome_arquivo)
-    
     print(f"✅ Arquivo Excel criado: {nome_arquivo}")
     print(f"📊 Total de registros: {len(dados_formatados)}")
     print(f"📋 Colunas: Código | Descrição Item | Valor")
@@ -158,55 +116,6 @@ def carregar_ground_truth(json_path="ground_truth.json"):
     return None
 
 
-def detectar_codigo_com_espacos_por_bbox(palavras_linha):
-    """
-    Detecta códigos no padrão XXXXX-XXXX [espaços] XA usando bounding boxes.
-    Mais preciso que regex pois analisa distâncias reais em pixels.
-    
-    Args:
-        palavras_linha: Lista de dicionários com informações das palavras
-    
-    Returns:
-        dict ou None: Informações do código detectado ou None
-    """
-    # Procurar padrão: código-base seguido de sufixo XA
-    padrao_codigo = r'\d{5}-\d{4}'
-    padrao_sufixo = r'\d+A'
-    
-    for i, palavra in enumerate(palavras_linha):
-        if re.match(padrao_codigo, palavra['text']):
-            # Encontrou código base, verificar se próxima palavra é sufixo
-            if i + 1 < len(palavras_linha):
-                proxima = palavras_linha[i + 1]
-                if re.match(padrao_sufixo, proxima['text']):
-                    # Calcular espaços baseado em distância pixel
-                    fim_codigo = palavra['left'] + palavra['width']
-                    inicio_sufixo = proxima['left']
-                    distancia = inicio_sufixo - fim_codigo
-                    
-                    # Estimar largura de um caractere do código
-                    largura_char = palavra['width'] / len(palavra['text'])
-                    
-                    # Calcular número de espaços
-                    # Um espaço tipicamente tem ~0.6 da largura de um caractere em fontes mono
-                    # Ajustado empiricamente com base no ground truth
-                    largura_espaco = largura_char * 0.6
-                    num_espacos = round(distancia / largura_espaco)
-                    
-                    # Garantir pelo menos 1 espaço
-                    num_espacos = max(1, num_espacos)
-                    
-                    return {
-                        'codigo_base': palavra['text'],
-                        'sufixo': proxima['text'],
-                        'espacos_detectados': num_espacos,
-                        'distancia_px': distancia,
-                        'largura_char': largura_char
-                    }
-    
-    return None
-
-
 def detectar_codigo_com_espacos(texto):
     """
     Detecta códigos no padrão XXXXX-XXXX [espaços] XA no texto (regex).
@@ -238,146 +147,157 @@ def detectar_codigo_com_espacos(texto):
     return None
 
 
-def calcular_espacos_entre_palavras(palavra1_data, palavra2_data):
+def _palavras_da_pagina(linhas):
+    """
+    Junta as linhas de agrupar_por_linhas num único array da página
+    
+    Returns:
+        tuple: (palavras em ordem de leitura, número da linha de cada palavra)
+    """
+    nums = sorted(linhas)
+    if not nums:
+        return np.empty(0, dtype=PALAVRA_DTYPE), np.empty(0, dtype=np.int64)
+    palavras = np.concatenate([linhas[num] for num in nums])
+    ids = np.repeat(np.array(nums, dtype=np.int64), [len(linhas[num]) for num in nums])
+    return palavras, ids
+
+
+def calcular_espacos_entre_palavras(palavras, fator_espaco=FATOR_ESPACO):
     """
-    Calcula o número de espaços entre duas palavras baseado em suas posições.
+    Calcula o número de espaços entre cada palavra e a seguinte baseado em suas posições.
     
     Args:
-        palavra1_data: dict com dados da primeira palavra {'text', 'left', 'width'}
-        palavra2_data: dict com dados da segunda palavra {'text', 'left', 'width'}
+        palavras: Array estruturado (PALAVRA_DTYPE) em ordem de leitura
+        fator_espaco: Largura de um espaço em larguras de caractere
     
     Returns:
-        int: Número estimado de espaços
+        tuple: (espaços, distâncias em px, largura média/caractere da primeira
+        palavra de cada par), arrays com len(palavras) - 1 elementos
     """
-    # Posição onde termina a primeira palavra
-    fim_palavra1 = palavra1_data['left'] + palavra1_data['width']
+    left = palavras['left'].astype(np.float64)
+    width = palavras['width'].astype(np.float64)
+    num_chars = np.fromiter((len(t) for t in palavras['text']), dtype=np.float64, count=len(palavras))
     
-    # Posição onde começa a segunda palavra
-    inicio_palavra2 = palavra2_data['left']
+    # Distância entre o fim de cada palavra e o começo da seguinte
+    distancias = left[1:] - (left[:-1] + width[:-1])
     
-    # Distância entre as palavras
-    distancia = inicio_palavra2 - fim_palavra1
+    # Largura média de um caractere da primeira palavra (10px se vazia)
+    largura_char = np.full(len(distancias), 10.0)
+    np.divide(width[:-1], num_chars[:-1], out=largura_char, where=num_chars[:-1] > 0)
     
-    # Estimar largura média de um caractere da primeira palavra
-    if len(palavra1_data['text']) > 0:
-        largura_char = palavra1_data['width'] / len(palavra1_data['text'])
-    else:
-        largura_char = 10  # fallback
+    # Garantir pelo menos 1 espaço entre palavras
+    largura_espaco = largura_char * fator_espaco
+    espacos = np.ones(len(distancias), dtype=np.int64)
+    valido = largura_espaco != 0
+    espacos[valido] = np.maximum(1, np.rint(distancias[valido] / largura_espaco[valido]))
     
-    # Largura de um espaço é tipicamente 0.3-0.5 da largura de um caractere
-    # Vamos usar 0.4 como padrão
-    largura_espaco = largura_char * 0.4
+    return espacos, distancias, largura_char
+
+
+def processar_pagina(linhas, debug=False):
+    """
+    Reconstrói as linhas da página com os espaçamentos detectados e procura os
+    códigos no padrão XXXXX-XXXX [espaços] XA usando bounding boxes.
+    Distâncias, larguras e espaços da página inteira saem de poucas operações
+    vetorizadas; o diagnóstico por par de palavras só é montado com debug.
     
-    if largura_espaco == 0:
-        return 1
+    Args:
+        linhas: Resultado de agrupar_por_linhas
+        debug: Incluir 'espacamentos' (detalhes de cada espaço) em cada linha
     
-    # Calcular número de espaços
-    num_espacos = round(distancia / largura_espaco)
+    Returns:
+        dict: {número da linha: {'texto', 'codigo' (dict ou None)[, 'espacamentos']}}
+    """
+    palavras, ids = _palavras_da_pagina(linhas)
+    if len(palavras) == 0:
+        return {}
+    
+    textos = palavras['text'].tolist()
+    espacos, distancias, largura_char = calcular_espacos_entre_palavras(palavras)
+    mesma_linha = ids[1:] == ids[:-1]
+    
+    # Cada palavra seguida dos seus espaços (nenhum depois da última da linha)
+    separadores = np.where(mesma_linha, espacos, 0).tolist() + [0]
+    pecas = [texto + ' ' * num for texto, num in zip(textos, separadores)]
+    
+    inicios = np.r_[0, np.flatnonzero(~mesma_linha) + 1].tolist()
+    fins = inicios[1:] + [len(palavras)]
+    resultado = {
+        int(ids[inicio]): {'texto': ''.join(pecas[inicio:fim]), 'codigo': None}
+        for inicio, fim in zip(inicios, fins)
+    }
     
-    # Garantir pelo menos 1 espaço entre palavras
-    return max(1, num_espacos)
+    # Códigos: código-base seguido, na mesma linha, do sufixo
+    # Um espaço tipicamente tem ~0.6 da largura de um caractere em fontes mono
+    eh_codigo = np.fromiter((PADRAO_CODIGO.match(t) is not None for t in textos), dtype=bool, count=len(textos))
+    eh_sufixo = np.fromiter((PADRAO_SUFIXO.match(t) is not None for t in textos), dtype=bool, count=len(textos))
+    pares = np.flatnonzero(eh_codigo[:-1] & eh_sufixo[1:] & mesma_linha)
+    if len(pares):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            espacos_codigo = np.rint(distancias[pares] / (largura_char[pares] * FATOR_ESPACO_CODIGO))
+        # Caixa de largura zero (OCR degenerado): sem como medir, 1 espaço
+        espacos_codigo[~np.isfinite(espacos_codigo)] = 1
+        # Do último para o primeiro: o primeiro código de cada linha prevalece
+        for i, num_espacos in zip(pares.tolist()[::-1], espacos_codigo.tolist()[::-1]):
+            resultado[int(ids[i])]['codigo'] = {
+                'codigo_base': textos[i],
+                'sufixo': textos[i + 1],
+                'espacos_detectados': max(1, int(num_espacos)),
+                'distancia_px': float(distancias[i]),
+                'largura_char': float(largura_char[i])
+            }
+    
+    if debug:
+        for linha in resultado.values():
+            linha['espacamentos'] = []
+        for i in np.flatnonzero(mesma_linha).tolist():
+            resultado[int(ids[i])]['espacamentos'].append({
+                'palavra1': textos[i],
+                'palavra2': textos[i + 1],
+                'num_espacos': int(espacos[i]),
+                'distancia_px': float(distancias[i]),
+                'pos_palavra1': int(palavras['left'][i]),
+                'pos_palavra2': int(palavras['left'][i + 1])
+            })
+    
+    return resultado
 
 
-def processar_linha(palavras_linha):
+def processar_linha(palavras_linha, debug=False):
     """
     Processa uma linha de palavras, detectando espaçamentos entre elas.
     
     Args:
-        palavras_linha: Lista de dicionários com informações das palavras
+        palavras_linha: Array estruturado com as palavras da linha
+        debug: Montar as informações detalhadas sobre os espaçamentos
     
     Returns:
         str: Texto reconstruído com espaçamentos detectados
-        list: Informações detalhadas sobre espaçamentos
+        list: Informações detalhadas sobre espaçamentos (vazia sem debug)
     """
-    if not palavras_linha:
+    linha = processar_pagina({0: palavras_linha}, debug=debug).get(0)
+    if linha is None:
         return "", []
-    
-    texto_completo = ""
-    infos_espacamento = []
-    
-    for i, palavra_data in enumerate(palavras_linha):
-        texto_completo += palavra_data['text']
-        
-        # Se não for a última palavra da linha
-        if i < len(palavras_linha) - 1:
-            proxima_palavra = palavras_linha[i + 1]
-            
-            # Calcular número de espaços
-            num_espacos = calcular_espacos_entre_palavras(palavra_data, proxima_palavra)
-            
-            # Adicionar espaços ao texto
-            espacos_str = ' ' * num_espacos
-            texto_completo += espacos_str
-            
-            # Registrar informação detalhada
-            info = {
-                'palavra1': palavra_data['text'],
-                'palavra2': proxima_palavra['text'],
-                'num_espacos': num_espacos,
-                'distancia_px': proxima_palavra['left'] - (palavra_data['left'] + palavra_data['width']),
-                'pos_palavra1': palavra_data['left'],
-                'pos_palavra2': proxima_palavra['left']
-            }
-            infos_espacamento.append(info)
-    
-    return texto_completo, infos_espacamento
+    return linha['texto'], linha.get('espacamentos', [])
 
 
-def agrupar_por_linhas(dados_ocr, tolerancia_y=5):
+def detectar_codigo_com_espacos_por_bbox(palavras_linha):
     """
-    Agrupa palavras por linha baseado na posição vertical (y).
+    Detecta códigos no padrão XXXXX-XXXX [espaços] XA usando bounding boxes.
+    Mais preciso que regex pois analisa distâncias reais em pixels.
     
     Args:
-        dados_ocr: DataFrame do Tesseract com dados de OCR
-        tolerancia_y: Tolerância em pixels para considerar mesma linha
+        palavras_linha: Array estruturado com as palavras da linha
     
     Returns:
-        dict: Dicionário com número da linha e lista de palavras
+        dict ou None: Informações do código detectado ou None
     """
-    linhas = {}
-    linha_atual = 0
-    y_ref = None
-    
-    for i, row in dados_ocr.iterrows():
-        # Ignorar campos vazios
-        if not str(row['text']).strip() or row['conf'] < 0:
-            continue
-        
-        # Só processar palavras (level 5)
-        if row['level'] != 5:
-            continue
-        
-        y_atual = row['top']
-        
-        # Determinar se é uma nova linha
-        if y_ref is None:
-            y_ref = y_atual
-        elif abs(y_atual - y_ref) > tolerancia_y:
-            linha_atual += 1
-            y_ref = y_atual
-        
-        # Adicionar palavra à linha
-        if linha_atual not in linhas:
-            linhas[linha_atual] = []
-        
-        palavra_info = {
-            'text': str(row['text']).strip(),
-            'left': row['left'],
-            'top': row['top'],
-            'width': row['width'],
-            'height': row['height'],
-            'conf': row['conf']
-        }
-        linhas[linha_atual].append(palavra_info)
-    
-    # Ordenar palavras em cada linha pela posição horizontal (left)
-    for linha_num in linhas:
-        linhas[linha_num] = sorted(linhas[linha_num], key=lambda x: x['left'])
-    
-    return linhas
+    linha = processar_pagina({0: palavras_linha}).get(0)
+    return linha['codigo'] if linha else None
 
 
-def extrair_pdf_com_espacamento(pdf_path, ground_truth_path="ground_truth.json"):
+def extrair_pdf_com_espacamento(pdf_path, ground_truth_path="ground_truth.json", debug=False,
+                                relatorio_path="relatorio_validacao.json"):
     """
     Função principal: Extrai texto de PDF escaneado detectando espaçamentos exatos.
     Valida contra ground truth se disponível.
@@ -385,14 +305,21 @@ def extrair_pdf_com_espacamento(pdf_path, ground_truth_path="ground_truth.json")
     Args:
         pdf_path: Caminho para o arquivo PDF
         ground_truth_path: Caminho para o arquivo JSON com ground truth
+        debug: Mostrar a análise completa e o diagnóstico de cada espaço nas linhas com código
+        relatorio_path: Onde gravar o relatório de validação (JSON)
+    
+    Returns:
+        tuple: (códigos extraídos, relatório de validação)
     """
     print("=" * 100)
     print("🔍 EXTRAÇÃO MINUCIOSA DE PDF COM DETECÇÃO DE ESPAÇAMENTOS + VALIDAÇÃO")
     print("=" * 100)
     print(f"\n📄 Arquivo: {pdf_path}\n")
+    inicio_extracao = time.perf_counter()
     
-    # Carregar ground truth
+    # Carregar ground truth (indexado por código base)
     ground_truth = carregar_ground_truth(ground_truth_path)
+    indice_gt = indexar_ground_truth(ground_truth)
     if ground_truth:
         print(f"✅ Ground truth carregado: {len(ground_truth['linhas'])} códigos esperados\n")
     else:
@@ -400,142 +327,127 @@ def extrair_pdf_com_espacamento(pdf_path, ground_truth_path="ground_truth.json")
     
     # Estrutura para armazenar resultados
     codigos_extraidos = []
-    resultados_validacao = []
+    deteccoes = []
+    estatisticas_paginas = []
     
-    # 1. Converter PDF para imagem
-    print("⏳ Convertendo PDF para imagem (DPI 300 para alta qualidade)...")
+    # 1. Páginas renderizadas sob demanda (DPI 300, tons de cinza), um lote à frente do OCR
     try:
-        imagens = convert_from_path(pdf_path, dpi=300)
-        print(f"✅ {len(imagens)} página(s) convertida(s)\n")
+        num_paginas = contar_paginas(pdf_path)
+        print(f"✅ {num_paginas} página(s) a processar (renderização sob demanda, DPI 300)\n")
     except Exception as e:
-        print(f"❌ Erro ao converter PDF: {e}")
+        print(f"❌ Erro ao ler PDF: {e}")
         return
-    
-    # 2. Processar cada página
-    for idx_pagina, imagem in enumerate(imagens, 1):
+    imagens = renderizar_paginas(pdf_path, dpi=300, prefetch=PAGINAS_POR_LOTE)
+    
+    # 2. OCR em lotes paralelos (o Tesseract carrega o modelo uma vez por lote)
+    print("⏳ Executando OCR com Tesseract em lotes (detectando bounding boxes)...")
+    
+    # Configuração do Tesseract para português e máxima qualidade
+    config_tesseract = '--psm 6'  # PSM 6: assume um bloco uniforme de texto
+    
+    # Dados detalhados (palavra por palavra com posições), página a página na ordem
+    paginas_ocr = ocr_paginas(imagens, lang='por', config=config_tesseract)
+    
+    # 3. Processar cada página
+    fim_pagina_anterior = time.perf_counter()
+    for idx_pagina, dados_ocr in enumerate(paginas_ocr, 1):
+        # Tempo esperando a página sair do pipeline renderização + OCR
+        inicio_pagina = time.perf_counter()
+        estatistica = {
+            'pagina': idx_pagina,
+            'palavras': 0,
+            'linhas': 0,
+            'codigos': 0,
+            'espera_ocr_s': round(inicio_pagina - fim_pagina_anterior, 3),
+        }
+        estatisticas_paginas.append(estatistica)
+        
         print(f"\n{'=' * 90}")
         print(f"📄 PÁGINA {idx_pagina}")
         print(f"{'=' * 90}\n")
         
-        print("⏳ Executando OCR com Tesseract (detectando bounding boxes)...")
-        
-        # Configuração do Tesseract para português e máxima qualidade
-        config_tesseract = '--psm 6 -l por'  # PSM 6: assume um bloco uniforme de texto
-        
-        # Executar OCR e obter dados detalhados (palavra por palavra com posições)
-        dados_ocr = pytesseract.image_to_data(
-            imagem, 
-            lang='por',
-            config=config_tesseract,
-            output_type=pytesseract.Output.DATAFRAME
-        )
-        
         # Filtrar apenas resultados com confiança razoável
         dados_ocr = dados_ocr[dados_ocr['conf'] > 30]
         
         if dados_ocr.empty:
             print("⚠️  Nenhum texto detectado com confiança suficiente.\n")
+            estatistica['processamento_s'] = round(time.perf_counter() - inicio_pagina, 3)
+            fim_pagina_anterior = time.perf_counter()
             continue
         
-        print(f"✅ OCR concluído! {len(dados_ocr[dados_ocr['level'] == 5])} palavras detectadas\n")
+        estatistica['palavras'] = int((dados_ocr['level'] == 5).sum())
+        print(f"✅ OCR concluído! {estatistica['palavras']} palavras detectadas\n")
         
         # Agrupar palavras por linhas
         linhas = agrupar_por_linhas(dados_ocr)
+        estatistica['linhas'] = len(linhas)
         
         print(f"📝 Total de {len(linhas)} linha(s) identificada(s)\n")
         print("-" * 90)
         
+        # Reconstruir as linhas e detectar códigos via bounding boxes (página inteira)
+        linhas_processadas = processar_pagina(linhas, debug=debug)
+        
         # Processar cada linha
-        for num_linha, palavras in sorted(linhas.items()):
-            texto_linha, infos = processar_linha(palavras)
-            
-            # Tentar detectar código na linha usando bounding boxes (mais preciso)
-            codigo_detectado = detectar_codigo_com_espacos_por_bbox(palavras)
+        for num_linha, linha in sorted(linhas_processadas.items()):
+            texto_linha = linha['texto']
+            codigo_detectado = linha['codigo']
             
-            # Mostrar linhas com códigos detectados
+            # Mostrar linhas com códigos detectados (uma linha por código)
             if codigo_detectado:
-                print(f"\n{'=' * 100}")
-                print(f"🎯 CÓDIGO DETECTADO NA LINHA {num_linha + 1}")
-                print(f"{'=' * 100}")
-                
-                print(f"\n📝 Texto completo da linha:")
-                print(f"   '{texto_linha}'")
-                
-                print(f"\n🔍 Análise do código (via Bounding Boxes):")
-                print(f"   • Código base: {codigo_detectado['codigo_base']}")
-                print(f"   • Sufixo: {codigo_detectado['sufixo']}")
-                print(f"   • Espaços detectados: {codigo_detectado['espacos_detectados']}")
-                print(f"   • Distância horizontal: {codigo_detectado['distancia_px']:.2f}px")
-                print(f"   • Largura média/caractere: {codigo_detectado['largura_char']:.2f}px")
-                
                 espacos_visual = '·' * codigo_detectado['espacos_detectados']
-                print(f"   • Visualização: {codigo_detectado['codigo_base']}{espacos_visual}{codigo_detectado['sufixo']}")
+                print(f"🎯 Linha {num_linha + 1}: {codigo_detectado['codigo_base']}{espacos_visual}"
+                      f"{codigo_detectado['sufixo']} ({codigo_detectado['espacos_detectados']} espaço(s))")
+                
+                if debug:
+                    print(f"   • Texto completo da linha: '{texto_linha}'")
+                    print(f"   • Distância horizontal: {codigo_detectado['distancia_px']:.2f}px")
+                    print(f"   • Largura média/caractere: {codigo_detectado['largura_char']:.2f}px")
+                    for info in linha['espacamentos']:
+                        print(f"   • '{info['palavra1']}' → '{info['palavra2']}': "
+                              f"{info['distancia_px']:.0f}px = {info['num_espacos']} espaço(s)")
                 
                 # Armazenar para validação e exportação posterior
                 codigos_extraidos.append({
+                    'pagina': idx_pagina,
                     'linha': num_linha + 1,
                     'codigo': codigo_detectado,
                     'texto_linha': texto_linha
                 })
-                
-                # Validar contra ground truth se disponível
-                if ground_truth:
-                    # Procurar correspondência no ground truth
-                    gt_linha = next((l for l in ground_truth['linhas'] 
-                                   if l['codigo_base'] == codigo_detectado['codigo_base']), None)
-                    
-                    if gt_linha:
-                        espacos_corretos = gt_linha['espacos_no_codigo']
-                        espacos_detectados = codigo_detectado['espacos_detectados']
-                        
-                        if espacos_corretos == espacos_detectados:
-                            status = "✅ CORRETO"
-                            acerto = True
-                        else:
-                            status = "❌ INCORRETO"
-                            acerto = False
-                        
-                        print(f"\n📊 VALIDAÇÃO vs GROUND TRUTH:")
-                        print(f"   • Esperado: {espacos_corretos} espaço(s)")
-                        print(f"   • Detectado: {espacos_detectados} espaço(s)")
-                        print(f"   • Status: {status}")
-                        
-                        resultados_validacao.append({
-                            'linha': num_linha + 1,
-                            'codigo_base': codigo_detectado['codigo_base'],
-                            'esperado': espacos_corretos,
-                            'detectado': espacos_detectados,
-                            'acerto': acerto
-                        })
-                
-                print(f"\n{'-' * 100}")
+                deteccoes.append({
+                    'pagina': idx_pagina,
+                    'linha': num_linha + 1,
+                    'codigo_base': codigo_detectado['codigo_base'],
+                    'detectado': codigo_detectado['espacos_detectados']
+                })
+        
+        estatistica['codigos'] = sum(1 for linha in linhas_processadas.values() if linha['codigo'])
+        estatistica['processamento_s'] = round(time.perf_counter() - inicio_pagina, 3)
+        fim_pagina_anterior = time.perf_counter()
+    
+    # 4. Validar todas as detecções contra o ground truth de uma vez
+    avaliacao = avaliar_deteccoes(deteccoes, indice_gt)
+    relatorio = gerar_relatorio(
+        pdf_path, ground_truth_path, avaliacao, indice_gt,
+        estatisticas_paginas, time.perf_counter() - inicio_extracao
+    )
+    salvar_relatorio(relatorio, relatorio_path)
     
     # Mostrar sumário de validação
-    if resultados_validacao:
-        print("\n" + "=" * 100)
-        print("📊 SUMÁRIO DE VALIDAÇÃO")
-        print("=" * 100)
-        
-        total = len(resultados_validacao)
-        acertos = sum(1 for r in resultados_validacao if r['acerto'])
-        erros = total - acertos
-        precisao = (acertos / total * 100) if total > 0 else 0
-        
-        print(f"\n✅ Total de códigos validados: {total}")
-        print(f"✅ Acertos: {acertos}")
-        print(f"❌ Erros: {erros}")
-        print(f"📈 Precisão: {precisao:.1f}%")
-        
-        if erros > 0:
-            print(f"\n❌ Códigos com erro:")
-            for r in resultados_validacao:
-                if not r['acerto']:
-                    print(f"   • Linha {r['linha']}: {r['codigo_base']}")
-                    print(f"     - Esperado: {r['esperado']} espaço(s)")
-                    print(f"     - Detectado: {r['detectado']} espaço(s)")
-                    print(f"     - Diferença: {abs(r['esperado'] - r['detectado'])} espaço(s)")
-        
-        print("\n" + "=" * 100)
+    resumo = relatorio['resumo']
+    print("\n" + "=" * 100)
+    print("📊 SUMÁRIO DE VALIDAÇÃO")
+    print("=" * 100)
+    print(f"\n🎯 Detecções: {resumo['deteccoes']} | No ground truth: {resumo['validadas']} | "
+          f"Acertos: {resumo['acertos']} | Erros: {resumo['erros']} | Não detectados: {resumo['nao_detectados']}")
+    if indice_gt:
+        print(f"📈 Precisão: {resumo['precisao'] or 0:.1%} | Recall: {resumo['recall'] or 0:.1%} | "
+              f"Acurácia dos espaços: {resumo['acuracia_espacos'] or 0:.1%}")
+    for erro in relatorio['erros']:
+        print(f"   ❌ Pág. {erro['pagina']} linha {erro['linha']}: {erro['codigo_base']} "
+              f"(esperado {erro['esperado']}, detectado {erro['detectado']})")
+    print(f"⏱️  {relatorio['tempo_total_s']:.1f}s no total, {len(estatisticas_paginas)} página(s)")
+    print(f"🧾 Relatório: {relatorio_path}")
     
     print("\n" + "=" * 100)
     print("✅ EXTRAÇÃO CONCLUÍDA COM SUCESSO!")
@@ -545,7 +457,7 @@ def extrair_pdf_com_espacamento(pdf_path, ground_truth_path="ground_truth.json")
     if codigos_extraidos:
         arquivo_excel = exportar_para_excel(codigos_extraidos, "dados_extraidos.xlsx")
     
-    return codigos_extraidos, resultados_validacao
+    return codigos_extraidos, relatorio
 
 
 if __name__ == "__main__":
@@ -553,7 +465,7 @@ if __name__ == "__main__":
     pdf_teste = "matriz-ES-2025-2.pdf"
     
     if os.path.exists(pdf_teste):
-        extrair_pdf_com_espacamento(pdf_teste)
+        extrair_pdf_com_espacamento(pdf_teste, debug='--debug' in sys.argv)
     else:
         print(f"❌ Erro: Arquivo '{pdf_teste}' não encontrado.")
         print(f"   Diretório atual: {os.getcwd()}")
@@ -0,0 +1,75 @@
+"""
+Testes do OCR em lote (ocr_lote.py)
+Rodar com: python -m pytest test_ocr_lote.py
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+pytest.importorskip('pandas')
+pytesseract = pytest.importorskip('pytesseract')
+
+import ocr_lote
+
+
+class ContadorAPI:
+    """No lugar do tesserocr.PyTessBaseAPI: conta as instâncias criadas por thread"""
+
+    criadas = []
+
+    def __init__(self, lang, psm):
+        self.criadas.append((threading.get_ident(), lang, psm))
+
+    def SetImage(self, imagem):
+        self.imagem = imagem
+
+    def GetTSVText(self, pagina):
+        return f'5\t1\t1\t1\t1\t1\t0\t0\t{self.imagem.width}\t{self.imagem.height}\t90\tok\n'
+
+
+def pagina_com_texto(texto: str) -> Image.Image:
+    imagem = Image.new('L', (900, 160), 255)
+    ImageDraw.Draw(imagem).text((30, 50), texto, fill=0, font=ImageFont.load_default(size=48))
+    imagem.info['dpi'] = (300, 300)
+    return imagem
+
+
+def test_api_do_tesserocr_e_reaproveitada_entre_lotes(monkeypatch):
+    monkeypatch.setattr(ContadorAPI, 'criadas', [])
+    monkeypatch.setattr(ocr_lote, 'tesserocr', type('tesserocr', (), {'PyTessBaseAPI': ContadorAPI}))
+    imagens = [Image.new('L', (10 + i, 10), 255) for i in range(10)]
+
+    paginas = list(ocr_lote.ocr_paginas(imagens, lang='eng', config='--psm 6', lote=2, workers=2))
+
+    assert [int(pagina['width'][0]) for pagina in paginas] == [10 + i for i in range(10)]
+    # 5 lotes em 2 threads: no máximo uma instância por thread
+    threads = [thread for thread, _, _ in ContadorAPI.criadas]
+    assert len(threads) == len(set(threads)) <= 2
+    assert {(lang, psm) for _, lang, psm in ContadorAPI.criadas} == {('eng', 6)}
+
+
+def test_ocr_em_lote_igual_ao_image_to_data():
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        pytest.skip('binário tesseract não instalado')
+    if 'eng' not in pytesseract.get_languages():
+        pytest.skip('traineddata eng não instalado')
+
+    imagem = pagina_com_texto('Nota Fiscal 1234 Total 56,78')
+    esperado = pytesseract.image_to_data(imagem, lang='eng', config='--psm 6',
+                                         output_type=pytesseract.Output.DATAFRAME)
+
+    [obtido] = list(ocr_lote.ocr_paginas([imagem], lang='eng', config='--psm 6'))
+
+    def palavras(dados):
+        dados = dados[dados['conf'] > -1]
+        return dados['text'].astype(str).tolist(), dados[['left', 'top', 'width', 'height']].to_numpy()
+
+    textos_esperados, caixas_esperadas = palavras(esperado)
+    textos, caixas = palavras(obtido)
+    assert textos == textos_esperados
+    assert np.allclose(caixas, caixas_esperadas, atol=2)
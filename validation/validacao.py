@@ -0,0 +1,140 @@
+"""
+Validação das detecções de código contra o ground truth
+O ground truth é indexado por codigo_base uma vez; todas as detecções são
+avaliadas juntas (pandas) e o resultado vira um relatório JSON compacto:
+precisão/recall, confusão de número de espaços e tempo por página.
+O JSON tem formato estável para alimentar comparações entre versões.
+"""
+
+import json
+from datetime import datetime
+
+import pandas as pd
+
+COLUNAS_DETECCAO = ['pagina', 'linha', 'codigo_base', 'detectado']
+
+
+def indexar_ground_truth(ground_truth):
+    """
+    Indexa as linhas do ground truth por codigo_base
+
+    Args:
+        ground_truth: Dados do ground_truth.json (ou None)
+
+    Returns:
+        dict: {codigo_base: linha}; com código repetido vale a primeira linha
+    """
+    indice = {}
+    for linha in (ground_truth or {}).get('linhas', []):
+        indice.setdefault(linha['codigo_base'], linha)
+    return indice
+
+
+def avaliar_deteccoes(deteccoes, indice):
+    """
+    Compara todas as detecções com o ground truth de uma vez
+
+    Args:
+        deteccoes: Lista de {'pagina', 'linha', 'codigo_base', 'detectado'}
+        indice: Resultado de indexar_ground_truth
+
+    Returns:
+        DataFrame: Uma linha por detecção, com 'esperado' (NaN se o código
+        não está no ground truth) e 'acerto'
+    """
+    avaliacao = pd.DataFrame(deteccoes, columns=COLUNAS_DETECCAO)
+    esperados = pd.Series(
+        {codigo: linha['espacos_no_codigo'] for codigo, linha in indice.items()},
+        dtype='float64'
+    )
+    avaliacao['esperado'] = avaliacao['codigo_base'].map(esperados)
+    avaliacao['acerto'] = avaliacao['esperado'] == avaliacao['detectado']
+    return avaliacao
+
+
+def _proporcao(parte, total):
+    return round(parte / total, 4) if total else None
+
+
+def resumir_avaliacao(avaliacao, indice):
+    """
+    Métricas da avaliação
+
+    - precisao: detecções com o número certo de espaços / todas as detecções
+    - recall: códigos do ground truth acertados ao menos uma vez / códigos do ground truth
+    - acuracia_espacos: acertos / detecções que estão no ground truth
+
+    Returns:
+        tuple: (resumo, confusão {esperado: {detectado: quantidade}})
+    """
+    validadas = avaliacao.dropna(subset=['esperado'])
+    acertos = int(validadas['acerto'].sum())
+    codigos_acertados = validadas.loc[validadas['acerto'], 'codigo_base'].nunique()
+    codigos_encontrados = validadas['codigo_base'].nunique()
+
+    resumo = {
+        'codigos_ground_truth': len(indice),
+        'deteccoes': len(avaliacao),
+        'validadas': len(validadas),
+        'fora_do_ground_truth': len(avaliacao) - len(validadas),
+        'nao_detectados': len(indice) - codigos_encontrados,
+        'acertos': acertos,
+        'erros': len(validadas) - acertos,
+        'precisao': _proporcao(acertos, len(avaliacao)),
+        'recall': _proporcao(codigos_acertados, len(indice)),
+        'acuracia_espacos': _proporcao(acertos, len(validadas)),
+    }
+
+    confusao = {}
+    if not validadas.empty:
+        tabela = pd.crosstab(validadas['esperado'].astype(int), validadas['detectado'])
+        confusao = {
+            str(esperado): {str(detectado): int(n) for detectado, n in linha.items() if n}
+            for esperado, linha in tabela.to_dict(orient='index').items()
+        }
+    return resumo, confusao
+
+
+def gerar_relatorio(pdf_path, ground_truth_path, avaliacao, indice, paginas, tempo_total_s):
+    """
+    Monta o relatório de validação (serializável em JSON)
+
+    Args:
+        pdf_path: PDF processado
+        ground_truth_path: Arquivo de ground truth usado
+        avaliacao: Resultado de avaliar_deteccoes
+        indice: Resultado de indexar_ground_truth
+        paginas: Lista de estatísticas por página (palavras, linhas, tempos...)
+        tempo_total_s: Tempo total da extração
+
+    Returns:
+        dict: Relatório
+    """
+    resumo, confusao = resumir_avaliacao(avaliacao, indice)
+    erros = avaliacao[avaliacao['esperado'].notna() & ~avaliacao['acerto']]
+    return {
+        'pdf': pdf_path,
+        'ground_truth': ground_truth_path if indice else None,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'resumo': resumo,
+        'confusao_espacos': confusao,
+        'erros': [
+            {
+                'pagina': int(erro.pagina),
+                'linha': int(erro.linha),
+                'codigo_base': erro.codigo_base,
+                'esperado': int(erro.esperado),
+                'detectado': int(erro.detectado),
+            }
+            for erro in erros.itertuples(index=False)
+        ],
+        'paginas': paginas,
+        'tempo_total_s': round(tempo_total_s, 3),
+    }
+
+
+def salvar_relatorio(relatorio, caminho="relatorio_validacao.json"):
+    """Grava o relatório em JSON (UTF-8)"""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    return caminho